@@ -0,0 +1,34 @@
+import os
+import re
+import subprocess
+import sys
+
+# Runs the same match with each display backend and compares the frame times.
+# Usage: python benchmark_backends.py [frames] [extra main.py options, e.g. --dirty-rects]
+# Set SDL_VIDEODRIVER=dummy to run on a machine without a screen (SDL's software renderer).
+
+BACKENDS = ["surface", "sdl2"]
+
+frames = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+extra_options = sys.argv[2:]
+game = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+results = {}
+for backend in BACKENDS:
+    command = [sys.executable, game, "--benchmark", str(frames), "--backend", backend] + extra_options
+    output = subprocess.run(command, capture_output=True, text=True).stdout
+    match = re.search(r"Benchmark \((\w+) backend\): (\d+) frames in ([\d.]+) s, ([\d.]+) ms per frame", output)
+    if not match:
+        print(f"{backend}: no benchmark result")
+        print(output)
+        continue
+    if match.group(1) != backend:
+        print(f"{backend}: not available, the game fell back to {match.group(1)}")
+        continue
+    results[backend] = float(match.group(4))
+    print(f"{backend:>8}: {match.group(4)} ms per frame ({match.group(2)} frames)")
+
+if len(results) == len(BACKENDS):
+    baseline = results[BACKENDS[0]]
+    for backend in BACKENDS[1:]:
+        print(f"{backend} takes {results[backend] / baseline:.2f}x the time of {BACKENDS[0]}")
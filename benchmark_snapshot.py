@@ -0,0 +1,31 @@
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import simulation
+
+# Times Match.snapshot() and Match.restore() on a two-player match with arrows in flight.
+# Usage: python benchmark_snapshot.py [rounds]
+
+rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+# Play a bow duel until a few arrows are in the air
+rng = random.Random(1)
+match = simulation.Match(arena_widths=simulation.HEADLESS_ARENAS, seed=1)
+for player in match.players:
+    player.weapon = "bow"
+while len(match.arrows) < 2 or match.tick < 120:
+    player1, player2 = match.players
+    match.step((simulation.bot_input(rng, player1, player2, match) | simulation.ATTACK,
+                simulation.bot_input(rng, player2, player1, match) | simulation.ATTACK))
+
+record = match.snapshot()
+state = match.state_hash()
+save = min(timeit.repeat(match.snapshot, number=rounds, repeat=5)) / rounds
+load = min(timeit.repeat(lambda: match.restore(record), number=rounds, repeat=5)) / rounds
+assert match.state_hash() == state, "restore changed the match"
+
+print(f"Snapshot: {len(record)} bytes ({len(match.arrows)} arrows), "
+      f"save {save * 1e6:.2f} us, restore {load * 1e6:.2f} us")
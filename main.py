@@ -1,25 +1,350 @@
 import pygame
 import sys
 import math
+import numpy as np
 import random
 import os
+import hashlib
+import mmap
+import shutil
+import struct
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import simulation
+import netplay
+from simulation import get_option
+
+# --headless: play scripted matches without a window and report the tick rate (see simulation.py)
+if "--headless" in sys.argv:
+    simulation.main()
+    sys.exit()
+
+# The game is laid out in logical units and drawn on an offscreen canvas of render_scale pixels per unit,
+# which is scaled into a resizable window. The window size only changes how big the canvas is shown.
+class Display:
+    name = "surface"
+    transparent = False  # Layers draw on transparent canvases
+
+    def __init__(self, logical_size, title, render_scale=1.0):
+        self.logical_size = logical_size
+        self.render_scale = render_scale
+        self.canvas_size = (max(1, round(logical_size[0] * render_scale)),
+                            max(1, round(logical_size[1] * render_scale)))
+        self.open(logical_size, title)
+        self.canvas = pygame.Surface(self.canvas_size)
+        self.frame = pygame.Rect((0, 0), logical_size)  # Where the canvas shows up in the window
+        self.fit()
+
+    def open(self, size, title):
+        self.window = pygame.display.set_mode(size, pygame.RESIZABLE)
+        pygame.display.set_caption(title)
+
+    def window_size(self):
+        return self.window.get_size()
+
+    def fit(self):
+        # Largest frame with the canvas' aspect ratio that fits the window, centered
+        window_width, window_height = self.window_size()
+        logical_width, logical_height = self.logical_size
+        scale = min(window_width / logical_width, window_height / logical_height)
+        self.frame = pygame.Rect(0, 0, max(1, round(logical_width * scale)), max(1, round(logical_height * scale)))
+        self.frame.center = (window_width // 2, window_height // 2)
+        self.clear_bars()
+
+    def clear_bars(self):
+        self.window.fill((0, 0, 0))  # Letterbox bars
+
+    def resize(self):
+        # The window surface is replaced when it is resized
+        self.window = pygame.display.get_surface()
+        self.fit()
+
+    def to_logical(self, pos):
+        # Window pixels to logical units
+        x = (pos[0] - self.frame.x) * self.logical_size[0] // self.frame.width
+        y = (pos[1] - self.frame.y) * self.logical_size[1] // self.frame.height
+        return (x, y)
+
+    def mouse_pos(self):
+        return self.to_logical(pygame.mouse.get_pos())
+
+    def map_event(self, event):
+        # Mouse events arrive in window pixels, the game works in canvas pixels
+        if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            event.pos = self.to_logical(event.pos)
+
+    def target(self, window, plane):
+        # Surface a layer draws on, see TextureDisplay; here everything goes on the one canvas in order
+        return window
+
+    def copy(self, window, surface, position, area=None, special_flags=0, changed=False):
+        # Draw cached art that stays the same between frames (changed: it was redrawn since the last copy)
+        window.blit(surface, position, area, special_flags)
+
+    def present(self, rects=None):
+        # Copy the canvas into the window, only the given canvas areas when not scaled
+        if self.frame.size != self.canvas_size:
+            pygame.transform.scale(self.canvas, self.frame.size, self.window.subsurface(self.frame))
+            pygame.display.flip()
+        elif rects is None:
+            self.window.blit(self.canvas, self.frame)
+            pygame.display.flip()
+        else:
+            pygame.display.update([self.window.blit(self.canvas, rect.move(self.frame.topleft), rect)
+                                   for rect in rects])
+
+# Same window, presented through an SDL renderer. Cached art is uploaded once as a texture and
+# drawn with renderer copies; only what changes every frame is drawn in software, on a transparent
+# canvas per plane. Each frame the renderer draws, plane by plane, the plane's copies and then its canvas.
+# The main canvas is not drawn on, it only gives the frame its size, clip and pixel format.
+DISPLAY_PLANES = 3  # Sky, arena and fighters, lights and screens on top (see Layer.plane)
+BLENDMODE_BLEND = 1  # SDL_BLENDMODE_BLEND
+BLENDMODE_MOD = 4  # SDL_BLENDMODE_MOD, the renderer's version of BLEND_MULT
+
+class TextureDisplay(Display):
+    name = "sdl2"
+    transparent = True
+
+    def open(self, size, title):
+        from pygame._sdl2.video import Window, Renderer, Texture
+        self.window = Window(title, size, resizable=True)
+        self.renderer = Renderer(self.window, vsync=False)
+        self.upload = lambda surface: Texture.from_surface(self.renderer, surface)
+        self.textures = weakref.WeakKeyDictionary()  # cached surface -> texture, dropped with the surface
+        self.planes = [pygame.Surface(self.canvas_size, pygame.SRCALPHA) for plane in range(DISPLAY_PLANES)]
+        self.plane_textures = []
+        for plane in self.planes:
+            texture = Texture(self.renderer, self.canvas_size, streaming=True)
+            texture.blend_mode = BLENDMODE_BLEND
+            self.plane_textures.append(texture)
+        self.copies = [[] for plane in self.planes]  # (texture, area, canvas rect) under each plane this frame
+        self.composed = Texture(self.renderer, self.canvas_size, target=True)  # The frame, when it is scaled
+        self.drawn = set()  # Planes drawn on this frame
+
+    def window_size(self):
+        return self.window.size
+
+    def clear_bars(self):
+        pass  # The renderer clears the whole window every frame
+
+    def resize(self):
+        self.fit()
+
+    def target(self, window, plane):
+        # The plane's canvas, cleared where this frame draws the first time a layer asks for it
+        canvas = self.planes[plane]
+        if plane not in self.drawn:
+            self.drawn.add(plane)
+            canvas.set_clip(window.get_clip())
+            canvas.fill((0, 0, 0, 0))
+        return canvas
+
+    def copy(self, window, surface, position, area=None, special_flags=0, changed=False):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.upload(surface)
+            if special_flags == pygame.BLEND_MULT:
+                texture.blend_mode = BLENDMODE_MOD
+            self.textures[surface] = texture
+        elif changed:
+            texture.update(surface)
+        # The renderer stretches a source area that leaves the texture, so clip it like a blit would
+        area = surface.get_rect() if area is None else pygame.Rect(area)
+        clipped = area.clip(surface.get_rect())
+        if clipped.width and clipped.height:
+            destination = pygame.Rect(position[0] + clipped.x - area.x, position[1] + clipped.y - area.y,
+                                      clipped.width, clipped.height)
+            self.copies[self.planes.index(window)].append((texture, clipped, destination))
+
+    def present(self, rects=None):
+        # Upload only the damaged areas of the canvases when given, the renderer redraws the whole window.
+        # When the window shows the canvas at another size, the frame is composed at canvas size and scaled once.
+        scaled = self.frame.size != self.canvas_size
+        self.renderer.target = self.composed if scaled else None
+        self.renderer.draw_color = (0, 0, 0, 255)  # Letterbox bars
+        self.renderer.clear()
+        offset = (0, 0) if scaled else self.frame.topleft
+        for plane, canvas in enumerate(self.planes):
+            for texture, area, destination in self.copies[plane]:
+                texture.draw(area, destination.move(offset))
+            self.copies[plane] = []
+            if plane not in self.drawn:
+                continue
+            texture = self.plane_textures[plane]
+            if rects is None:
+                texture.update(canvas)
+            else:
+                for rect in rects:
+                    texture.update(canvas.subsurface(rect), rect)
+            texture.draw(None, canvas.get_rect().move(offset))
+        self.drawn.clear()
+        if scaled:
+            self.renderer.target = None
+            self.renderer.clear()
+            self.composed.draw(None, self.frame)
+        self.renderer.present()
+
+def open_display(logical_size, title, render_scale=1.0, backend="surface"):
+    if backend == "sdl2":
+        try:
+            return TextureDisplay(logical_size, title, render_scale)
+        except (ImportError, pygame.error) as e:
+            print(f"SDL2 renderer not available ({e}), using the surface backend")
+    return Display(logical_size, title, render_scale)
 
 # Initialize Pygame and create window
 try:
     pygame.init()
     WINDOW_WIDTH = 800
     WINDOW_HEIGHT = 600
-    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    pygame.display.set_caption("Seowoo's Epic Battle Game!")
+    RENDER_SCALE = float(get_option("--render-scale", 1))  # Canvas pixels per logical unit
+    display = open_display((WINDOW_WIDTH, WINDOW_HEIGHT), "Seowoo's Epic Battle Game!",
+                           RENDER_SCALE, get_option("--backend", "surface"))
+    screen = display.canvas
 except pygame.error:
     print("Error: Could not initialize pygame. Make sure it's installed correctly.")
     sys.exit(1)
 
+# Layout, input and the rules work in logical units (WINDOW_WIDTH x WINDOW_HEIGHT), drawing in canvas pixels.
+# These convert logical positions and sizes; at a render scale of 1 they return what they are given.
+def to_canvas(value):
+    return value if RENDER_SCALE == 1 else value * RENDER_SCALE
+
+def canvas_point(point):
+    return point if RENDER_SCALE == 1 else (point[0] * RENDER_SCALE, point[1] * RENDER_SCALE)
+
+def canvas_pos(point):
+    # Whole pixel position, for blits
+    return point if RENDER_SCALE == 1 else (round(point[0] * RENDER_SCALE), round(point[1] * RENDER_SCALE))
+
+def canvas_points(points):
+    return points if RENDER_SCALE == 1 else [canvas_point(point) for point in points]
+
+def canvas_rect(rect):
+    # Smallest canvas rect covering a logical one
+    if RENDER_SCALE == 1:
+        return pygame.Rect(rect)
+    x, y, width, height = rect
+    left, top = math.floor(x * RENDER_SCALE), math.floor(y * RENDER_SCALE)
+    return pygame.Rect(left, top, math.ceil((x + width) * RENDER_SCALE) - left,
+                       math.ceil((y + height) * RENDER_SCALE) - top)
+
+def canvas_length(length):
+    # Line widths and radii, in whole pixels and never thinner than one
+    return length if RENDER_SCALE == 1 else max(1, round(length * RENDER_SCALE))
+
+def scale_art(surface):
+    # Art drawn in logical units, resampled once to canvas pixels
+    if RENDER_SCALE == 1:
+        return surface
+    size = (canvas_length(surface.get_width()), canvas_length(surface.get_height()))
+    if surface.get_flags() & pygame.SRCALPHA:
+        return pygame.transform.smoothscale(surface, size)
+    scaled = pygame.transform.scale(surface, size)  # Smoothing would blend the colorkey into the edges
+    colorkey = surface.get_colorkey()
+    if colorkey is not None:
+        scaled.set_colorkey(colorkey, pygame.RLEACCEL)
+    return scaled
+
+# The game advances in fixed ticks, separate from how often the screen is drawn
+TICK_RATE = int(get_option("--tick-rate", 60))  # Simulation ticks per second (60, 120 or 240)
+TICK_TIME = 1 / TICK_RATE
+RENDER_FPS = int(get_option("--fps", 60))  # Frame limit, 0 draws as often as possible
+MAX_SUBSTEPS = 8  # Ticks run before a frame is drawn; when more are due the frame is skipped
+MAX_SKIPPED_FRAMES = 4  # Frames skipped in a row before one is drawn anyway
+MAX_FRAME_TIME = 0.25  # Longer stalls (e.g. dragging the window) are not caught up
+
+# --seed N: deterministic mode, every random stream starts from the seed.
+# The rules draw no random numbers at all; the cosmetics draw from the streams below.
+SEED = get_option("--seed")
+SEED = int(SEED) if SEED is not None else None
+random.seed(simulation.stream_seed(SEED, "cosmetics"))
+
+# --net-player 1|2: play one side of the match against another computer, with rollback (see netplay.py)
+NET_PLAYER = int(get_option("--net-player", 0))
+net_link = netplay.open_link(NET_PLAYER) if NET_PLAYER else None
+net_round = 0  # Matches started with the other peer
+session = None  # Rollback session of the network match
+
+# Shared font objects, one per (face, size)
+class FontRegistry:
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size, face=None):
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if face is None or os.path.isfile(face):
+                font = pygame.font.Font(face, size)
+            else:
+                font = pygame.font.SysFont(face, size)
+            self.fonts[key] = font
+        return font
+
+# Rendered text surfaces, least recently used ones are dropped over the byte budget
+TEXT_REPORT_FRAMES = 300  # The exit report counts the text rendered in the last 5 seconds of frames
+
+class TextCache:
+    def __init__(self, budget_bytes=4 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # (font, text, color, antialias) -> surface
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.frame_misses = deque([0], maxlen=TEXT_REPORT_FRAMES + 1)  # Misses so far at the end of recent frames
+        self.antialias = True  # Turned off by the quality governor on slow machines
+
+    def render(self, font, text, color, antialias=True):
+        antialias = antialias and self.antialias
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        self.bytes += self.surface_bytes(surface)
+        while self.bytes > self.budget_bytes and len(self.entries) > 1:
+            old_key, old_surface = self.entries.popitem(last=False)
+            self.bytes -= self.surface_bytes(old_surface)
+        return surface
+
+    def surface_bytes(self, surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def end_frame(self):
+        self.frame_misses.append(self.misses)
+
+    def report(self):
+        # Steady frames should reuse every text surface, so the recent count stays at 0
+        recent = self.frame_misses[-1] - self.frame_misses[0]
+        return (f"Text cache: {self.misses} surfaces rendered, {self.hits} reused, {recent} rendered in the last "
+                f"{len(self.frame_misses) - 1} frames, {len(self.entries)} kept ({self.bytes // 1024} KB)")
+
+font_registry = FontRegistry()
+text_cache = TextCache()
+
+def get_font(size, face=None):
+    # Sizes are in logical units, the text is rendered at the canvas resolution
+    return font_registry.get(canvas_length(size), face)
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
+
 # Try to load a font that supports Korean characters
 try:
-    font = pygame.font.SysFont("malgun gothic", 74)  # Malgun Gothic is a Korean font available on Windows
+    font = pygame.font.SysFont("malgun gothic", canvas_length(74))  # Malgun Gothic is a Korean font available on Windows
 except:
-    font = pygame.font.Font(None, 74)  # Fallback to default font if Korean font is not available
+    font = get_font(74)  # Fallback to default font if Korean font is not available
 
 # Initialize global variables
 MENU = 0
@@ -27,16 +352,26 @@ PLAYING = 1
 GAME_OVER = 2
 
 class GameMap:
-    def __init__(self, name, color, platform_color=(139, 69, 19)):
+    def __init__(self, name, color, platform_color=(139, 69, 19),
+                 sky_top=(135, 206, 235), sky_bottom=(200, 230, 255), arena_width=None):
         self.name = name
         self.color = color
         self.platform_color = platform_color
+        # Colors for the sky gradient (top of the window to the bottom)
+        self.sky_top = sky_top
+        self.sky_bottom = sky_bottom
+        # Width of the fighting area, the camera scrolls when it is wider than the window
+        self.arena_width = arena_width or WINDOW_WIDTH
 
 # Game maps
 FOREST_MAP = GameMap("Forest", (135, 206, 235))  # Sky blue
-VOLCANO_MAP = GameMap("Volcano", (255, 100, 100))  # Red
-NIGHT_MAP = GameMap("Night", (20, 24, 82))  # Dark blue
-DESERT_MAP = GameMap("Desert", (255, 218, 170))  # Sandy color
+VOLCANO_MAP = GameMap("Volcano", (255, 100, 100),  # Red
+                      sky_top=(200, 70, 50), sky_bottom=(255, 170, 120))
+NIGHT_MAP = GameMap("Night", (20, 24, 82),  # Dark blue
+                    sky_top=(10, 12, 45), sky_bottom=(45, 55, 120))
+DESERT_MAP = GameMap("Desert", (255, 218, 170),  # Sandy color
+                     sky_top=(250, 200, 140), sky_bottom=(255, 235, 205),
+                     arena_width=3 * WINDOW_WIDTH)  # Wide open dunes
 
 MAPS = [FOREST_MAP, VOLCANO_MAP, NIGHT_MAP, DESERT_MAP]
 
@@ -47,9 +382,10 @@ p2_name_input = ""
 active_input = None
 player1 = None
 player2 = None
+pressed_buttons = [0, 0]  # Jumps and attacks pressed since the last tick, one input frame per player
 
 # Game font
-font = pygame.font.Font(None, 74)
+font = get_font(74)
 
 # Name input handling
 def handle_name_input(event):
@@ -93,28 +429,30 @@ def draw_name_inputs(window, font):
     
     # Draw boxes
     box_color = (100, 100, 100)
-    pygame.draw.rect(window, box_color, p1_box, 2)
-    pygame.draw.rect(window, box_color, p2_box, 2)
+    p1_box = canvas_rect(p1_box)
+    p2_box = canvas_rect(p2_box)
+    pygame.draw.rect(window, box_color, p1_box, canvas_length(2))
+    pygame.draw.rect(window, box_color, p2_box, canvas_length(2))
     
     # Use a medium font for input text
-    input_font = pygame.font.Font(None, 28)  # Slightly larger than before, but still smaller than default
+    input_font = get_font(28)  # Slightly larger than before, but still smaller than default
     
     # Render text
-    p1_text = input_font.render(p1_name_input + ('|' if active_input == 1 else ''), True, (0, 0, 0))
-    p2_text = input_font.render(p2_name_input + ('|' if active_input == 2 else ''), True, (0, 0, 0))
+    p1_text = render_text(input_font, p1_name_input + ('|' if active_input == 1 else ''), (0, 0, 0))
+    p2_text = render_text(input_font, p2_name_input + ('|' if active_input == 2 else ''), (0, 0, 0))
     
     # Center text in boxes
     p1_x = p1_box.x + (p1_box.width - p1_text.get_width()) // 2
     p2_x = p2_box.x + (p2_box.width - p2_text.get_width()) // 2
-    window.blit(p1_text, (p1_x, p1_box.y + 5))
-    window.blit(p2_text, (p2_x, p2_box.y + 5))
+    window.blit(p1_text, (p1_x, p1_box.y + canvas_length(5)))
+    window.blit(p2_text, (p2_x, p2_box.y + canvas_length(5)))
     
     # Draw labels
-    label_font = pygame.font.Font(None, 24)
-    p1_label = label_font.render("Enter P1 Name (max 17)", True, (0, 0, 0))
-    p2_label = label_font.render("Enter P2 Name (max 17)", True, (0, 0, 0))
-    window.blit(p1_label, (p1_box.x - 20, p1_box.y - 20))
-    window.blit(p2_label, (p2_box.x - 20, p2_box.y - 20))
+    label_font = get_font(24)
+    p1_label = render_text(label_font, "Enter P1 Name (max 17)", (0, 0, 0))
+    p2_label = render_text(label_font, "Enter P2 Name (max 17)", (0, 0, 0))
+    window.blit(p1_label, (p1_box.x - canvas_length(20), p1_box.y - canvas_length(20)))
+    window.blit(p2_label, (p2_box.x - canvas_length(20), p2_box.y - canvas_length(20)))
 
 # Create a simple surface for weapons if images are not available
 def create_weapon_surface(color):
@@ -122,26 +460,197 @@ def create_weapon_surface(color):
     pygame.draw.rect(surface, color, (0, 0, 32, 32))
     return surface
 
-# Try to load images, use colored rectangles if images don't exist
-try:
-    sword_img = pygame.image.load("images/sword.png")
-except:
-    sword_img = create_weapon_surface((192, 192, 192))  # Silver color for sword
-    
-try:
-    bow_img = pygame.image.load("images/bow.png")
-except:
-    bow_img = create_weapon_surface((139, 69, 19))  # Brown color for bow
-    
-try:
-    spear_img = pygame.image.load("images/spear.png")
-except:
-    spear_img = create_weapon_surface((218, 165, 32))  # Golden color for spear
-    
-try:
-    shield_img = pygame.image.load("images/shield.png")
-except:
-    shield_img = create_weapon_surface((128, 128, 128))  # Gray color for shield
+# Baked surfaces are kept on disk between launches, one directory per version of the game
+CACHE_ROOT = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                          "twoplayersfightinggame")
+BLOB_HEADER = struct.Struct("<4sHHBB3B")  # Magic, width, height, per-pixel alpha, has colorkey, colorkey
+BLOB_MAGIC = b"TPFG"
+
+def cache_version():
+    # Changes whenever main.py, the images it loads or pygame change
+    digest = hashlib.sha1(pygame.version.ver.encode())
+    with open(os.path.abspath(__file__), "rb") as f:
+        digest.update(f.read())
+    images = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+    if os.path.isdir(images):
+        for name in sorted(os.listdir(images)):
+            stat = os.stat(os.path.join(images, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+class DiskCache:
+    def __init__(self, root, version):
+        self.root = root
+        self.version = version
+        self.directory = os.path.join(root, version)
+        self.enabled = True
+        self.ready = False  # Old versions removed and the directory made
+        self.loaded = 0
+        self.stored = 0
+
+    def prepare(self):
+        # Done on first use, blobs from other versions can't be used any more
+        self.ready = True
+        try:
+            if os.path.isdir(self.root):
+                for name in os.listdir(self.root):
+                    if name != self.version:
+                        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            print(f"Disk cache disabled: {e}")
+            self.enabled = False
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".bin")
+
+    def get(self, key, build):
+        # Surface for key, baked with build() and stored if it isn't on disk yet
+        if self.enabled and not self.ready:
+            self.prepare()
+        if not self.enabled:
+            return build()
+        surface = self.load(key)
+        if surface is None:
+            surface = build()
+            self.store(key, surface)
+        return surface
+
+    def load(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            surface = self.decode(blob)
+        finally:
+            blob.close()  # An open mapping would keep Windows from replacing or deleting the file
+        if surface is not None:
+            self.loaded += 1
+        return surface
+
+    def decode(self, blob):
+        if len(blob) < BLOB_HEADER.size:
+            return None
+        magic, width, height, alpha, has_colorkey, *colorkey = BLOB_HEADER.unpack_from(blob)
+        if magic != BLOB_MAGIC or len(blob) != BLOB_HEADER.size + width * height * (4 if alpha else 3):
+            return None
+        # Read straight from the mapped file, then copied into a surface of its own: the mapping is read-only
+        # and closed right after
+        pixels = pygame.image.frombuffer(memoryview(blob)[BLOB_HEADER.size:], (width, height),
+                                         "RGBA" if alpha else "RGB")
+        if alpha:
+            surface = pixels.convert_alpha() if pygame.display.get_surface() else pixels.copy()
+        else:
+            surface = pixels.convert(screen)
+            if has_colorkey:
+                surface.set_colorkey(colorkey, pygame.RLEACCEL)
+        return surface
+
+    def store(self, key, surface):
+        alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+        colorkey = surface.get_colorkey()
+        header = BLOB_HEADER.pack(BLOB_MAGIC, surface.get_width(), surface.get_height(), alpha,
+                                  colorkey is not None, *(colorkey or (0, 0, 0))[:3])
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"  # Two games on one machine (e.g. netplay) may store the same blob
+        try:
+            # Written next to the blob and renamed, so a blob is never seen half written
+            with open(temporary, "wb") as f:
+                f.write(header)
+                f.write(pygame.image.tobytes(surface, "RGBA" if alpha else "RGB"))
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Disk cache disabled: {e}")
+            self.enabled = False
+            return
+        self.stored += 1
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.ready = False
+
+    def report(self):
+        return f"Disk cache: {self.loaded} surfaces loaded, {self.stored} stored in {self.directory}"
+
+disk_cache = DiskCache(CACHE_ROOT, cache_version())
+if "--clear-cache" in sys.argv:
+    disk_cache.clear()
+    print(f"Disk cache cleared: {CACHE_ROOT}")
+
+# Every image asset is packed into one atlas surface, converted to the display format once
+class AssetAtlas:
+    def __init__(self, directory, width=256, padding=1):
+        self.directory = directory
+        self.width = width  # Atlas width, rows are added as needed
+        self.padding = padding
+        self.assets = {}  # name -> (file name, size or None, fallback surface or None)
+        self.surface = None
+        self.regions = {}  # name -> Rect in the atlas
+        self.handles = {}  # name -> subsurface of the atlas
+
+    def add(self, name, filename, size=None, fallback=None):
+        # Register an image, all of them are loaded when the atlas is first used
+        self.assets[name] = (filename, size, fallback)
+        self.surface = None
+
+    def load(self):
+        images = {}
+        for name, (filename, size, fallback) in self.assets.items():
+            path = os.path.join(self.directory, filename)
+            try:
+                image = pygame.image.load(path)
+                if size:
+                    image = pygame.transform.scale(image, size)
+            except:
+                if fallback is None:
+                    print(f"Could not load image: {path}")
+                    continue
+                image = fallback
+            images[name] = image
+        return images
+
+    def build(self):
+        # Pack the images in rows, tallest first
+        images = self.load()
+        self.regions = {}
+        self.handles = {}
+        x = y = row_height = 0
+        for name in sorted(images, key=lambda name: images[name].get_height(), reverse=True):
+            width, height = images[name].get_size()
+            if x and x + width > self.width:
+                x = 0
+                y += row_height + self.padding
+                row_height = 0
+            self.regions[name] = pygame.Rect(x, y, width, height)
+            x += width + self.padding
+            row_height = max(row_height, height)
+        
+        atlas_width = max([self.width] + [rect.right for rect in self.regions.values()])
+        atlas = pygame.Surface((atlas_width, max(1, y + row_height)), pygame.SRCALPHA)
+        for name, rect in self.regions.items():
+            atlas.blit(images[name], rect)
+        # Converting needs a display surface, which the SDL2 backend does not have
+        self.surface = atlas.convert_alpha() if pygame.display.get_surface() else atlas
+
+    def get(self, name):
+        # Subsurface handle for an image, None if it could not be loaded
+        if self.surface is None:
+            self.build()
+        handle = self.handles.get(name)
+        if handle is None and name in self.regions:
+            handle = self.surface.subsurface(self.regions[name])
+            self.handles[name] = handle
+        return handle
+
+assets = AssetAtlas(os.path.join(os.path.dirname(os.path.abspath(__file__)), "images"))
+
+# Weapon images, colored rectangles are used if they don't exist
+assets.add("sword", "sword.png", fallback=create_weapon_surface((192, 192, 192)))  # Silver color for sword
+assets.add("bow", "bow.png", fallback=create_weapon_surface((139, 69, 19)))  # Brown color for bow
+assets.add("spear", "spear.png", fallback=create_weapon_surface((218, 165, 32)))  # Golden color for spear
+assets.add("shield", "shield.png", fallback=create_weapon_surface((128, 128, 128)))  # Gray color for shield
 
 # Load sound effects
 try:
@@ -176,6 +685,15 @@ except Exception as e:
     button_click_sound = DummySound()
     hurt_sound = DummySound()
 
+# Sounds for the simulation's events
+GAME_SOUNDS = {
+    "jump": jump_sound,
+    "sword_swing": sword_swing_sound,
+    "bow_hit": bow_hit_sound,
+    "spear_hit": spear_hit_sound,
+    "hurt": hurt_sound,
+}
+
 # Colors
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -192,13 +710,12 @@ SKY_BOTTOM = (200, 230, 255)   # Very light blue
 # Constants
 GRAVITY = 0.8
 
-# Cloud class
+# Cloud class (art for the ambient sky sprites)
 class Cloud:
-    def __init__(self, x, y):
+    def __init__(self, x, y, size=1.0):
         self.x = x
         self.y = y
-        self.speed = random.uniform(0.2, 0.5)
-        self.size = random.uniform(0.8, 1.2)
+        self.size = size
         
     def draw(self, window):
         # Draw a fluffy cloud using multiple circles
@@ -214,41 +731,25 @@ class Cloud:
         # Top puffs
         pygame.draw.circle(window, cloud_color, (int(center_x - 10 * self.size), int(center_y - 15 * self.size)), int(20 * self.size))
         pygame.draw.circle(window, cloud_color, (int(center_x + 10 * self.size), int(center_y - 15 * self.size)), int(20 * self.size))
-    
-    def move(self):
-        self.x += self.speed
-        if self.x > WINDOW_WIDTH + 100:
-            self.x = -100
 
-# Create some clouds
-clouds = [
-    Cloud(random.randint(0, WINDOW_WIDTH), random.randint(50, 200)) 
-    for _ in range(5)
+
+# Bird colors (main, dark)
+BIRD_COLORS = [
+    ((255, 0, 0), (200, 0, 0)),      # Red bird
+    ((0, 100, 255), (0, 50, 200)),   # Blue bird
+    ((255, 200, 0), (200, 150, 0)),  # Yellow bird
+    ((0, 200, 0), (0, 150, 0)),      # Green bird
+    ((255, 165, 0), (200, 130, 0))   # Orange bird
 ]
 
+# Bird class (art for the ambient sky sprites)
 class Bird:
-    def __init__(self, x, y):
+    def __init__(self, x, y, size=1.0, colors=BIRD_COLORS[0], wing_angle=0):
         self.x = x
         self.y = y
-        self.speed = random.uniform(2, 4)
-        self.wing_angle = 0
-        self.flap_speed = random.uniform(0.2, 0.3)
-        self.size = random.uniform(0.8, 1.2)
-        # Random bird colors
-        self.colors = random.choice([
-            ((255, 0, 0), (200, 0, 0)),      # Red bird
-            ((0, 100, 255), (0, 50, 200)),   # Blue bird
-            ((255, 200, 0), (200, 150, 0)),  # Yellow bird
-            ((0, 200, 0), (0, 150, 0)),      # Green bird
-            ((255, 165, 0), (200, 130, 0))   # Orange bird
-        ])
-        
-    def move(self):
-        self.x += self.speed
-        self.wing_angle = math.sin(pygame.time.get_ticks() * self.flap_speed) * 30
-        if self.x > WINDOW_WIDTH + 50:
-            self.x = -50
-            self.y = random.randint(50, 200)
+        self.wing_angle = wing_angle
+        self.size = size
+        self.colors = colors
     
     def draw(self, window):
         main_color, dark_color = self.colors
@@ -294,40 +795,19 @@ class Bird:
         ]
         pygame.draw.polygon(window, dark_color, left_wing)
 
+
+# Airplane class (art for the ambient sky sprites, the trail is baked separately)
 class Airplane:
-    def __init__(self, x, y):
+    def __init__(self, x, y, size=2.0, light_blink=0):
         self.x = x
         self.y = y
-        self.speed = random.uniform(4, 6)  # Increased speed range
-        self.size = random.uniform(2.0, 2.5)  # Reduced size but still larger than birds (birds are around 0.8-1.2)
-        self.trail_points = []
+        self.size = size
         self.window_color = (220, 220, 220)
         # Add lights
         self.light_color = (255, 0, 0)  # Red navigation light
-        self.light_blink = 0
-        
-    def move(self):
-        self.x += self.speed
-        # Blink lights
-        self.light_blink = (self.light_blink + 1) % 60  # Blink every 60 frames
-        
-        # Add trail point
-        self.trail_points.append((self.x - 80 * self.size, self.y))
-        if len(self.trail_points) > 30:
-            self.trail_points.pop(0)
-        if self.x > WINDOW_WIDTH + 200:
-            self.x = -200
-            self.y = random.randint(30, 170)
-            self.trail_points = []
-            self.size = random.uniform(2.0, 2.5)
+        self.light_blink = light_blink
     
     def draw(self, window):
-        # Draw trail
-        for i, point in enumerate(self.trail_points):
-            alpha = i / len(self.trail_points)
-            color = (255, 255, 255, int(alpha * 255))
-            pygame.draw.circle(window, color, (int(point[0]), int(point[1])), 2)
-        
         # Main body (fuselage) - metallic silver color
         pygame.draw.rect(window, (192, 192, 192), 
                         (self.x - 40 * self.size, self.y - 10 * self.size, 
@@ -384,54 +864,237 @@ class Airplane:
             pygame.draw.circle(window, (255, 255, 255),  # White light
                              (int(self.x - 40 * self.size), int(self.y - 25 * self.size)), 3)
 
-# Create birds and airplanes
-birds = [Bird(random.randint(0, WINDOW_WIDTH), random.randint(50, 200)) 
-         for _ in range(5)]
-airplanes = [
-    Airplane(-100 if random.random() < 0.5 else WINDOW_WIDTH + 100, 
-             random.randint(50, 150))
-    for _ in range(8)  # Increased from original number
-]
-
-# Function to add new airplanes periodically
-def add_new_airplane():
-    if len(airplanes) < 8:  # Keep maximum 8 airplanes
-        # Randomly choose left or right side for new airplane
-        x = -100 if random.random() < 0.5 else WINDOW_WIDTH + 100
-        y = random.randint(50, 150)
-        airplanes.append(Airplane(x, y))
-
-def draw_sky(window):
-    # Draw sky gradient
-    for y in range(WINDOW_HEIGHT):
-        factor = y / WINDOW_HEIGHT
-        color = (
-            int(SKY_TOP[0] * (1 - factor) + SKY_BOTTOM[0] * factor),
-            int(SKY_TOP[1] * (1 - factor) + SKY_BOTTOM[1] * factor),
-            int(SKY_TOP[2] * (1 - factor) + SKY_BOTTOM[2] * factor)
-        )
-        pygame.draw.line(window, color, (0, y), (WINDOW_WIDTH, y))
-    
-    # Draw clouds
-    for cloud in clouds:
-        cloud.draw(window)
-        cloud.move()
-    
-    # Draw birds
-    for bird in birds:
-        bird.draw(window)
-        bird.move()
-    
-    # Draw airplanes with much higher chance of appearing
-    for airplane in airplanes:
-        if airplane.x <= -200 and random.random() < 0.15:  # Increased chance to 15%
-            airplane.x = -200
-            airplane.y = random.randint(30, 170)  # Wider height range
-            # Randomize size slightly each time
-            airplane.size = random.uniform(2.0, 2.5)
-        if airplane.x > -200:  # Only draw and move if airplane is active
-            airplane.draw(window)
-            airplane.move()
+# Ambient sky life: actor positions live in arrays, drawn with pre-rendered sprites
+CLOUD_COUNT = 5
+BIRD_COUNT = 5
+AIRPLANE_COUNT = 8
+SIZE_BUCKET = 0.1  # Actor sizes are rounded to this step so actors can share sprites
+WING_FRAMES = 8  # Baked wing positions per bird
+TRAIL_LENGTH = 30  # Dots in an airplane trail
+AIRPLANE_BLINK = 60  # Frames per navigation light cycle
+
+CLOUD = 0
+BIRD = 1
+AIRPLANE = 2
+
+class AmbientLife:
+    def __init__(self, width, height, clouds=CLOUD_COUNT, birds=BIRD_COUNT, airplanes=AIRPLANE_COUNT):
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(simulation.stream_seed(SEED, "sky"))
+        self.sprites = {}  # (kind, size bucket, variant) -> (sprite, offset from the actor's position)
+        self.trails = {}  # dot spacing -> baked trail texture
+        rng = self.rng
+        
+        self.cloud_x = rng.integers(0, width + 1, clouds).astype(np.float32)
+        self.cloud_y = rng.integers(50, 201, clouds).astype(np.float32)
+        self.cloud_speed = rng.uniform(0.2, 0.5, clouds).astype(np.float32)
+        self.cloud_size = self.bucket(rng.uniform(0.8, 1.2, clouds))
+        
+        self.bird_x = rng.integers(0, width + 1, birds).astype(np.float32)
+        self.bird_y = rng.integers(50, 201, birds).astype(np.float32)
+        self.bird_speed = rng.uniform(2, 4, birds).astype(np.float32)
+        self.bird_flap = rng.uniform(0.2, 0.3, birds)
+        self.bird_size = self.bucket(rng.uniform(0.8, 1.2, birds))
+        self.bird_color = rng.integers(0, len(BIRD_COLORS), birds)
+        
+        self.plane_x = np.where(rng.random(airplanes) < 0.5, -100, width + 100).astype(np.float32)
+        self.plane_y = rng.integers(50, 151, airplanes).astype(np.float32)
+        self.plane_speed = rng.uniform(4, 6, airplanes).astype(np.float32)  # Increased speed range
+        self.plane_size = self.bucket(rng.uniform(2.0, 2.5, airplanes))  # Still larger than birds
+        self.plane_blink = np.zeros(airplanes, np.int32)
+        self.plane_trail = np.zeros(airplanes, np.int32)  # Trail dots laid so far
+        self.plane_active = np.ones(airplanes, np.bool_)
+        self.flap_ticks = 0  # Time the wings were last moved
+        self.drawn = []  # Instances from the last draw
+        self.bird_limit = birds  # How many birds and airplanes are shown, lowered by the quality governor
+        self.plane_limit = airplanes
+
+    def bucket(self, size):
+        return np.round(np.asarray(size) / SIZE_BUCKET).astype(np.int32)
+
+    def get(self, kind, bucket, variant):
+        key = (kind, bucket, variant)
+        entry = self.sprites.get(key)
+        if entry is None:
+            size = to_canvas(bucket * SIZE_BUCKET)  # Drawn straight at the canvas resolution
+            reach = int(140 * size) + 4
+            canvas = pygame.Surface((reach * 2, reach * 2))
+            canvas.fill((255, 0, 255))
+            canvas.set_colorkey((255, 0, 255))
+            if kind == CLOUD:
+                art = Cloud(reach, reach, size)
+            elif kind == BIRD:
+                color, frame = variant
+                wing_angle = -30 + 60 * frame / (WING_FRAMES - 1)
+                art = Bird(reach, reach, size, BIRD_COLORS[color], wing_angle)
+            else:
+                art = Airplane(reach, reach, size, light_blink=0 if variant else AIRPLANE_BLINK // 2)
+            art.draw(canvas)
+            # Keep only the drawn pixels
+            bounds = canvas.get_bounding_rect()
+            sprite = canvas.subsurface(bounds).copy()
+            sprite.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+            entry = (sprite, (bounds.x - reach, bounds.y - reach))
+            self.sprites[key] = entry
+        return entry
+
+    def get_trail(self, spacing):
+        # White dots spaced the distance a plane flies per frame, newest dot on the right
+        trail = self.trails.get(spacing)
+        if trail is None:
+            step, radius = to_canvas(spacing), canvas_length(2)
+            trail = pygame.Surface((round((TRAIL_LENGTH - 1) * step) + 2 * radius + 1, 2 * radius + 1))
+            trail.fill((255, 0, 255))
+            for i in range(TRAIL_LENGTH):
+                pygame.draw.circle(trail, (255, 255, 255), (radius + round(i * step), radius), radius)
+            trail.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+            self.trails[spacing] = trail
+        return trail
+
+    def wing_frames(self):
+        angle = np.sin(self.flap_ticks * self.bird_flap) * 30
+        return np.round((angle + 30) / 60 * (WING_FRAMES - 1)).astype(np.int32)
+
+    def instances(self):
+        # (sprite, position, area, key) for every actor on screen, back to front
+        result = []
+        for i, (x, y, size) in enumerate(zip(self.cloud_x.tolist(), self.cloud_y.tolist(),
+                                             self.cloud_size.tolist())):
+            sprite, offset = self.get(CLOUD, size, None)
+            result.append((sprite, (int(to_canvas(x)) + offset[0], int(to_canvas(y)) + offset[1]), None, (CLOUD, i)))
+        
+        frames = self.wing_frames()
+        for i, (x, y, size, color, frame) in enumerate(zip(
+                self.bird_x.tolist(), self.bird_y.tolist(), self.bird_size.tolist(),
+                self.bird_color.tolist(), frames.tolist())):
+            if i >= self.bird_limit:
+                break
+            sprite, offset = self.get(BIRD, size, (color, frame))
+            result.append((sprite, (int(to_canvas(x)) + offset[0], int(to_canvas(y)) + offset[1]), None, (BIRD, i)))
+        
+        for i in np.flatnonzero(self.plane_active)[:self.plane_limit].tolist():
+            x = int(self.plane_x[i])
+            y = int(self.plane_y[i])
+            size = int(self.plane_size[i])
+            dots = int(self.plane_trail[i])
+            if dots:
+                spacing = int(round(float(self.plane_speed[i])))
+                trail = self.get_trail(spacing)
+                width = trail.get_width() - round((TRAIL_LENGTH - dots) * to_canvas(spacing))
+                area = pygame.Rect(trail.get_width() - width, 0, width, trail.get_height())
+                result.append((trail, (int(to_canvas(x - 80 * size * SIZE_BUCKET)) + canvas_length(3) - width,
+                                       int(to_canvas(y)) - canvas_length(2)), area, (AIRPLANE, i, "trail")))
+            sprite, offset = self.get(AIRPLANE, size, int(self.plane_blink[i]) < AIRPLANE_BLINK // 2)
+            result.append((sprite, (int(to_canvas(x)) + offset[0], int(to_canvas(y)) + offset[1]), None, (AIRPLANE, i)))
+        view = canvas_rect((0, 0, self.width, self.height))
+        return [instance for instance in result
+                if view.colliderect(instance[1], instance[2].size if instance[2] else instance[0].get_size())]
+
+    def draw(self, window, respawn_chance=0, frames=1):
+        # frames=0 draws the same picture as last time without moving anything
+        if frames:
+            self.drawn = self.instances()
+        window.blits([(sprite, position, area) if area else (sprite, position)
+                      for sprite, position, area, key in self.drawn], False)
+        if frames:
+            self.update(respawn_chance, frames)
+
+    def update(self, respawn_chance=0, frames=1):
+        # Move everything by the given number of 60 Hz frames
+        rng = self.rng
+        self.cloud_x += self.cloud_speed * frames
+        self.cloud_x[self.cloud_x > self.width + 100] = -100
+        
+        self.bird_x += self.bird_speed * frames
+        wrapped = np.flatnonzero(self.bird_x > self.width + 50)
+        self.bird_x[wrapped] = -50
+        self.bird_y[wrapped] = rng.integers(50, 201, len(wrapped))
+        self.flap_ticks = pygame.time.get_ticks()
+        
+        active = self.plane_active
+        self.plane_x[active] += self.plane_speed[active] * frames
+        self.plane_blink[active] = (self.plane_blink[active] + frames) % AIRPLANE_BLINK
+        self.plane_trail[active] = np.minimum(self.plane_trail[active] + frames, TRAIL_LENGTH)
+        gone = active & (self.plane_x > self.width + 200)
+        self.plane_active[gone] = False
+        
+        # Parked airplanes come back in from the left
+        if respawn_chance:
+            idle = np.flatnonzero(~self.plane_active)
+            back = idle[rng.random(len(idle)) < 1 - (1 - respawn_chance) ** frames]
+            self.launch(back, -200, rng.integers(30, 171, len(back)))
+
+    def launch(self, planes, x, y):
+        self.plane_x[planes] = x
+        self.plane_y[planes] = y
+        self.plane_size[planes] = self.bucket(self.rng.uniform(2.0, 2.5, len(planes)))
+        self.plane_blink[planes] = 0
+        self.plane_trail[planes] = 0
+        self.plane_active[planes] = True
+
+    def add_airplane(self):
+        # Send a parked airplane in from either side
+        idle = np.flatnonzero(~self.plane_active)
+        if len(idle):
+            x = -100 if random.random() < 0.5 else self.width + 100
+            self.launch(idle[:1], x, random.randint(50, 150))
+
+    def clear_clouds(self):
+        self.cloud_x = self.cloud_x[:0]
+        self.cloud_y = self.cloud_y[:0]
+        self.cloud_speed = self.cloud_speed[:0]
+        self.cloud_size = self.cloud_size[:0]
+
+    def track(self, renderer, redraw=True):
+        # Without a redraw the last drawing stays on screen
+        for sprite, position, area, key in (self.instances() if redraw else self.drawn):
+            size = area.size if area else sprite.get_size()
+            renderer.track(key, pygame.Rect(position, size), (position, sprite))
+
+sky_life = AmbientLife(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+# Sky gradient cache
+class SkyGradientCache:
+    def __init__(self):
+        self.key = None  # (map name, top color, bottom color, width, height)
+        self.surface = None
+        self.builds = 0  # How many times the gradient had to be baked
+
+    def get(self, game_map, width, height):
+        top = getattr(game_map, "sky_top", SKY_TOP)
+        bottom = getattr(game_map, "sky_bottom", SKY_BOTTOM)
+        key = (game_map.name, top, bottom, width, height)
+        if key != self.key:
+            self.surface = disk_cache.get(("sky",) + key[1:], lambda: self.build(top, bottom, width, height))
+            self.key = key
+            self.builds += 1
+        return self.surface
+
+    def build(self, top, bottom, width, height):
+        # Bake one pixel wide column, then stretch it to the window width
+        column = pygame.Surface((1, height))
+        for y in range(height):
+            factor = y / height
+            column.set_at((0, y), (
+                int(top[0] * (1 - factor) + bottom[0] * factor),
+                int(top[1] * (1 - factor) + bottom[1] * factor),
+                int(top[2] * (1 - factor) + bottom[2] * factor)
+            ))
+        return pygame.transform.scale(column, (width, height)).convert(screen)
+
+    def clear(self):
+        self.key = None
+        self.surface = None
+
+sky_gradient_cache = SkyGradientCache()
+
+def draw_sky(window, game_map=None):
+    # Draw sky gradient (baked once per map and render scale)
+    if game_map is None:
+        game_map = game_options.current_map
+    width, height = window.get_size()
+    display.copy(window, sky_gradient_cache.get(game_map, width, height), (0, 0))
 
 class Mountain:
     def __init__(self, x, height):
@@ -447,7 +1110,7 @@ class Mountain:
         
     def draw(self, window):
         # Draw mountain body
-        pygame.draw.polygon(window, self.color, self.points)
+        pygame.draw.polygon(window, self.color, canvas_points(self.points))
         
         # Draw snow cap
         snow_points = [
@@ -457,993 +1120,352 @@ class Mountain:
             (self.points[2][0] - (self.points[2][0] - self.points[1][0]) * 0.3, 
              WINDOW_HEIGHT - self.height + self.snow_line)
         ]
-        pygame.draw.polygon(window, WHITE, snow_points)
+        pygame.draw.polygon(window, WHITE, canvas_points(snow_points))
 
-# Bench class
-class Bench:
+# Bench class, collisions are handled by the simulation
+class Bench(simulation.Bench):
     def __init__(self, x, y, width, height):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.rect = pygame.Rect(x, y, width, height)
+        super().__init__(x, y, width, height)
         self.color = (139, 69, 19)  # Brown color for wooden bench
 
     def draw(self, window):
         # Draw main bench seat
-        pygame.draw.rect(window, self.color, (self.x, self.y, self.width, self.height))
+        pygame.draw.rect(window, self.color, canvas_rect((self.x, self.y, self.width, self.height)))
         # Draw bench legs
         leg_width = 10
         leg_height = 20
-        pygame.draw.rect(window, self.color, (self.x + 10, self.y + self.height, leg_width, leg_height))
-        pygame.draw.rect(window, self.color, (self.x + self.width - 20, self.y + self.height, leg_width, leg_height))
-
-    def check_collision(self, player):
-        # Check if player's feet are near the platform
-        player_feet = player.y + player.height
-        player_center = player.x
-        
-        # Check if player is within horizontal bounds of bench
-        if self.x <= player_center <= self.x + self.width:
-            # Check if player is at the right height to land
-            if self.y - 5 <= player_feet <= self.y + 5:
-                if player.dy >= 0:  # Only if falling or standing
-                    player.y = self.y - player.height
-                    player.dy = 0
-                    player.is_jumping = False
-                    player.on_platform = True
-                    player.current_platform = self
-                    return True
-            # Check if player hits bottom of platform when jumping
-            elif player.dy < 0 and player_feet < self.y + self.height:
-                if abs(player_feet - (self.y + self.height)) < 10:
-                    player.dy = 0
-        
-        # If player walks off platform
-        if player.current_platform == self:
-            if not (self.x <= player_center <= self.x + self.width):
-                player.on_platform = False
-                player.current_platform = None
-        
-        return False
+        pygame.draw.rect(window, self.color, canvas_rect((self.x + 10, self.y + self.height, leg_width, leg_height)))
+        pygame.draw.rect(window, self.color, canvas_rect((self.x + self.width - 20, self.y + self.height, leg_width, leg_height)))
+
+# Stick figure body, drawn around the player's position (x, y)
+def draw_stick_figure(surface, x, y, body_color, facing_right, x_eyes, happy,
+                      attacking=False, attack_progress=0):
+    head_radius = 15
+    body_length = 30
+    limb_length = 20
+
+    # Calculate body lean during attack
+    body_lean = 0
+    if attacking:
+        if facing_right:
+            # Right arm follows weapon
+            arm_angle = -math.pi/4 + (attack_progress * math.pi/2)  # Reduced swing
+            pygame.draw.line(surface, body_color,
+                           (x, y - 25),  # Shoulder
+                           (x + limb_length * math.cos(arm_angle), 
+                            y - 25 + limb_length * math.sin(arm_angle)), 2)
+            # Left arm stays back
+            pygame.draw.line(surface, body_color,
+                           (x, y - 25),
+                           (x - limb_length * 0.7, y - 25), 2)
+        else:
+            # Left arm follows weapon
+            arm_angle = -math.pi/4 + (attack_progress * math.pi/2)
+            pygame.draw.line(surface, body_color,
+                           (x, y - 25),
+                           (x - limb_length * math.cos(arm_angle), 
+                            y - 25 + limb_length * math.sin(arm_angle)), 2)
+            # Right arm stays back
+            pygame.draw.line(surface, body_color,
+                           (x, y - 25),
+                           (x + limb_length * 0.7, y - 25), 2)
+    else:
+        # Normal arm positions
+        arm_angle = math.pi/6
+        pygame.draw.line(surface, body_color,
+                       (x, y - 25),
+                       (x + limb_length * math.cos(arm_angle), 
+                        y - 25 + limb_length * math.sin(arm_angle)), 2)
+        pygame.draw.line(surface, body_color,
+                       (x, y - 25),
+                       (x - limb_length * math.cos(arm_angle), 
+                        y - 25 + limb_length * math.sin(arm_angle)), 2)
+
+    # Draw head with lean
+    head_x = int(x + body_lean/2)
+    head_y = int(y - 25)
+    pygame.draw.circle(surface, body_color, (head_x, head_y), head_radius)
+
+    # Draw body (vertical line) with lean
+    pygame.draw.line(surface, body_color, 
+                    (head_x, head_y + 15),  # Top of body (below head)
+                    (int(x - body_lean/2), y + 20), 2)  # Bottom of body
+
+    # Eye positions based on facing direction
+    if facing_right:
+        left_eye_x = head_x - 6
+        right_eye_x = head_x + 6
+    else:
+        left_eye_x = head_x + 6
+        right_eye_x = head_x - 6
+
+    # Draw expressions
+    if x_eyes:
+        # X eyes
+        pygame.draw.line(surface, (0, 0, 0), (left_eye_x - 2, head_y - 2), (left_eye_x + 2, head_y + 2), 2)
+        pygame.draw.line(surface, (0, 0, 0), (left_eye_x - 2, head_y + 2), (left_eye_x + 2, head_y - 2), 2)
+        pygame.draw.line(surface, (0, 0, 0), (right_eye_x - 2, head_y - 2), (right_eye_x + 2, head_y + 2), 2)
+        pygame.draw.line(surface, (0, 0, 0), (right_eye_x - 2, head_y + 2), (right_eye_x + 2, head_y - 2), 2)
+        # Open mouth
+        pygame.draw.ellipse(surface, (0, 0, 0), (head_x - 4, head_y + 3, 8, 6))
+    else:
+        # Normal eyes
+        pygame.draw.circle(surface, (0, 0, 0), (int(left_eye_x), int(head_y)), 2)
+        pygame.draw.circle(surface, (0, 0, 0), (int(right_eye_x), int(head_y)), 2)
+        # Smile or worried expression
+        if happy:
+            pygame.draw.arc(surface, (0, 0, 0), 
+                          (int(head_x - 5), int(head_y), 10, 8),
+                          0, math.pi, 2)
+        else:
+            pygame.draw.arc(surface, (0, 0, 0),
+                          (int(head_x - 5), int(head_y + 3), 10, 8),
+                          math.pi, 2*math.pi, 2)
+
+    # Draw legs
+    leg_angle = math.pi/6
+    hip_x = int(x - body_lean/2)
+    hip_y = y + 20
+    
+    # Right leg
+    pygame.draw.line(surface, body_color,
+                    (hip_x, hip_y),
+                    (hip_x + limb_length * math.cos(leg_angle),
+                     hip_y + limb_length * math.sin(leg_angle)), 2)
+    # Left leg
+    pygame.draw.line(surface, body_color,
+                    (hip_x, hip_y),
+                    (hip_x - limb_length * math.cos(leg_angle),
+                     hip_y + limb_length * math.sin(leg_angle)), 2)
+
+# Shield held up while defending, as (surface, offset from the player's position) layers
+def build_shield_layers(facing_right, width, height, gradient=True):
+    layers = []
+    # Shield base
+    shield_size = 40
+    if gradient:
+        shield_surface = pygame.Surface((shield_size, height), pygame.SRCALPHA)
+        
+        # Shield gradient (metallic effect)
+        for i in range(height // 2):
+            alpha = 255 - i * 4
+            color = (192, 192, 192, alpha)  # Silver color with fading alpha
+            pygame.draw.rect(shield_surface, color, (0, i, shield_size, 1))
+    else:
+        # Flat silver top half, an opaque blit instead of a per-pixel alpha one
+        shield_surface = pygame.Surface((shield_size, height))
+        shield_surface.fill((255, 0, 255))
+        shield_surface.fill((192, 192, 192), (0, 0, shield_size, height // 2))
+        shield_surface.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+    
+    # Shield border
+    pygame.draw.rect(shield_surface, (128, 128, 128), (0, 0, shield_size, height), 2)
+    
+    # Shield emblem (simple cross)
+    emblem_color = (218, 165, 32)  # Golden color
+    pygame.draw.line(shield_surface, emblem_color, 
+                   (shield_size // 2, 5), 
+                   (shield_size // 2, height - 5), 3)
+    pygame.draw.line(shield_surface, emblem_color, 
+                   (5, height // 2), 
+                   (shield_size - 5, height // 2), 3)
+    
+    # Draw the shield
+    shield_x = (width if facing_right else -shield_size)
+    shield_y = 0
+    layers.append((shield_surface, (shield_x, shield_y)))
+    
+    # Shield slightly smaller and angled
+    shield_color = (192, 192, 192)  # Silver color
+    shield_width = 35  # Shield width
+    shield_height = 50  # Shield height
+    
+    # Create shield surface for rotation
+    shield_surface = pygame.Surface((shield_width, shield_height), pygame.SRCALPHA)
+    
+    # Draw shield base
+    pygame.draw.rect(shield_surface, shield_color, (0, 0, shield_width, shield_height))
+    pygame.draw.rect(shield_surface, (128, 128, 128), (0, 0, shield_width, shield_height), 2)  # Border
+    
+    # Draw shield emblem (cross)
+    emblem_color = (128, 128, 128)  # Darker silver for emblem
+    pygame.draw.line(shield_surface, emblem_color, 
+                   (shield_width//2, 5), 
+                   (shield_width//2, shield_height-5), 3)
+    pygame.draw.line(shield_surface, emblem_color, 
+                   (5, shield_height//2), 
+                   (shield_width-5, shield_height//2), 3)
+    
+    # Position shield relative to player
+    if facing_right:
+        # Shield position when facing right
+        shield_x = width - 15  # Overlap with player
+        shield_y = 5  # Slightly below top
+        # Rotate shield slightly when facing right
+        rotated_shield = pygame.transform.rotate(shield_surface, -15)
+    else:
+        # Shield position when facing left
+        shield_x = -shield_width + 15  # Overlap with player
+        shield_y = 5  # Slightly below top
+        # Rotate shield slightly when facing left
+        rotated_shield = pygame.transform.rotate(shield_surface, 15)
+    
+    # Get the rect of the rotated shield for proper positioning
+    shield_rect = rotated_shield.get_rect(center=(shield_x + shield_width//2, shield_y + shield_height//2))
+    layers.append((rotated_shield, shield_rect.topleft))
+    return layers
+
+# Pre-rendered stick figure poses
+POSE_SPRITE_SIZE = (64, 80)
+POSE_ANCHOR = (32, 42)  # Where the player's (x, y) sits inside a pose sprite
+
+class PoseCache:
+    def __init__(self):
+        self.poses = {}  # pose key -> surface
+        self.shields = {}  # (facing, width, height, gradient) -> shield layers
+        self.shield_gradient = True
+
+    def get(self, body_color, facing_right, x_eyes, happy, attacking, attack_frame, attack_duration):
+        # Attack progress is quantized to the frames of the attack animation
+        if attacking:
+            attack_duration = max(1, attack_duration)
+            frame = min(attack_duration, round(attack_frame))
+        else:
+            attack_duration = frame = 0
+        key = (body_color, facing_right, x_eyes, happy, attacking, frame, attack_duration)
+        pose = self.poses.get(key)
+        if pose is None:
+            pose = disk_cache.get(("pose", RENDER_SCALE) + key, lambda: self.build(*key))
+            self.poses[key] = pose
+        anchor = canvas_pos(POSE_ANCHOR)
+        return pose, (-anchor[0], -anchor[1])
+
+    def build(self, body_color, facing_right, x_eyes, happy, attacking, frame, attack_duration):
+        pose = pygame.Surface(POSE_SPRITE_SIZE, pygame.SRCALPHA)
+        draw_stick_figure(pose, POSE_ANCHOR[0], POSE_ANCHOR[1], body_color, facing_right,
+                          x_eyes, happy, attacking, frame / attack_duration if attacking else 0)
+        return scale_art(pose)
+
+    def get_shield(self, facing_right, width, height):
+        key = (facing_right, width, height, self.shield_gradient)
+        layers = self.shields.get(key)
+        if layers is None:
+            layers = [(scale_art(surface), canvas_pos(offset))
+                      for surface, offset in build_shield_layers(facing_right, width, height, self.shield_gradient)]
+            self.shields[key] = layers
+        return layers
+
+    def memory_bytes(self):
+        surfaces = list(self.poses.values())
+        for layers in self.shields.values():
+            surfaces.extend(surface for surface, offset in layers)
+        return sum(p.get_width() * p.get_height() * p.get_bytesize() for p in surfaces)
+
+fighter_poses = PoseCache()
 
 # Player class
-class Player:
+class Player(simulation.Player):
     def __init__(self, x, y, color, facing_right, controls, player_num):
-        self.x = x
-        self.y = y
-        self.width = 30
-        self.height = 60
+        super().__init__(x, y, facing_right, player_num)
         self.color = color
-        self.facing_right = facing_right
-        self.dx = 0  # Horizontal velocity
-        self.dy = 0  # Vertical velocity
-        self.is_jumping = False
-        self.health = 100
-        self.controls = controls
-        self.attacking = False
-        self.attack_frame = 0  # Add this for attack animation
-        self.attack_duration = 15  # Total frames for attack animation
-        self.attack_cooldown = 0  # Add cooldown counter
-        self.weapon = "sword"  # Default weapon
-        self.arrow = None  # For bow attacks
-        self.speed = 5  # Movement speed
-        self.jump_power = -12  # Reduced jump power
-        self.on_platform = False  # Track if player is on a platform
-        self.current_platform = None  # Track which platform player is on
-        self.last_hit_time = 0  # Add this for hit sound cooldown
-        self.player_num = player_num  # Add this back
-        self.rect = pygame.Rect(x, y, self.width, self.height)  # Add rect for collision detection
-        self.on_ground = False
-        self.can_jump = True  # New variable to control jumping
-        self.jump_cooldown = 0  # New variable for jump cooldown
-        self.max_jump_height = -12  # Maximum upward velocity
-        self.knockback_dx = 0  # Knockback horizontal speed
-        self.knockback_dy = 0  # Knockback vertical speed
-        self.hurt_flash = 0  # Flash white when hurt
-        self.combo_count = 0
-        self.crit_chance = 0.2  # 20% base crit chance
-        self.charge_time = 0
-        self.max_charge = 60  # 1 second max charge
-        self.spear_momentum = 0
-        self.max_momentum = 5
-        self.consecutive_spear_hits = 0
+        self.controls = controls  # Key for each input, see buttons
         self.name = f"P{player_num}"  # Default name
-        self.defending = False  # New defense state
-        self.defense_cooldown = 0  # Cooldown for defense
     
-    def move(self):
-        keys = pygame.key.get_pressed()
+    def buttons(self, keys):
+        # Input frame from the held keys
+        buttons = 0
+        for name, bit in (("left", simulation.LEFT), ("right", simulation.RIGHT), ("up", simulation.UP),
+                          ("defend", simulation.DEFEND)):
+            if keys[self.controls[name]]:
+                buttons |= bit
+        return buttons
+
+    def draw(self, screen, camera_x=0):
+        x = self.x - camera_x  # Position on screen
         
-        # Handle defense
-        if keys[self.controls['defend']]:
-            self.defending = True
-            self.dx = 0  # Can't move while defending
-        else:
-            self.defending = False
-            
-        if not self.defending:  # Only allow movement if not defending
-            # Reset horizontal velocity
-            self.dx = 0
-            
-            # Player 1 controls
-            if self.player_num == 1:
-                if keys[pygame.K_a]:
-                    self.dx = -self.speed
-                    self.facing_right = False
-                if keys[pygame.K_d]:
-                    self.dx = self.speed
-                    self.facing_right = True
-                if keys[pygame.K_w] and self.on_ground:
-                    self.dy = -15  # Jump power
-                    self.on_ground = False
-            # Player 2 controls
-            else:
-                if keys[pygame.K_LEFT]:
-                    self.dx = -self.speed
-                    self.facing_right = False
-                if keys[pygame.K_RIGHT]:
-                    self.dx = self.speed
-                    self.facing_right = True
-                if keys[pygame.K_UP] and self.on_ground:
-                    self.dy = -15  # Jump power
-                    self.on_ground = False
-        
-        # Apply gravity
-        if not self.on_ground:
-            self.dy += 0.8  # Gravity
-        
-        # Apply movement
-        self.x += self.dx + self.knockback_dx
-        self.y += self.dy + self.knockback_dy
-        
-        # Reduce knockback
-        self.knockback_dx *= 0.8
-        self.knockback_dy *= 0.8
-        
-        # Keep in bounds
-        if self.x < 0:
-            self.x = 0
-        elif self.x > WINDOW_WIDTH - self.width:
-            self.x = WINDOW_WIDTH - self.width
-            
-        # Ground collision
-        if self.y > WINDOW_HEIGHT - 20 - self.height:  # Ground is 20 pixels high
-            self.y = WINDOW_HEIGHT - 20 - self.height
-            self.dy = 0
-            self.on_ground = True
-    
-    def update(self):
-        # Apply stronger gravity
-        if not self.on_ground:
-            self.dy += 0.8  # Increased gravity
-        self.y += self.dy
-        
-        # Update rect position
-        self.rect.x = self.x
-        self.rect.y = self.y
-        
-        # Keep player in bounds
-        if self.y > WINDOW_HEIGHT - 20 - self.height:
-            self.y = WINDOW_HEIGHT - 20 - self.height
-            self.dy = 0
-            self.on_ground = True
-        
-        # Check platform collisions
-        self.on_ground = False
-        for platform in platforms:
-            if self.rect.colliderect(platform):
-                if self.dy > 0:  # Falling
-                    self.rect.bottom = platform.top
-                    self.y = self.rect.y
-                    self.dy = 0
-                    self.on_ground = True
-                    break
-        
-        # Update attack cooldown
-        if self.attack_cooldown > 0:
-            self.attack_cooldown -= 1
-        
-        # Update hurt flash
-        if self.hurt_flash > 0:
-            self.hurt_flash -= 1
-    
-    def draw(self, screen):
         # Draw name above health bar
-        name_font = pygame.font.Font(None, 24)
-        name_text = name_font.render(self.name, True, (0, 0, 0))
-        name_rect = name_text.get_rect(centerx=self.x, bottom=self.y - 45)  # Position above health bar
+        name_font = get_font(24)
+        name_text = render_text(name_font, self.name, (0, 0, 0))
+        name_rect = name_text.get_rect(centerx=to_canvas(x), bottom=to_canvas(self.y - 45))  # Position above health bar
         screen.blit(name_text, name_rect)
         
         # Draw body
         body_color = self.color
         if self.hurt_flash > 0:
-            body_color = (255, 255, 255)  # Flash white when hurt
-            self.hurt_flash -= 1
-
-        # Draw stick figure
-        head_radius = 15
-        body_length = 30
-        limb_length = 20
-
-        # Calculate body lean during attack
-        body_lean = 0
-        if self.attacking:
-            attack_progress = min(1.0, self.attack_frame / max(1, self.attack_duration))
-            
-            if self.facing_right:
-                # Right arm follows weapon
-                arm_angle = -math.pi/4 + (attack_progress * math.pi/2)  # Reduced swing
-                pygame.draw.line(screen, body_color,
-                               (self.x, self.y - 25),  # Shoulder
-                               (self.x + limb_length * math.cos(arm_angle), 
-                                self.y - 25 + limb_length * math.sin(arm_angle)), 2)
-                # Left arm stays back
-                pygame.draw.line(screen, body_color,
-                               (self.x, self.y - 25),
-                               (self.x - limb_length * 0.7, self.y - 25), 2)
-            else:
-                # Left arm follows weapon
-                arm_angle = -math.pi/4 + (attack_progress * math.pi/2)
-                pygame.draw.line(screen, body_color,
-                               (self.x, self.y - 25),
-                               (self.x - limb_length * math.cos(arm_angle), 
-                                self.y - 25 + limb_length * math.sin(arm_angle)), 2)
-                # Right arm stays back
-                pygame.draw.line(screen, body_color,
-                               (self.x, self.y - 25),
-                               (self.x + limb_length * 0.7, self.y - 25), 2)
-        else:
-            # Normal arm positions
-            arm_angle = math.pi/6
-            pygame.draw.line(screen, body_color,
-                           (self.x, self.y - 25),
-                           (self.x + limb_length * math.cos(arm_angle), 
-                            self.y - 25 + limb_length * math.sin(arm_angle)), 2)
-            pygame.draw.line(screen, body_color,
-                           (self.x, self.y - 25),
-                           (self.x - limb_length * math.cos(arm_angle), 
-                            self.y - 25 + limb_length * math.sin(arm_angle)), 2)
-
-        # Draw head with lean
-        head_x = int(self.x + body_lean/2)
-        head_y = int(self.y - 25)
-        pygame.draw.circle(screen, body_color, (head_x, head_y), head_radius)
-
-        # Draw body (vertical line) with lean
-        pygame.draw.line(screen, body_color, 
-                        (head_x, head_y + 15),  # Top of body (below head)
-                        (int(self.x - body_lean/2), self.y + 20), 2)  # Bottom of body
-
-        # Eye positions based on facing direction
-        if self.facing_right:
-            left_eye_x = head_x - 6
-            right_eye_x = head_x + 6
-        else:
-            left_eye_x = head_x + 6
-            right_eye_x = head_x - 6
+            body_color = (255, 255, 255)  # Flash white when hurt (counted down in update)
+
+        # Draw stick figure from the pose cache
+        pose, offset = fighter_poses.get(body_color, self.facing_right, self.hurt_flash > 0,
+                                         self.health > 50, self.attacking,
+                                         self.attack_frame, self.attack_duration)
+        display.copy(screen, pose, (int(to_canvas(x)) + offset[0], int(to_canvas(self.y)) + offset[1]))
 
-        # Draw expressions
-        if self.hurt_flash > 0:
-            # X eyes
-            pygame.draw.line(screen, (0, 0, 0), (left_eye_x - 2, head_y - 2), (left_eye_x + 2, head_y + 2), 2)
-            pygame.draw.line(screen, (0, 0, 0), (left_eye_x - 2, head_y + 2), (left_eye_x + 2, head_y - 2), 2)
-            pygame.draw.line(screen, (0, 0, 0), (right_eye_x - 2, head_y - 2), (right_eye_x + 2, head_y + 2), 2)
-            pygame.draw.line(screen, (0, 0, 0), (right_eye_x - 2, head_y + 2), (right_eye_x + 2, head_y - 2), 2)
-            # Open mouth
-            pygame.draw.ellipse(screen, (0, 0, 0), (head_x - 4, head_y + 3, 8, 6))
-        else:
-            # Normal eyes
-            pygame.draw.circle(screen, (0, 0, 0), (int(left_eye_x), int(head_y)), 2)
-            pygame.draw.circle(screen, (0, 0, 0), (int(right_eye_x), int(head_y)), 2)
-            # Smile or worried expression
-            if self.health > 50:
-                pygame.draw.arc(screen, (0, 0, 0), 
-                              (int(head_x - 5), int(head_y), 10, 8),
-                              0, math.pi, 2)
-            else:
-                pygame.draw.arc(screen, (0, 0, 0),
-                              (int(head_x - 5), int(head_y + 3), 10, 8),
-                              math.pi, 2*math.pi, 2)
-
-        # Draw legs
-        leg_angle = math.pi/6
-        hip_x = int(self.x - body_lean/2)
-        hip_y = self.y + 20
-        
-        # Right leg
-        pygame.draw.line(screen, body_color,
-                        (hip_x, hip_y),
-                        (hip_x + limb_length * math.cos(leg_angle),
-                         hip_y + limb_length * math.sin(leg_angle)), 2)
-        # Left leg
-        pygame.draw.line(screen, body_color,
-                        (hip_x, hip_y),
-                        (hip_x - limb_length * math.cos(leg_angle),
-                         hip_y + limb_length * math.sin(leg_angle)), 2)
-
-        # Calculate weapon hand position
-        weapon_hand_x = head_x + (20 if self.facing_right else -20)
-        weapon_hand_y = head_y + 25  # Moved hand lower (was 15)
-        
         # Draw health bar
         health_width = 50 * (self.health / 100)
-        pygame.draw.rect(screen, (255, 0, 0), (self.x - 25, self.y - 40, 50, 5))
-        pygame.draw.rect(screen, (0, 255, 0), (self.x - 25, self.y - 40, health_width, 5))
+        pygame.draw.rect(screen, (255, 0, 0), canvas_rect((x - 25, self.y - 40, 50, 5)))
+        pygame.draw.rect(screen, (0, 255, 0), canvas_rect((x - 25, self.y - 40, health_width, 5)))
         
         # Draw arrow if shooting
         if self.arrow:
             pygame.draw.line(screen, (139, 69, 19),
-                           (self.arrow[0] - 10, self.arrow[1]),
-                           (self.arrow[0] + 10, self.arrow[1]), 2)
-
-        # Draw weapons
-        if self.weapon == "sword":
-            # Colors
-            blade_color = (200, 200, 220)  # Light steel
-            blade_edge = (150, 150, 170)   # Darker steel for edges
-            gold_color = (218, 165, 32)    # Golden for decorations
-            handle_color = (139, 69, 19)   # Dark brown for handle
-            diamond_color = (85, 205, 252) # Light blue for diamonds
-            diamond_edge = (65, 185, 232)  # Darker blue for diamond edges
-            diamond_shine = (220, 240, 255) # White-blue for shine
-            
-            # Calculate angles
-            if self.attacking:
-                attack_progress = min(1.0, self.attack_frame / max(1, self.attack_duration))
-                
-                if attack_progress < 0.5:
-                    base_angle = -45 + (attack_progress * 180)
-                    wobble = math.sin(attack_progress * math.pi * 4) * 5  # Reduced wobble
-                    swing_angle = base_angle + wobble
-                else:
-                    base_angle = -45 + (0.5 * 180)  # Fixed end position
-                    swing_angle = base_angle
-            else:
-                swing_angle = 45
-
-            # Convert angle to radians and adjust for facing direction
-            angle_rad = math.radians(swing_angle if self.facing_right else -swing_angle)
-            perp_angle = angle_rad + math.pi/2
-
-            # Sword dimensions
-            blade_length = 50
-            blade_width = 6
-            guard_width = 24
-            guard_height = 8
-            handle_length = 15
-
-            # Draw trail effect during swing
-            if self.attacking and attack_progress < 0.5:
-                for i in range(5):
-                    trail_progress = attack_progress - i * 0.05
-                    if trail_progress > 0:
-                        trail_angle = math.radians(-45 + trail_progress * 180 if self.facing_right else -(-45 + trail_progress * 180))
-                        trail_x = weapon_hand_x + math.cos(trail_angle) * blade_length
-                        trail_y = weapon_hand_y + math.sin(trail_angle) * blade_length
-                        alpha = 100 - i * 20
-                        trail_color = (192, 192, 192, alpha)
-                        pygame.draw.line(screen, trail_color, (weapon_hand_x, weapon_hand_y), (trail_x, trail_y), 3)
-
-            # Draw sword blade (sharper version)
-            blade_points = [
-                (weapon_hand_x + blade_length * math.cos(angle_rad), weapon_hand_y + blade_length * math.sin(angle_rad)),  # Tip
-                (weapon_hand_x + (blade_length-10) * math.cos(angle_rad), weapon_hand_y + (blade_length-10) * math.sin(angle_rad)),  # Top edge
-                (weapon_hand_x + 15 * math.cos(angle_rad), weapon_hand_y + 15 * math.sin(angle_rad)),  # Base
-                (weapon_hand_x + (blade_length-10) * math.cos(angle_rad) + blade_width * math.cos(perp_angle), 
-                 weapon_hand_y + (blade_length-10) * math.sin(angle_rad) + blade_width * math.sin(perp_angle))  # Bottom edge
-            ]
-            pygame.draw.polygon(screen, blade_color, blade_points)  # Light steel color
-            
-            # Add sharp edge highlight
-            edge_points = [
-                (weapon_hand_x + blade_length * math.cos(angle_rad), weapon_hand_y + blade_length * math.sin(angle_rad)),  # Tip
-                (weapon_hand_x + (blade_length-5) * math.cos(angle_rad), weapon_hand_y + (blade_length-5) * math.sin(angle_rad)),  # Near tip
-                (weapon_hand_x + 15 * math.cos(angle_rad), weapon_hand_y + 15 * math.sin(angle_rad))  # Base
-            ]
-            pygame.draw.lines(screen, (220, 220, 220), False, edge_points, 1)
-
-            # Diamond pattern on blade
-            for i in range(3):
-                diamond_x = weapon_hand_x + 25 + (i * 15)
-                diamond_points = [
-                    (diamond_x, weapon_hand_y - 2),  # Top
-                    (diamond_x + 4, weapon_hand_y),  # Right
-                    (diamond_x, weapon_hand_y + 2),  # Bottom
-                    (diamond_x - 4, weapon_hand_y),  # Left
-                ]
-                pygame.draw.polygon(screen, diamond_shine, diamond_points)
-                pygame.draw.lines(screen, blade_edge, diamond_points, 1)
-
-            # Gold diamond at base
-            diamond_size = 6
-            diamond_points = [
-                (weapon_hand_x + 15, weapon_hand_y - diamond_size),  # Top
-                (weapon_hand_x + 15 + diamond_size, weapon_hand_y),  # Right
-                (weapon_hand_x + 15, weapon_hand_y + diamond_size),  # Bottom
-                (weapon_hand_x + 15 - diamond_size, weapon_hand_y),  # Left
-            ]
-            pygame.draw.polygon(screen, gold_color, diamond_points)
-            pygame.draw.lines(screen, blade_edge, diamond_points, 1)
-
-            # Draw sword handle with wood grain
-            handle_x = weapon_hand_x + 15
-            draw_wood_handle(screen, handle_x, weapon_hand_y, 8, 20)
-            
-            # Wood guard - thinner version
-            guard_x = weapon_hand_x + 15
-            pygame.draw.rect(screen, handle_color,
-                           (guard_x - 8, weapon_hand_y - 3, 16, 6))
-            
-            # Diamond shine effects on blade
-            for i in range(3):
-                shine_x = weapon_hand_x + 25 + (i*10)
-                pygame.draw.line(screen, diamond_shine,
-                               (shine_x, weapon_hand_y - 3 - i),
-                               (shine_x + 8, weapon_hand_y - 5 - i), 2)
-
-        elif self.weapon == "bow":
-            # Colors
-            wood_color = (90, 75, 60)        # Light wood
-            wood_dark = (139, 69, 19)        # Dark wood
-            gold_color = (255, 215, 0)       # Gold
-            string_color = (220, 220, 220)   # Light gray
-            diamond_shine = (220, 240, 255)  # White-blue shine
-            steel_color = (176, 196, 222)    # Light steel blue
-            steel_dark = (119, 136, 153)     # Dark steel
-
-            bow_height = 60
-            # Calculate bow position based on attack frame
-            if self.attacking:
-                attack_progress = min(1.0, self.attack_frame / max(1, self.attack_duration))
-                string_pull = math.sin(attack_progress * math.pi) * 20  # Maximum pull of 20 pixels
-            else:
-                string_pull = 0
-
-            # Main bow curve
-            if self.facing_right:
-                pygame.draw.arc(screen, wood_color,
-                              [weapon_hand_x - 10, weapon_hand_y - bow_height//2, 40, bow_height],
-                              -math.pi/3, math.pi/3, 3)
-                # Decorative outer curve
-                pygame.draw.arc(screen, wood_dark,
-                              [weapon_hand_x - 12, weapon_hand_y - bow_height//2 - 2, 44, bow_height + 4],
-                              -math.pi/3, math.pi/3, 2)
-            else:
-                pygame.draw.arc(screen, wood_color,
-                              [weapon_hand_x - 30, weapon_hand_y - bow_height//2, 40, bow_height],
-                              2*math.pi/3, 4*math.pi/3, 3)
-                # Decorative outer curve
-                pygame.draw.arc(screen, wood_dark,
-                              [weapon_hand_x - 32, weapon_hand_y - bow_height//2 - 2, 44, bow_height + 4],
-                              2*math.pi/3, 4*math.pi/3, 2)
-
-            # Gold decorations at bow tips
-            tip_radius = 4
-            # Top tip
-            top_x = weapon_hand_x + (10 if self.facing_right else -10)
-            pygame.draw.circle(screen, gold_color, (top_x, weapon_hand_y - bow_height//2), tip_radius)
-            pygame.draw.circle(screen, wood_dark, (top_x, weapon_hand_y - bow_height//2), tip_radius, 1)
-            # Bottom tip
-            pygame.draw.circle(screen, gold_color, (top_x, weapon_hand_y + bow_height//2), tip_radius)
-            pygame.draw.circle(screen, wood_dark, (top_x, weapon_hand_y + bow_height//2), tip_radius, 1)
-
-            # Diamond decorations on bow
-            for i in range(2):
-                diamond_y = weapon_hand_y - 15 + i * 30
-                diamond_x = weapon_hand_x + (5 if self.facing_right else -5)
-                diamond_points = [
-                    (diamond_x, diamond_y - 4),  # Top
-                    (diamond_x + (4 if self.facing_right else -4), diamond_y),  # Right
-                    (diamond_x, diamond_y + 4),  # Bottom
-                    (diamond_x - (4 if self.facing_right else -4), diamond_y),  # Left
-                ]
-                pygame.draw.polygon(screen, diamond_shine, diamond_points)
-                pygame.draw.lines(screen, wood_dark, True, diamond_points, 1)
-
-            # Bowstring
-            string_start = (top_x, weapon_hand_y - bow_height//2)
-            string_end = (top_x, weapon_hand_y + bow_height//2)
-            string_mid = (weapon_hand_x + (-15 - string_pull if self.facing_right else 15 + string_pull), weapon_hand_y)
-            
-            # Draw curved bowstring
-            points = [string_start, string_mid, string_end]
-            pygame.draw.lines(screen, string_color, False, points, 2)
-
-            # Only draw arrow when attacking
-            if self.attacking:
-                arrow_length = 30
-                arrow_x = weapon_hand_x + (-20 - string_pull if self.facing_right else 20 + string_pull)
-                arrow_dir = 1 if self.facing_right else -1
-                
-                # Wooden arrow shaft with gold rings
-                pygame.draw.line(screen, wood_color,
-                               (arrow_x, weapon_hand_y),
-                               (arrow_x + arrow_length * arrow_dir, weapon_hand_y), 3)
-                
-                # Gold decorative rings
-                for i in range(2):
-                    ring_x = arrow_x + (10 + i*10) * arrow_dir
-                    pygame.draw.circle(screen, gold_color, (ring_x, weapon_hand_y), 2)
-                    pygame.draw.circle(screen, wood_dark, (ring_x, weapon_hand_y), 2, 1)
-
-                # Steel arrowhead
-                head_length = 12
-                head_width = 6
-                head_x = arrow_x + arrow_length * arrow_dir
-                head_points = [
-                    (head_x, weapon_hand_y),  # Base
-                    (head_x + head_length * arrow_dir, weapon_hand_y),  # Tip
-                    (head_x + head_length * 0.7 * arrow_dir, weapon_hand_y - head_width//2),  # Top barb
-                    (head_x + head_length * 0.7 * arrow_dir, weapon_hand_y + head_width//2),  # Bottom barb
-                ]
-                pygame.draw.polygon(screen, steel_color, head_points)
-                pygame.draw.lines(screen, steel_dark, True, head_points, 1)
-
-                # Feathers at arrow base
-                feather_length = 8
-                feather_width = 3
-                for offset in [-1, 1]:  # Top and bottom feathers
-                    feather_points = [
-                        (arrow_x, weapon_hand_y + offset * feather_width),
-                        (arrow_x - feather_length * arrow_dir, weapon_hand_y),
-                        (arrow_x, weapon_hand_y)
-                    ]
-                    pygame.draw.polygon(screen, WHITE, feather_points)
-                    pygame.draw.lines(screen, (200, 200, 200), True, feather_points, 1)
-        
-        elif self.weapon == "spear":
-            # Colors
-            steel_color = (176, 196, 222)    # Light steel blue
-            steel_dark = (119, 136, 153)     # Dark steel
-            wood_color = (90, 75, 60)        # Light wood
-            wood_dark = (139, 69, 19)        # Dark wood
-            gold_color = (255, 215, 0)       # Gold
-            diamond_shine = (220, 240, 255)  # White-blue shine
-
-            shaft_length = 80
-            head_length = 25
-            shaft_end = self.x + (shaft_length if self.facing_right else -shaft_length)
-            
-            # Wooden shaft with decorative rings
-            pygame.draw.line(screen, wood_color,
-                           (self.x, self.y),
-                           (shaft_end, self.y), 3)
-            
-            # Gold rings along shaft
-            for i in range(3):
-                ring_x = self.x + ((20 + i*25) if self.facing_right else -(20 + i*25))
-                pygame.draw.circle(screen, gold_color, (ring_x, self.y), 3)
-                pygame.draw.circle(screen, wood_dark, (ring_x, self.y), 3, 1)
-
-            # Spearhead - steel blade
-            head_points = [
-                (shaft_end, self.y),  # Base
-                (shaft_end + (head_length if self.facing_right else -head_length), self.y),  # Tip
-                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), self.y - 8),  # Top barb
-                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), self.y + 8),  # Bottom barb
-            ]
-            pygame.draw.polygon(screen, steel_color, head_points)
-            pygame.draw.lines(screen, steel_dark, True, head_points, 2)
-
-            # Diamond decorations on blade
-            for i in range(2):
-                diamond_x = shaft_end + ((head_length*0.4 + i*8) if self.facing_right else -(head_length*0.4 + i*8))
-                diamond_points = [
-                    (diamond_x, self.y - 3),  # Top
-                    (diamond_x + (3 if self.facing_right else -3), self.y),  # Right
-                    (diamond_x, self.y + 3),  # Bottom
-                    (diamond_x - (3 if self.facing_right else -3), self.y),  # Left
-                ]
-                pygame.draw.polygon(screen, diamond_shine, diamond_points)
-                pygame.draw.lines(screen, steel_dark, True, diamond_points, 1)
+                           canvas_point((self.arrow[0] - camera_x - 10, self.arrow[1])),
+                           canvas_point((self.arrow[0] - camera_x + 10, self.arrow[1])), canvas_length(2))
 
-            # Gold decoration at spear base
-            base_x = self.x + (5 if self.facing_right else -5)
-            pygame.draw.circle(screen, gold_color, (base_x, self.y), 4)
-            # Add diamond decoration to pommel
-            pommel_diamond_size = 2
-            pommel_diamond_points = []
-            for i in range(4):
-                point_angle = math.pi/2 + (i * math.pi/2)
-                dx = base_x + math.cos(point_angle) * pommel_diamond_size
-                dy = self.y + math.sin(point_angle) * pommel_diamond_size
-                pommel_diamond_points.append((dx, dy))
-            pygame.draw.polygon(screen, diamond_shine, pommel_diamond_points)
-            pygame.draw.polygon(screen, steel_dark, pommel_diamond_points, 1)
-        
-        elif self.weapon == "axe":
-            # Colors
-            steel_color = (192, 192, 192)    # Lighter silver for blade
-            steel_dark = (64, 64, 64)        # Darker for outline
-            wood_color = (139, 69, 19)       # Brown for handle
-            
-            handle_length = 40  # Short handle
-            handle_width = 5    # Thicker handle
-            head_width = 30     # Wider axe head
-            head_height = 25    # Taller head height
-            
-            # Calculate positions based on direction
-            handle_end_x = self.x + (handle_length if self.facing_right else -handle_length)
-            
-            # Draw wooden handle
-            pygame.draw.line(screen, wood_color,
-                           (self.x, self.y),
-                           (handle_end_x, self.y),
-                           handle_width)
-            
-            # Draw axe head
-            if self.facing_right:
-                head_points = [
-                    (handle_end_x - 5, self.y - 2),           # Handle joint top
-                    (handle_end_x + 2, self.y - head_height), # Top back
-                    (handle_end_x + 20, self.y - head_height + 5), # Top front sharp
-                    (handle_end_x + 25, self.y),             # Front point
-                    (handle_end_x + 20, self.y + head_height - 5), # Bottom front sharp
-                    (handle_end_x + 2, self.y + head_height), # Bottom back
-                    (handle_end_x - 5, self.y + 2),          # Handle joint bottom
-                ]
-            else:
-                head_points = [
-                    (handle_end_x + 5, self.y - 2),           # Handle joint top
-                    (handle_end_x - 2, self.y - head_height), # Top back
-                    (handle_end_x - 20, self.y - head_height + 5), # Top front sharp
-                    (handle_end_x - 25, self.y),             # Front point
-                    (handle_end_x - 20, self.y + head_height - 5), # Bottom front sharp
-                    (handle_end_x - 2, self.y + head_height), # Bottom back
-                    (handle_end_x + 5, self.y + 2),          # Handle joint bottom
-                ]
-            
-            # Draw the axe head with outline
-            pygame.draw.polygon(screen, steel_color, head_points)
-            pygame.draw.polygon(screen, steel_dark, head_points, 2)
-        
-        elif self.weapon == "spear":
-            # Colors for spear
-            wood_color = (139, 69, 19)  # Brown for shaft
-            steel_color = (192, 192, 192)  # Silver for blade
-            
-            # Position spear lower
-            weapon_y = self.y + 20  # Move spear down
-            
-            # Draw spear shaft
-            shaft_length = 60
-            shaft_end_x = self.x + (shaft_length if self.facing_right else -shaft_length)
-            pygame.draw.line(screen, wood_color,
-                           (self.x, weapon_y),
-                           (shaft_end_x, weapon_y), 4)
-            
-            # Draw spear head
-            head_length = 20
-            head_width = 12
-            if self.facing_right:
-                head_points = [
-                    (shaft_end_x, weapon_y),  # Base
-                    (shaft_end_x + head_length, weapon_y),  # Tip
-                    (shaft_end_x + head_length - 5, weapon_y - head_width//2),  # Top barb
-                    (shaft_end_x + head_length - 5, weapon_y + head_width//2)   # Bottom barb
-                ]
-            else:
-                head_points = [
-                    (shaft_end_x, weapon_y),  # Base
-                    (shaft_end_x - head_length, weapon_y),  # Tip
-                    (shaft_end_x - head_length + 5, weapon_y - head_width//2),  # Top barb
-                    (shaft_end_x - head_length + 5, weapon_y + head_width//2)   # Bottom barb
-                ]
-            pygame.draw.polygon(screen, steel_color, head_points)  # Silver color
-            
-            # Add sharp edge highlight
-            edge_points = [
-                (shaft_end_x, weapon_y),  # Base
-                (shaft_end_x + (head_length-5) * (1 if self.facing_right else -1), weapon_y),  # Near tip
-                (shaft_end_x + head_length * (1 if self.facing_right else -1), weapon_y),  # Tip
-            ]
-            pygame.draw.lines(screen, (220, 220, 220), False, edge_points, 1)
+        # Draw weapon from the pre-rendered sprite cache
+        weapon_sprites.draw(screen, self, camera_x)
 
         # Draw label below button
-        button_font = pygame.font.Font(None, 24)
+        button_font = get_font(24)
         label = f"{self.weapon.title()}"
-        text = button_font.render(label, True, (0, 0, 0))
-        text_rect = text.get_rect(center=(self.x, self.y + 40))
+        text = render_text(button_font, label, (0, 0, 0))
+        text_rect = text.get_rect(center=canvas_point((x, self.y + 40)))
         screen.blit(text, text_rect)
         
         # Draw defense effect
         if self.defending:
-            # Shield effect (protective aura)
-            shield_color = (200, 200, 255, 100)  # Light blue, semi-transparent
-            shield_radius = max(self.width, self.height) // 2
-            shield_surface = pygame.Surface((shield_radius * 2, shield_radius * 2), pygame.SRCALPHA)
-            
-            # Shield base (metallic circle)
-            shield_size = 40
-            shield_surface = pygame.Surface((shield_size, self.height), pygame.SRCALPHA)
-            
-            # Shield gradient (metallic effect)
-            for i in range(self.height // 2):
-                alpha = 255 - i * 4
-                color = (192, 192, 192, alpha)  # Silver color with fading alpha
-                pygame.draw.rect(shield_surface, color, (0, i, shield_size, 1))
-            
-            # Shield border
-            pygame.draw.rect(shield_surface, (128, 128, 128), (0, 0, shield_size, self.height), 2)
-            
-            # Shield emblem (simple cross)
-            emblem_color = (218, 165, 32)  # Golden color
-            pygame.draw.line(shield_surface, emblem_color, 
-                           (shield_size // 2, 5), 
-                           (shield_size // 2, self.height - 5), 3)
-            pygame.draw.line(shield_surface, emblem_color, 
-                           (5, self.height // 2), 
-                           (shield_size - 5, self.height // 2), 3)
-            
-            # Draw the shield
-            shield_x = self.x + (self.width if self.facing_right else -shield_size)
-            shield_y = self.y
-            screen.blit(shield_surface, (shield_x, shield_y))
-            
-            # Shield slightly smaller and angled
-            shield_color = (192, 192, 192)  # Silver color
-            shield_width = 35  # Shield width
-            shield_height = 50  # Shield height
-            
-            # Create shield surface for rotation
-            shield_surface = pygame.Surface((shield_width, shield_height), pygame.SRCALPHA)
-            
-            # Draw shield base
-            pygame.draw.rect(shield_surface, shield_color, (0, 0, shield_width, shield_height))
-            pygame.draw.rect(shield_surface, (128, 128, 128), (0, 0, shield_width, shield_height), 2)  # Border
-            
-            # Draw shield emblem (cross)
-            emblem_color = (128, 128, 128)  # Darker silver for emblem
-            pygame.draw.line(shield_surface, emblem_color, 
-                           (shield_width//2, 5), 
-                           (shield_width//2, shield_height-5), 3)
-            pygame.draw.line(shield_surface, emblem_color, 
-                           (5, shield_height//2), 
-                           (shield_width-5, shield_height//2), 3)
-            
-            # Position shield relative to player
-            if self.facing_right:
-                # Shield position when facing right
-                shield_x = self.x + self.width - 15  # Overlap with player
-                shield_y = self.y + 5  # Slightly below top
-                # Rotate shield slightly when facing right
-                rotated_shield = pygame.transform.rotate(shield_surface, -15)
-            else:
-                # Shield position when facing left
-                shield_x = self.x - shield_width + 15  # Overlap with player
-                shield_y = self.y + 5  # Slightly below top
-                # Rotate shield slightly when facing left
-                rotated_shield = pygame.transform.rotate(shield_surface, 15)
-            
-            # Get the rect of the rotated shield for proper positioning
-            shield_rect = rotated_shield.get_rect(center=(shield_x + shield_width//2, shield_y + shield_height//2))
-            screen.blit(rotated_shield, shield_rect.topleft)
-        
-    def attack(self, other_player):
-        if not self.attacking and self.attack_cooldown <= 0:
-            self.attacking = True
-            self.attack_frame = 0
-            
-            # Set attack properties based on weapon
-            if self.weapon == "sword":
-                self.damage = 15
-                self.attack_duration = 20
-                self.attack_range = 60
-                self.attack_cooldown = 30
-                sword_swing_sound.play()
-            elif self.weapon == "bow":
-                self.damage = 12
-                self.attack_duration = 30
-                self.attack_range = 300
-                self.attack_cooldown = 45
-                # Create arrow
-                arrow_x = self.x + (30 if self.facing_right else -30)
-                arrow_y = self.y + 20
-                target_x = arrow_x + (300 if self.facing_right else -300)
-                target_y = other_player.y + 30
-                new_arrow = Arrow(arrow_x, arrow_y, target_x, target_y)
-                new_arrow.shooter = self  # Track who shot the arrow
-                game.arrows.append(new_arrow)
-                bow_hit_sound.play()
-            elif self.weapon == "spear":
-                self.damage = 8
-                self.attack_duration = 25
-                self.attack_range = 100
-                self.attack_cooldown = 40
-                spear_hit_sound.play()
-            elif self.weapon == "axe":
-                self.damage = 20
-                self.attack_duration = 20
-                self.attack_range = 50
-                self.attack_cooldown = 30
-                sword_swing_sound.play()
-
-    def update_attack(self, other_player):
-        # Update cooldown
-        if self.attack_cooldown > 0:
-            self.attack_cooldown -= 1
-            
-        if self.attacking:
-            self.attack_frame += 1
-            
-            # Get direction to other player
-            dx = other_player.x - self.x
-            dy = other_player.y - self.y
-            distance = math.sqrt(dx * dx + dy * dy)
-            
-            # Check if target is in front of the attacker
-            is_target_in_front = (dx > 0 and self.facing_right) or (dx < 0 and not self.facing_right)
-            
-            # Handle different weapon attacks
-            if self.weapon == "sword":
-                if self.attack_frame == self.attack_duration // 2:
-                    if is_target_in_front and distance < self.attack_range:
-                        if abs(dy) < 40:  # Height check for sword
-                            self.hit_player(other_player)
-                
-                if self.attack_frame >= self.attack_duration:
-                    self.attacking = False
-                    self.attack_frame = 0
-            elif self.weapon == "bow":
-                # Bow attack is handled through arrows
-                if self.attack_frame >= self.attack_duration:
-                    self.attacking = False
-                    self.attack_frame = 0
-            elif self.weapon == "spear":
-                if self.attack_frame == self.attack_duration // 2:
-                    if is_target_in_front and distance < self.attack_range:
-                        if abs(dy) < 40:
-                            self.hit_player(other_player)
-                
-                if self.attack_frame >= self.attack_duration:
-                    self.attacking = False
-                    self.attack_frame = 0
-            elif self.weapon == "axe":
-                if self.attack_frame == self.attack_duration // 2:
-                    if is_target_in_front and distance < self.attack_range:
-                        if abs(dy) < 40:
-                            self.hit_player(other_player)
-                
-                if self.attack_frame >= self.attack_duration:
-                    self.attacking = False
-                    self.attack_frame = 0
-
-    def hit_player(self, other_player):
-        if not other_player.defending:  # Only deal damage if the other player is not defending
-            # Calculate damage based on weapon
-            if self.weapon == "sword":
-                damage = 15
-            elif self.weapon == "bow":
-                damage = 12
-            elif self.weapon == "spear":
-                damage = 8
-            elif self.weapon == "axe":
-                damage = 20
-            # Apply damage
-            other_player.health -= damage
-            other_player.hurt_flash = 10  # Flash white when hit
-            
-            # Play hurt sound with cooldown
-            current_time = pygame.time.get_ticks()
-            if current_time - other_player.last_hit_time > 500:  # 500ms cooldown
-                hurt_sound.play()
-                other_player.last_hit_time = current_time
-        else:
-            # If player is defending, they take reduced damage
-            if self.weapon == "sword":
-                damage = 3
-            elif self.weapon == "bow":
-                damage = 5
-            elif self.weapon == "spear":
-                damage = 4
-            elif self.weapon == "axe":
-                damage = 5
-            other_player.health -= damage
-            other_player.hurt_flash = 5  # Shorter flash when blocked
-
-class Particle:
-    def __init__(self, x, y, dx, dy, color):
-        self.x = x
-        self.y = y
-        self.dx = dx
-        self.dy = dy
-        self.color = color
-        self.lifetime = 30  # Particle exists for 30 frames
-        
-    def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.lifetime -= 1
-        return self.lifetime > 0
-        
-    def draw(self, window):
-        alpha = int((self.lifetime / 30) * 255)  # Fade out as lifetime decreases
-        particle_color = (*self.color, alpha)
-        pygame.draw.circle(window, particle_color, (int(self.x), int(self.y)), 3)
-
-particles = []
-
-class Game:
-    def __init__(self):
-        self.particles = particles  # List to store active particles
-        self.arrows = []  # List to store active arrows
-    
-    def update(self):
-        # Update particles
-        self.particles = [p for p in self.particles if p.update()]
-        # Update arrows
-        self.arrows = [arrow for arrow in self.arrows if arrow.update()]
-        
-    def draw(self, window):
-        # Draw fun particles
-        for particle in self.particles:
-            particle.draw(window)
-        # Draw arrows
-        for arrow in self.arrows:
-            arrow.draw(window)
-
-class Arrow:
-    def __init__(self, x, y, target_x, target_y, speed=15):
-        self.x = x
-        self.y = y
-        # Calculate direction to target
-        dx = target_x - x
-        dy = target_y - y
-        distance = math.sqrt(dx * dx + dy * dy)
-        # Normalize direction
-        self.dx = (dx / distance) * speed if distance > 0 else 0
-        self.dy = (dy / distance) * speed if distance > 0 else 0
-        self.lifetime = 30  # Arrow exists for 30 frames
-        self.length = 20  # Arrow length in pixels
-        self.angle = math.atan2(dy, dx)  # Store angle for drawing
-        self.shooter = None  # Reference to the player who shot the arrow
-        self.has_hit = False  # Track if arrow has hit something
+            for shield_surface, offset in fighter_poses.get_shield(self.facing_right, self.width, self.height):
+                display.copy(screen, shield_surface, (int(to_canvas(x)) + offset[0], int(to_canvas(self.y)) + offset[1]))
+        
+    def bounds(self):
+        # Area covered by the name, health bar, body, weapon and shield
+        return pygame.Rect(int(self.x) - 140, int(self.y) - 70, 280, 130)
+    
+    def draw_state(self):
+        # Everything besides the position that changes how the player looks
+        return (self.health, self.attacking, self.attack_frame, self.hurt_flash, self.defending,
+                self.facing_right, self.weapon, self.name)
+        
+# Arrows are drawn from the simulation's arrow state
+def draw_arrow(window, arrow, camera_x=0):
+    x = arrow.x - camera_x  # Position on screen
+    
+    # Draw arrow body (line)
+    end_x = x - math.cos(arrow.angle) * arrow.length
+    end_y = arrow.y - math.sin(arrow.angle) * arrow.length
+    pygame.draw.line(window, (139, 69, 19), canvas_point((x, arrow.y)), canvas_point((end_x, end_y)), canvas_length(3))
+    
+    # Draw arrow head (triangle)
+    head_size = 8
+    head_angle1 = arrow.angle + math.pi/4
+    head_angle2 = arrow.angle - math.pi/4
+    head_points = [
+        (x, arrow.y),
+        (x - head_size * math.cos(head_angle1), arrow.y - head_size * math.sin(head_angle1)),
+        (x - head_size * math.cos(head_angle2), arrow.y - head_size * math.sin(head_angle2))
+    ]
+    pygame.draw.polygon(window, (139, 69, 19), canvas_points(head_points))
 
-    def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.lifetime -= 1
-        return self.lifetime > 0
+def arrow_bounds(arrow):
+    return pygame.Rect(int(arrow.x) - 25, int(arrow.y) - 25, 50, 50)
 
-    def check_collision(self, player):
-        if self.has_hit or self.shooter == player:  # Don't hit the shooter or if already hit
-            return False
-        
-        # Simple rectangle collision
-        arrow_rect = pygame.Rect(self.x - 5, self.y - 5, 10, 10)
-        
-        if arrow_rect.colliderect(player.rect):
-            self.has_hit = True
-            if not player.defending:
-                player.health -= 12  # Arrow damage
-                player.hurt_flash = 10
-                bow_hit_sound.play()
-            else:
-                player.health -= 4  # Reduced damage when blocked
-                player.hurt_flash = 5
-            return True
-        return False
-
-    def draw(self, window):
-        # Draw arrow body (line)
-        end_x = self.x - math.cos(self.angle) * self.length
-        end_y = self.y - math.sin(self.angle) * self.length
-        pygame.draw.line(window, (139, 69, 19), (self.x, self.y), (end_x, end_y), 3)
-        
-        # Draw arrow head (triangle)
-        head_size = 8
-        head_angle1 = self.angle + math.pi/4
-        head_angle2 = self.angle - math.pi/4
-        head_points = [
-            (self.x, self.y),
-            (self.x - head_size * math.cos(head_angle1), self.y - head_size * math.sin(head_angle1)),
-            (self.x - head_size * math.cos(head_angle2), self.y - head_size * math.sin(head_angle2))
-        ]
-        pygame.draw.polygon(window, (139, 69, 19), head_points)
+def draw_arrows(window, camera):
+    # Draw the arrows the camera can see
+    for arrow in game.arrows:
+        if camera.sees(arrow_bounds(arrow)):
+            draw_arrow(window, arrow, camera.x)
 
 # Create game object
-game = Game()
+game = simulation.Match()
 
 # Game options
 class GameOptions:
@@ -1465,11 +1487,11 @@ class GameOptions:
     
     def draw(self, window):
         # Draw weapon selection text
-        font = pygame.font.Font(None, 36)
-        p1_text = font.render("P1 Weapon", True, (0, 0, 0))
-        p2_text = font.render("P2 Weapon", True, (0, 0, 0))
-        window.blit(p1_text, (WINDOW_WIDTH//4 - p1_text.get_width()//2, 200))
-        window.blit(p2_text, (3*WINDOW_WIDTH//4 - p2_text.get_width()//2, 200))
+        font = get_font(36)
+        p1_text = render_text(font, "P1 Weapon", (0, 0, 0))
+        p2_text = render_text(font, "P2 Weapon", (0, 0, 0))
+        window.blit(p1_text, p1_text.get_rect(centerx=to_canvas(WINDOW_WIDTH//4), top=to_canvas(200)))
+        window.blit(p2_text, p2_text.get_rect(centerx=to_canvas(3*WINDOW_WIDTH//4), top=to_canvas(200)))
         
         # Draw all weapon buttons
         for button in menu_weapon_buttons:
@@ -1489,7 +1511,7 @@ WOOD_COLORS = [
 ]
 WOOD_GRAIN_COLOR = (90, 60, 30)  # Dark line for wood grain
 
-def draw_wood_handle(window, x, y, width, height, angle=0):
+def draw_wood_handle(window, x, y, width, height, angle=0, rng=random):
     # Base wood color
     handle_rect = pygame.Rect(x - width//2, y - height//2, width, height)
     pygame.draw.rect(window, WOOD_COLORS[0], handle_rect)
@@ -1509,12 +1531,409 @@ def draw_wood_handle(window, x, y, width, height, angle=0):
         
     # Add some random knots in the wood
     for _ in range(2):
-        knot_x = x + random.randint(-width//3, width//3)
-        knot_y = y + random.randint(-height//3, height//3)
+        knot_x = x + rng.randint(-width//3, width//3)
+        knot_y = y + rng.randint(-height//3, height//3)
         pygame.draw.circle(window, WOOD_COLORS[3], (knot_x, knot_y), 2)
         # Draw grain around knot
         pygame.draw.circle(window, WOOD_COLORS[2], (knot_x, knot_y), 3, 1)
 
+# Pre-rendered weapon sprites
+WEAPON_SPRITE_SIZE = (240, 160)  # Big enough for the spear and the sword trail
+WEAPON_ANGLE_STEP = 3  # Sword swing angles are rounded to this many degrees
+WEAPON_TRAIL_STEP = 0.025  # Sword trail progress is rounded to this step
+
+def draw_weapon_art(surface, weapon, facing_right, anchor_x, anchor_y,
+                    swing_angle=45, string_pull=0, attacking=False, trail=None):
+    # Weapon is held in front of the body, at the height of the player's y
+    hand_x = anchor_x + (20 if facing_right else -20)
+    hand_y = anchor_y
+
+    if weapon == "sword":
+        # Colors
+        blade_color = (200, 200, 220)  # Light steel
+        blade_edge = (150, 150, 170)   # Darker steel for edges
+        gold_color = (218, 165, 32)    # Golden for decorations
+        handle_color = (139, 69, 19)   # Dark brown for handle
+        diamond_color = (85, 205, 252) # Light blue for diamonds
+        diamond_edge = (65, 185, 232)  # Darker blue for diamond edges
+        diamond_shine = (220, 240, 255) # White-blue for shine
+        
+        # Convert angle to radians and adjust for facing direction
+        angle_rad = math.radians(swing_angle if facing_right else -swing_angle)
+        perp_angle = angle_rad + math.pi/2
+
+        # Sword dimensions
+        blade_length = 50
+        blade_width = 6
+        guard_width = 24
+        guard_height = 8
+        handle_length = 15
+
+        # Draw trail effect during swing
+        if trail is not None:
+            for i in range(5):
+                trail_progress = trail - i * 0.05
+                if trail_progress > 0:
+                    trail_angle = math.radians(-45 + trail_progress * 180 if facing_right else -(-45 + trail_progress * 180))
+                    trail_x = hand_x + math.cos(trail_angle) * blade_length
+                    trail_y = hand_y + math.sin(trail_angle) * blade_length
+                    alpha = 100 - i * 20
+                    trail_color = (192, 192, 192, alpha)
+                    pygame.draw.line(surface, trail_color, (hand_x, hand_y), (trail_x, trail_y), 3)
+
+        # Draw sword blade (sharper version)
+        blade_points = [
+            (hand_x + blade_length * math.cos(angle_rad), hand_y + blade_length * math.sin(angle_rad)),  # Tip
+            (hand_x + (blade_length-10) * math.cos(angle_rad), hand_y + (blade_length-10) * math.sin(angle_rad)),  # Top edge
+            (hand_x + 15 * math.cos(angle_rad), hand_y + 15 * math.sin(angle_rad)),  # Base
+            (hand_x + (blade_length-10) * math.cos(angle_rad) + blade_width * math.cos(perp_angle), 
+             hand_y + (blade_length-10) * math.sin(angle_rad) + blade_width * math.sin(perp_angle))  # Bottom edge
+        ]
+        pygame.draw.polygon(surface, blade_color, blade_points)  # Light steel color
+        
+        # Add sharp edge highlight
+        edge_points = [
+            (hand_x + blade_length * math.cos(angle_rad), hand_y + blade_length * math.sin(angle_rad)),  # Tip
+            (hand_x + (blade_length-5) * math.cos(angle_rad), hand_y + (blade_length-5) * math.sin(angle_rad)),  # Near tip
+            (hand_x + 15 * math.cos(angle_rad), hand_y + 15 * math.sin(angle_rad))  # Base
+        ]
+        pygame.draw.lines(surface, (220, 220, 220), False, edge_points, 1)
+
+        # Diamond pattern on blade
+        for i in range(3):
+            diamond_x = hand_x + 25 + (i * 15)
+            diamond_points = [
+                (diamond_x, hand_y - 2),  # Top
+                (diamond_x + 4, hand_y),  # Right
+                (diamond_x, hand_y + 2),  # Bottom
+                (diamond_x - 4, hand_y),  # Left
+            ]
+            pygame.draw.polygon(surface, diamond_shine, diamond_points)
+            pygame.draw.lines(surface, blade_edge, True, diamond_points, 1)
+
+        # Gold diamond at base
+        diamond_size = 6
+        diamond_points = [
+            (hand_x + 15, hand_y - diamond_size),  # Top
+            (hand_x + 15 + diamond_size, hand_y),  # Right
+            (hand_x + 15, hand_y + diamond_size),  # Bottom
+            (hand_x + 15 - diamond_size, hand_y),  # Left
+        ]
+        pygame.draw.polygon(surface, gold_color, diamond_points)
+        pygame.draw.lines(surface, blade_edge, True, diamond_points, 1)
+
+        # Draw sword handle with wood grain
+        handle_x = hand_x + 15
+        draw_wood_handle(surface, handle_x, hand_y, 8, 20, rng=random.Random(0))
+        
+        # Wood guard - thinner version
+        guard_x = hand_x + 15
+        pygame.draw.rect(surface, handle_color,
+                       (guard_x - 8, hand_y - 3, 16, 6))
+        
+        # Diamond shine effects on blade
+        for i in range(3):
+            shine_x = hand_x + 25 + (i*10)
+            pygame.draw.line(surface, diamond_shine,
+                           (shine_x, hand_y - 3 - i),
+                           (shine_x + 8, hand_y - 5 - i), 2)
+
+    elif weapon == "bow":
+        # Colors
+        wood_color = (90, 75, 60)        # Light wood
+        wood_dark = (139, 69, 19)        # Dark wood
+        gold_color = (255, 215, 0)       # Gold
+        string_color = (220, 220, 220)   # Light gray
+        diamond_shine = (220, 240, 255)  # White-blue shine
+        steel_color = (176, 196, 222)    # Light steel blue
+        steel_dark = (119, 136, 153)     # Dark steel
+
+        bow_height = 60
+        # Main bow curve
+        if facing_right:
+            pygame.draw.arc(surface, wood_color,
+                          [hand_x - 10, hand_y - bow_height//2, 40, bow_height],
+                          -math.pi/3, math.pi/3, 3)
+            # Decorative outer curve
+            pygame.draw.arc(surface, wood_dark,
+                          [hand_x - 12, hand_y - bow_height//2 - 2, 44, bow_height + 4],
+                          -math.pi/3, math.pi/3, 2)
+        else:
+            pygame.draw.arc(surface, wood_color,
+                          [hand_x - 30, hand_y - bow_height//2, 40, bow_height],
+                          2*math.pi/3, 4*math.pi/3, 3)
+            # Decorative outer curve
+            pygame.draw.arc(surface, wood_dark,
+                          [hand_x - 32, hand_y - bow_height//2 - 2, 44, bow_height + 4],
+                          2*math.pi/3, 4*math.pi/3, 2)
+
+        # Gold decorations at bow tips
+        tip_radius = 4
+        # Top tip
+        top_x = hand_x + (10 if facing_right else -10)
+        pygame.draw.circle(surface, gold_color, (top_x, hand_y - bow_height//2), tip_radius)
+        pygame.draw.circle(surface, wood_dark, (top_x, hand_y - bow_height//2), tip_radius, 1)
+        # Bottom tip
+        pygame.draw.circle(surface, gold_color, (top_x, hand_y + bow_height//2), tip_radius)
+        pygame.draw.circle(surface, wood_dark, (top_x, hand_y + bow_height//2), tip_radius, 1)
+
+        # Diamond decorations on bow
+        for i in range(2):
+            diamond_y = hand_y - 15 + i * 30
+            diamond_x = hand_x + (5 if facing_right else -5)
+            diamond_points = [
+                (diamond_x, diamond_y - 4),  # Top
+                (diamond_x + (4 if facing_right else -4), diamond_y),  # Right
+                (diamond_x, diamond_y + 4),  # Bottom
+                (diamond_x - (4 if facing_right else -4), diamond_y),  # Left
+            ]
+            pygame.draw.polygon(surface, diamond_shine, diamond_points)
+            pygame.draw.lines(surface, wood_dark, True, diamond_points, 1)
+
+        # Bowstring
+        string_start = (top_x, hand_y - bow_height//2)
+        string_end = (top_x, hand_y + bow_height//2)
+        string_mid = (hand_x + (-15 - string_pull if facing_right else 15 + string_pull), hand_y)
+        
+        # Draw curved bowstring
+        points = [string_start, string_mid, string_end]
+        pygame.draw.lines(surface, string_color, False, points, 2)
+
+        # Only draw arrow when attacking
+        if attacking:
+            arrow_length = 30
+            arrow_x = hand_x + (-20 - string_pull if facing_right else 20 + string_pull)
+            arrow_dir = 1 if facing_right else -1
+            
+            # Wooden arrow shaft with gold rings
+            pygame.draw.line(surface, wood_color,
+                           (arrow_x, hand_y),
+                           (arrow_x + arrow_length * arrow_dir, hand_y), 3)
+            
+            # Gold decorative rings
+            for i in range(2):
+                ring_x = arrow_x + (10 + i*10) * arrow_dir
+                pygame.draw.circle(surface, gold_color, (ring_x, hand_y), 2)
+                pygame.draw.circle(surface, wood_dark, (ring_x, hand_y), 2, 1)
+
+            # Steel arrowhead
+            head_length = 12
+            head_width = 6
+            head_x = arrow_x + arrow_length * arrow_dir
+            head_points = [
+                (head_x, hand_y),  # Base
+                (head_x + head_length * arrow_dir, hand_y),  # Tip
+                (head_x + head_length * 0.7 * arrow_dir, hand_y - head_width//2),  # Top barb
+                (head_x + head_length * 0.7 * arrow_dir, hand_y + head_width//2),  # Bottom barb
+            ]
+            pygame.draw.polygon(surface, steel_color, head_points)
+            pygame.draw.lines(surface, steel_dark, True, head_points, 1)
+
+            # Feathers at arrow base
+            feather_length = 8
+            feather_width = 3
+            for offset in [-1, 1]:  # Top and bottom feathers
+                feather_points = [
+                    (arrow_x, hand_y + offset * feather_width),
+                    (arrow_x - feather_length * arrow_dir, hand_y),
+                    (arrow_x, hand_y)
+                ]
+                pygame.draw.polygon(surface, WHITE, feather_points)
+                pygame.draw.lines(surface, (200, 200, 200), True, feather_points, 1)
+    
+    elif weapon == "spear":
+        # Colors
+        steel_color = (176, 196, 222)    # Light steel blue
+        steel_dark = (119, 136, 153)     # Dark steel
+        wood_color = (90, 75, 60)        # Light wood
+        wood_dark = (139, 69, 19)        # Dark wood
+        gold_color = (255, 215, 0)       # Gold
+        diamond_shine = (220, 240, 255)  # White-blue shine
+
+        shaft_length = 80
+        head_length = 25
+        shaft_end = anchor_x + (shaft_length if facing_right else -shaft_length)
+        
+        # Wooden shaft with decorative rings
+        pygame.draw.line(surface, wood_color,
+                       (anchor_x, anchor_y),
+                       (shaft_end, anchor_y), 3)
+        
+        # Gold rings along shaft
+        for i in range(3):
+            ring_x = anchor_x + ((20 + i*25) if facing_right else -(20 + i*25))
+            pygame.draw.circle(surface, gold_color, (ring_x, anchor_y), 3)
+            pygame.draw.circle(surface, wood_dark, (ring_x, anchor_y), 3, 1)
+
+        # Spearhead - steel blade
+        head_points = [
+            (shaft_end, anchor_y),  # Base
+            (shaft_end + (head_length if facing_right else -head_length), anchor_y),  # Tip
+            (shaft_end + (head_length*0.8 if facing_right else -head_length*0.8), anchor_y - 8),  # Top barb
+            (shaft_end + (head_length*0.8 if facing_right else -head_length*0.8), anchor_y + 8),  # Bottom barb
+        ]
+        pygame.draw.polygon(surface, steel_color, head_points)
+        pygame.draw.lines(surface, steel_dark, True, head_points, 2)
+
+        # Diamond decorations on blade
+        for i in range(2):
+            diamond_x = shaft_end + ((head_length*0.4 + i*8) if facing_right else -(head_length*0.4 + i*8))
+            diamond_points = [
+                (diamond_x, anchor_y - 3),  # Top
+                (diamond_x + (3 if facing_right else -3), anchor_y),  # Right
+                (diamond_x, anchor_y + 3),  # Bottom
+                (diamond_x - (3 if facing_right else -3), anchor_y),  # Left
+            ]
+            pygame.draw.polygon(surface, diamond_shine, diamond_points)
+            pygame.draw.lines(surface, steel_dark, True, diamond_points, 1)
+
+        # Gold decoration at spear base
+        base_x = anchor_x + (5 if facing_right else -5)
+        pygame.draw.circle(surface, gold_color, (base_x, anchor_y), 4)
+        # Add diamond decoration to pommel
+        pommel_diamond_size = 2
+        pommel_diamond_points = []
+        for i in range(4):
+            point_angle = math.pi/2 + (i * math.pi/2)
+            dx = base_x + math.cos(point_angle) * pommel_diamond_size
+            dy = anchor_y + math.sin(point_angle) * pommel_diamond_size
+            pommel_diamond_points.append((dx, dy))
+        pygame.draw.polygon(surface, diamond_shine, pommel_diamond_points)
+        pygame.draw.polygon(surface, steel_dark, pommel_diamond_points, 1)
+    
+    elif weapon == "axe":
+        # Colors
+        steel_color = (192, 192, 192)    # Lighter silver for blade
+        steel_dark = (64, 64, 64)        # Darker for outline
+        wood_color = (139, 69, 19)       # Brown for handle
+        
+        handle_length = 40  # Short handle
+        handle_width = 5    # Thicker handle
+        head_width = 30     # Wider axe head
+        head_height = 25    # Taller head height
+        
+        # Calculate positions based on direction
+        handle_end_x = anchor_x + (handle_length if facing_right else -handle_length)
+        
+        # Draw wooden handle
+        pygame.draw.line(surface, wood_color,
+                       (anchor_x, anchor_y),
+                       (handle_end_x, anchor_y),
+                       handle_width)
+        
+        # Draw axe head
+        if facing_right:
+            head_points = [
+                (handle_end_x - 5, anchor_y - 2),           # Handle joint top
+                (handle_end_x + 2, anchor_y - head_height), # Top back
+                (handle_end_x + 20, anchor_y - head_height + 5), # Top front sharp
+                (handle_end_x + 25, anchor_y),             # Front point
+                (handle_end_x + 20, anchor_y + head_height - 5), # Bottom front sharp
+                (handle_end_x + 2, anchor_y + head_height), # Bottom back
+                (handle_end_x - 5, anchor_y + 2),          # Handle joint bottom
+            ]
+        else:
+            head_points = [
+                (handle_end_x + 5, anchor_y - 2),           # Handle joint top
+                (handle_end_x - 2, anchor_y - head_height), # Top back
+                (handle_end_x - 20, anchor_y - head_height + 5), # Top front sharp
+                (handle_end_x - 25, anchor_y),             # Front point
+                (handle_end_x - 20, anchor_y + head_height - 5), # Bottom front sharp
+                (handle_end_x - 2, anchor_y + head_height), # Bottom back
+                (handle_end_x + 5, anchor_y + 2),          # Handle joint bottom
+            ]
+        
+        # Draw the axe head with outline
+        pygame.draw.polygon(surface, steel_color, head_points)
+        pygame.draw.polygon(surface, steel_dark, head_points, 2)
+
+class WeaponSpriteCache:
+    def __init__(self):
+        self.sprites = {}  # pose key -> (SRCALPHA surface, offset from the player's position)
+        self.anchor = (WEAPON_SPRITE_SIZE[0] // 2, WEAPON_SPRITE_SIZE[1] // 2)
+        self.trail = True  # Draw the sword trail
+
+    def pose_key(self, weapon, facing_right, attacking, attack_frame, attack_duration):
+        # Everything the weapon art depends on, rounded so similar frames share a sprite
+        attack_progress = min(1.0, attack_frame / max(1, attack_duration)) if attacking else 0
+        swing_angle = 45
+        string_pull = 0
+        trail = None
+        if weapon == "sword":
+            if attacking and attack_progress < 0.5:
+                base_angle = -45 + (attack_progress * 180)
+                wobble = math.sin(attack_progress * math.pi * 4) * 5  # Reduced wobble
+                swing_angle = base_angle + wobble
+                if self.trail:
+                    trail = round(attack_progress / WEAPON_TRAIL_STEP) * WEAPON_TRAIL_STEP
+            swing_angle = round(swing_angle / WEAPON_ANGLE_STEP) * WEAPON_ANGLE_STEP
+        elif weapon == "bow":
+            if attacking:
+                string_pull = round(math.sin(attack_progress * math.pi) * 20)  # Maximum pull of 20 pixels
+        else:
+            attacking = False  # Spear and axe look the same while attacking
+        return (weapon, facing_right, swing_angle, string_pull, attacking, trail)
+
+    def get(self, key):
+        entry = self.sprites.get(key)
+        if entry is None:
+            weapon, facing_right, swing_angle, string_pull, attacking, trail = key
+            canvas = pygame.Surface(WEAPON_SPRITE_SIZE, pygame.SRCALPHA)
+            draw_weapon_art(canvas, weapon, facing_right, self.anchor[0], self.anchor[1],
+                            swing_angle, string_pull, attacking, trail)
+            # Keep only the drawn pixels to save memory
+            bounds = canvas.get_bounding_rect()
+            sprite = scale_art(canvas.subsurface(bounds).copy())
+            entry = (sprite, canvas_pos((bounds.x - self.anchor[0], bounds.y - self.anchor[1])))
+            self.sprites[key] = entry
+        return entry
+
+    def draw(self, window, player, camera_x=0):
+        key = self.pose_key(player.weapon, player.facing_right, player.attacking,
+                            player.attack_frame, player.attack_duration)
+        sprite, offset = self.get(key)
+        display.copy(window, sprite, (int(to_canvas(player.x - camera_x)) + offset[0], int(to_canvas(player.y)) + offset[1]))
+
+    def warm(self, weapon, attack_duration):
+        # Render every pose a weapon can show during one attack, both facings
+        for facing_right in (True, False):
+            self.get(self.pose_key(weapon, facing_right, False, 0, attack_duration))
+            for frame in range(attack_duration + 1):
+                self.get(self.pose_key(weapon, facing_right, True, frame, attack_duration))
+
+    def memory_bytes(self):
+        return sum(s.get_width() * s.get_height() * s.get_bytesize() for s, offset in self.sprites.values())
+
+    def report(self):
+        return f"Weapon sprite cache: {len(self.sprites)} sprites, {self.memory_bytes() // 1024} KB"
+
+weapon_sprites = WeaponSpriteCache()
+
+def warm_weapon_sprites(weapons):
+    for weapon in set(weapons):
+        weapon_sprites.warm(weapon, simulation.ATTACK_DURATIONS.get(weapon, 15))
+
+# Weapon button icons, rendered once per look and shared by every button
+class WeaponButtonIcons:
+    def __init__(self):
+        self.icons = {}  # icon key -> surface covering the button's bounds
+
+    def get(self, button, is_selected):
+        key = button.icon_key(is_selected)
+        icon = self.icons.get(key)
+        if icon is None:
+            icon = disk_cache.get(("weapon icon", RENDER_SCALE) + key, lambda: self.build(button, is_selected))
+            self.icons[key] = icon
+        return icon
+
+    def build(self, button, is_selected):
+        area = button.bounds()
+        icon = pygame.Surface(area.size, pygame.SRCALPHA)
+        button.draw_art(icon, button.rect.move(-area.x, -area.y), is_selected)
+        return scale_art(icon)
+
+weapon_button_icons = WeaponButtonIcons()
+
 class WeaponButton:
     def __init__(self, x, y, width, height, weapon_type, player_num):
         self.rect = pygame.Rect(x, y, width, height)
@@ -1525,16 +1944,24 @@ class WeaponButton:
         self.attack_duration = 30
         self.facing_right = True
         self.hover = False
-        # Load weapon images with full path
-        image_path = os.path.join(os.path.dirname(__file__), "images", f"{weapon_type}.png")
-        try:
-            self.image = pygame.image.load(image_path)
-            self.image = pygame.transform.scale(self.image, (50, 50))  # Made images bigger
-        except:
-            print(f"Could not load image: {image_path}")
-            self.image = None
+
+    def icon_key(self, is_selected):
+        # Everything the button art depends on
+        attack = (self.attack_frame, self.attack_duration) if self.attacking else None
+        return (self.weapon_type, self.rect.size, is_selected, self.hover and not is_selected,
+                self.facing_right, attack)
 
     def draw(self, window, font, is_selected):
+        window.blit(weapon_button_icons.get(self, is_selected), canvas_pos(self.bounds().topleft))
+        
+        # Draw label below button, straight at the canvas resolution so it stays sharp
+        button_font = get_font(24)
+        label = f"{self.weapon_type.title()}"
+        text = render_text(button_font, label, (0, 0, 0))
+        text_rect = text.get_rect(center=canvas_point((self.rect.centerx, self.rect.centery + 40)))
+        window.blit(text, text_rect)
+
+    def draw_art(self, window, rect, is_selected):
         # Define colors once at the start
         steel_color = (176, 196, 222)    # Light steel blue
         steel_dark = (119, 136, 153)     # Dark steel
@@ -1554,40 +1981,40 @@ class WeaponButton:
                     min(base_color[2] + 30, 255)) if self.hover else base_color
         
         # Draw button
-        pygame.draw.rect(window, color, self.rect)
-        pygame.draw.rect(window, (0, 0, 0), self.rect, 2)
+        pygame.draw.rect(window, color, rect)
+        pygame.draw.rect(window, (0, 0, 0), rect, 2)
         
         if is_selected:
-            pygame.draw.rect(window, (255, 215, 0), self.rect, 4)  # Gold border for selected
+            pygame.draw.rect(window, (255, 215, 0), rect, 4)  # Gold border for selected
         
         if self.weapon_type == "sword":
             # Diamond blade
             blade_length = 60
             # Main blade shape - ultra thin version
             blade_points = [
-                (self.rect.centerx + blade_length, self.rect.centery),  # Tip
-                (self.rect.centerx + (blade_length-10), self.rect.centery - 2),  # Top edge
-                (self.rect.centerx + 15, self.rect.centery),  # Base
-                (self.rect.centerx + (blade_length-10), self.rect.centery + 2),  # Bottom edge
+                (rect.centerx + blade_length, rect.centery),  # Tip
+                (rect.centerx + (blade_length-10), rect.centery - 2),  # Top edge
+                (rect.centerx + 15, rect.centery),  # Base
+                (rect.centerx + (blade_length-10), rect.centery + 2),  # Bottom edge
             ]
             pygame.draw.polygon(window, steel_color, blade_points)  # Light steel color
             
             # Add sharp edge highlight
             edge_points = [
-                (self.rect.centerx + blade_length, self.rect.centery),  # Tip
-                (self.rect.centerx + (blade_length-5), self.rect.centery - 2),  # Top edge
-                (self.rect.centerx + (blade_length-5), self.rect.centery + 2),  # Bottom edge
+                (rect.centerx + blade_length, rect.centery),  # Tip
+                (rect.centerx + (blade_length-5), rect.centery - 2),  # Top edge
+                (rect.centerx + (blade_length-5), rect.centery + 2),  # Bottom edge
             ]
             pygame.draw.lines(window, steel_dark, True, edge_points, 1)
 
             # Diamond pattern on blade
             for i in range(3):
-                diamond_x = self.rect.centerx + 25 + (i * 15)
+                diamond_x = rect.centerx + 25 + (i * 15)
                 diamond_points = [
-                    (diamond_x, self.rect.centery - 2),  # Top
-                    (diamond_x + 4, self.rect.centery),  # Right
-                    (diamond_x, self.rect.centery + 2),  # Bottom
-                    (diamond_x - 4, self.rect.centery),  # Left
+                    (diamond_x, rect.centery - 2),  # Top
+                    (diamond_x + 4, rect.centery),  # Right
+                    (diamond_x, rect.centery + 2),  # Bottom
+                    (diamond_x - 4, rect.centery),  # Left
                 ]
                 pygame.draw.polygon(window, diamond_shine, diamond_points)
                 pygame.draw.lines(window, steel_dark, True, diamond_points, 1)
@@ -1595,29 +2022,29 @@ class WeaponButton:
             # Gold diamond at base
             diamond_size = 6
             diamond_points = [
-                (self.rect.centerx + 15, self.rect.centery - diamond_size),  # Top
-                (self.rect.centerx + 15 + diamond_size, self.rect.centery),  # Right
-                (self.rect.centerx + 15, self.rect.centery + diamond_size),  # Bottom
-                (self.rect.centerx + 15 - diamond_size, self.rect.centery),  # Left
+                (rect.centerx + 15, rect.centery - diamond_size),  # Top
+                (rect.centerx + 15 + diamond_size, rect.centery),  # Right
+                (rect.centerx + 15, rect.centery + diamond_size),  # Bottom
+                (rect.centerx + 15 - diamond_size, rect.centery),  # Left
             ]
             pygame.draw.polygon(window, gold_color, diamond_points)
             pygame.draw.lines(window, brown_dark, True, diamond_points, 1)
 
             # Draw sword handle with wood grain
-            handle_x = self.rect.centerx + 15
-            draw_wood_handle(window, handle_x, self.rect.centery, 8, 20)
+            handle_x = rect.centerx + 15
+            draw_wood_handle(window, handle_x, rect.centery, 8, 20)
             
             # Wood guard - thinner version
-            guard_x = self.rect.centerx + 15
+            guard_x = rect.centerx + 15
             pygame.draw.rect(window, wood_color,
-                           (guard_x - 8, self.rect.centery - 3, 16, 6))
+                           (guard_x - 8, rect.centery - 3, 16, 6))
             
             # Diamond shine effects on blade
             for i in range(3):
-                shine_x = self.rect.centerx + 25 + (i*10)
+                shine_x = rect.centerx + 25 + (i*10)
                 pygame.draw.line(window, diamond_shine,
-                               (shine_x, self.rect.centery - 3 - i),
-                               (shine_x + 8, self.rect.centery - 5 - i), 2)
+                               (shine_x, rect.centery - 3 - i),
+                               (shine_x + 8, rect.centery - 5 - i), 2)
 
         elif self.weapon_type == "bow":
             # Colors
@@ -1640,35 +2067,35 @@ class WeaponButton:
             # Main bow curve
             if self.facing_right:
                 pygame.draw.arc(window, wood_color,
-                              [self.rect.centerx - 10, self.rect.centery - bow_height//2, 40, bow_height],
+                              [rect.centerx - 10, rect.centery - bow_height//2, 40, bow_height],
                               -math.pi/3, math.pi/3, 3)
                 # Decorative outer curve
                 pygame.draw.arc(window, wood_dark,
-                              [self.rect.centerx - 12, self.rect.centery - bow_height//2 - 2, 44, bow_height + 4],
+                              [rect.centerx - 12, rect.centery - bow_height//2 - 2, 44, bow_height + 4],
                               -math.pi/3, math.pi/3, 2)
             else:
                 pygame.draw.arc(window, wood_color,
-                              [self.rect.centerx - 30, self.rect.centery - bow_height//2, 40, bow_height],
+                              [rect.centerx - 30, rect.centery - bow_height//2, 40, bow_height],
                               2*math.pi/3, 4*math.pi/3, 3)
                 # Decorative outer curve
                 pygame.draw.arc(window, wood_dark,
-                              [self.rect.centerx - 32, self.rect.centery - bow_height//2 - 2, 44, bow_height + 4],
+                              [rect.centerx - 32, rect.centery - bow_height//2 - 2, 44, bow_height + 4],
                               2*math.pi/3, 4*math.pi/3, 2)
 
             # Gold decorations at bow tips
             tip_radius = 4
             # Top tip
-            top_x = self.rect.centerx + (10 if self.facing_right else -10)
-            pygame.draw.circle(window, gold_color, (top_x, self.rect.centery - bow_height//2), tip_radius)
-            pygame.draw.circle(window, wood_dark, (top_x, self.rect.centery - bow_height//2), tip_radius, 1)
+            top_x = rect.centerx + (10 if self.facing_right else -10)
+            pygame.draw.circle(window, gold_color, (top_x, rect.centery - bow_height//2), tip_radius)
+            pygame.draw.circle(window, wood_dark, (top_x, rect.centery - bow_height//2), tip_radius, 1)
             # Bottom tip
-            pygame.draw.circle(window, gold_color, (top_x, self.rect.centery + bow_height//2), tip_radius)
-            pygame.draw.circle(window, wood_dark, (top_x, self.rect.centery + bow_height//2), tip_radius, 1)
+            pygame.draw.circle(window, gold_color, (top_x, rect.centery + bow_height//2), tip_radius)
+            pygame.draw.circle(window, wood_dark, (top_x, rect.centery + bow_height//2), tip_radius, 1)
 
             # Diamond decorations on bow
             for i in range(2):
-                diamond_y = self.rect.centery - 15 + i * 30
-                diamond_x = self.rect.centerx + (5 if self.facing_right else -5)
+                diamond_y = rect.centery - 15 + i * 30
+                diamond_x = rect.centerx + (5 if self.facing_right else -5)
                 diamond_points = [
                     (diamond_x, diamond_y - 4),  # Top
                     (diamond_x + (4 if self.facing_right else -4), diamond_y),  # Right
@@ -1679,9 +2106,9 @@ class WeaponButton:
                 pygame.draw.lines(window, wood_dark, True, diamond_points, 1)
 
             # Bowstring
-            string_start = (top_x, self.rect.centery - bow_height//2)
-            string_end = (top_x, self.rect.centery + bow_height//2)
-            string_mid = (self.rect.centerx + (-15 - string_pull if self.facing_right else 15 + string_pull), self.rect.centery)
+            string_start = (top_x, rect.centery - bow_height//2)
+            string_end = (top_x, rect.centery + bow_height//2)
+            string_mid = (rect.centerx + (-15 - string_pull if self.facing_right else 15 + string_pull), rect.centery)
             
             # Draw curved bowstring
             points = [string_start, string_mid, string_end]
@@ -1690,29 +2117,29 @@ class WeaponButton:
             # Only draw arrow when attacking
             if self.attacking:
                 arrow_length = 30
-                arrow_x = self.rect.centerx + (-20 - string_pull if self.facing_right else 20 + string_pull)
+                arrow_x = rect.centerx + (-20 - string_pull if self.facing_right else 20 + string_pull)
                 arrow_dir = 1 if self.facing_right else -1
                 
                 # Wooden arrow shaft with gold rings
                 pygame.draw.line(window, wood_color,
-                               (arrow_x, self.rect.centery),
-                               (arrow_x + arrow_length * arrow_dir, self.rect.centery), 3)
+                               (arrow_x, rect.centery),
+                               (arrow_x + arrow_length * arrow_dir, rect.centery), 3)
                 
                 # Gold decorative rings
                 for i in range(2):
                     ring_x = arrow_x + (10 + i*10) * arrow_dir
-                    pygame.draw.circle(window, gold_color, (ring_x, self.rect.centery), 2)
-                    pygame.draw.circle(window, wood_dark, (ring_x, self.rect.centery), 2, 1)
+                    pygame.draw.circle(window, gold_color, (ring_x, rect.centery), 2)
+                    pygame.draw.circle(window, wood_dark, (ring_x, rect.centery), 2, 1)
 
                 # Steel arrowhead
                 head_length = 12
                 head_width = 6
                 head_x = arrow_x + arrow_length * arrow_dir
                 head_points = [
-                    (head_x, self.rect.centery),  # Base
-                    (head_x + head_length * arrow_dir, self.rect.centery),  # Tip
-                    (head_x + head_length * 0.7 * arrow_dir, self.rect.centery - head_width//2),  # Top barb
-                    (head_x + head_length * 0.7 * arrow_dir, self.rect.centery + head_width//2),  # Bottom barb
+                    (head_x, rect.centery),  # Base
+                    (head_x + head_length * arrow_dir, rect.centery),  # Tip
+                    (head_x + head_length * 0.7 * arrow_dir, rect.centery - head_width//2),  # Top barb
+                    (head_x + head_length * 0.7 * arrow_dir, rect.centery + head_width//2),  # Bottom barb
                 ]
                 pygame.draw.polygon(window, steel_color, head_points)
                 pygame.draw.lines(window, steel_dark, True, head_points, 1)
@@ -1722,9 +2149,9 @@ class WeaponButton:
                 feather_width = 3
                 for offset in [-1, 1]:  # Top and bottom feathers
                     feather_points = [
-                        (arrow_x, self.rect.centery + offset * feather_width),
-                        (arrow_x - feather_length * arrow_dir, self.rect.centery),
-                        (arrow_x, self.rect.centery)
+                        (arrow_x, rect.centery + offset * feather_width),
+                        (arrow_x - feather_length * arrow_dir, rect.centery),
+                        (arrow_x, rect.centery)
                     ]
                     pygame.draw.polygon(window, WHITE, feather_points)
                     pygame.draw.lines(window, (200, 200, 200), True, feather_points, 1)
@@ -1739,25 +2166,25 @@ class WeaponButton:
 
             shaft_length = 80
             head_length = 25
-            shaft_end = self.rect.centerx + (shaft_length if self.facing_right else -shaft_length)
+            shaft_end = rect.centerx + (shaft_length if self.facing_right else -shaft_length)
             
             # Wooden shaft with decorative rings
             pygame.draw.line(window, wood_color,
-                           (self.rect.centerx, self.rect.centery),
-                           (shaft_end, self.rect.centery), 3)
+                           (rect.centerx, rect.centery),
+                           (shaft_end, rect.centery), 3)
             
             # Gold rings along shaft
             for i in range(3):
-                ring_x = self.rect.centerx + ((20 + i*25) if self.facing_right else -(20 + i*25))
-                pygame.draw.circle(window, gold_color, (ring_x, self.rect.centery), 3)
-                pygame.draw.circle(window, wood_dark, (ring_x, self.rect.centery), 3, 1)
+                ring_x = rect.centerx + ((20 + i*25) if self.facing_right else -(20 + i*25))
+                pygame.draw.circle(window, gold_color, (ring_x, rect.centery), 3)
+                pygame.draw.circle(window, wood_dark, (ring_x, rect.centery), 3, 1)
 
             # Spearhead - steel blade
             head_points = [
-                (shaft_end, self.rect.centery),  # Base
-                (shaft_end + (head_length if self.facing_right else -head_length), self.rect.centery),  # Tip
-                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), self.rect.centery - 8),  # Top barb
-                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), self.rect.centery + 8),  # Bottom barb
+                (shaft_end, rect.centery),  # Base
+                (shaft_end + (head_length if self.facing_right else -head_length), rect.centery),  # Tip
+                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), rect.centery - 8),  # Top barb
+                (shaft_end + (head_length*0.8 if self.facing_right else -head_length*0.8), rect.centery + 8),  # Bottom barb
             ]
             pygame.draw.polygon(window, steel_color, head_points)
             pygame.draw.lines(window, steel_dark, True, head_points, 2)
@@ -1766,24 +2193,24 @@ class WeaponButton:
             for i in range(2):
                 diamond_x = shaft_end + ((head_length*0.4 + i*8) if self.facing_right else -(head_length*0.4 + i*8))
                 diamond_points = [
-                    (diamond_x, self.rect.centery - 3),  # Top
-                    (diamond_x + (3 if self.facing_right else -3), self.rect.centery),  # Right
-                    (diamond_x, self.rect.centery + 3),  # Bottom
-                    (diamond_x - (3 if self.facing_right else -3), self.rect.centery),  # Left
+                    (diamond_x, rect.centery - 3),  # Top
+                    (diamond_x + (3 if self.facing_right else -3), rect.centery),  # Right
+                    (diamond_x, rect.centery + 3),  # Bottom
+                    (diamond_x - (3 if self.facing_right else -3), rect.centery),  # Left
                 ]
                 pygame.draw.polygon(window, diamond_shine, diamond_points)
                 pygame.draw.lines(window, steel_dark, True, diamond_points, 1)
 
             # Gold decoration at spear base
-            base_x = self.rect.centerx + (5 if self.facing_right else -5)
-            pygame.draw.circle(window, gold_color, (base_x, self.rect.centery), 4)
+            base_x = rect.centerx + (5 if self.facing_right else -5)
+            pygame.draw.circle(window, gold_color, (base_x, rect.centery), 4)
             # Add diamond decoration to pommel
             pommel_diamond_size = 2
             pommel_diamond_points = []
             for i in range(4):
                 point_angle = math.pi/2 + (i * math.pi/2)
                 dx = base_x + math.cos(point_angle) * pommel_diamond_size
-                dy = self.rect.centery + math.sin(point_angle) * pommel_diamond_size
+                dy = rect.centery + math.sin(point_angle) * pommel_diamond_size
                 pommel_diamond_points.append((dx, dy))
             pygame.draw.polygon(window, diamond_shine, pommel_diamond_points)
             pygame.draw.polygon(window, steel_dark, pommel_diamond_points, 1)
@@ -1799,46 +2226,43 @@ class WeaponButton:
             head_height = 25    # Taller head height
             
             # Calculate positions based on direction
-            handle_end_x = self.rect.centerx + (handle_length if self.facing_right else -handle_length)
+            handle_end_x = rect.centerx + (handle_length if self.facing_right else -handle_length)
             
             # Draw wooden handle
             pygame.draw.line(window, wood_color,
-                           (self.rect.centerx, self.rect.centery),
-                           (handle_end_x, self.rect.centery),
+                           (rect.centerx, rect.centery),
+                           (handle_end_x, rect.centery),
                            handle_width)
             
             # Draw axe head
             if self.facing_right:
                 head_points = [
-                    (handle_end_x - 5, self.rect.centery - 2),           # Handle joint top
-                    (handle_end_x + 2, self.rect.centery - head_height), # Top back
-                    (handle_end_x + 20, self.rect.centery - head_height + 5), # Top front sharp
-                    (handle_end_x + 25, self.rect.centery),             # Front point
-                    (handle_end_x + 20, self.rect.centery + head_height - 5), # Bottom front sharp
-                    (handle_end_x + 2, self.rect.centery + head_height), # Bottom back
-                    (handle_end_x - 5, self.rect.centery + 2),          # Handle joint bottom
+                    (handle_end_x - 5, rect.centery - 2),           # Handle joint top
+                    (handle_end_x + 2, rect.centery - head_height), # Top back
+                    (handle_end_x + 20, rect.centery - head_height + 5), # Top front sharp
+                    (handle_end_x + 25, rect.centery),             # Front point
+                    (handle_end_x + 20, rect.centery + head_height - 5), # Bottom front sharp
+                    (handle_end_x + 2, rect.centery + head_height), # Bottom back
+                    (handle_end_x - 5, rect.centery + 2),          # Handle joint bottom
                 ]
             else:
                 head_points = [
-                    (handle_end_x + 5, self.rect.centery - 2),           # Handle joint top
-                    (handle_end_x - 2, self.rect.centery - head_height), # Top back
-                    (handle_end_x - 20, self.rect.centery - head_height + 5), # Top front sharp
-                    (handle_end_x - 25, self.rect.centery),             # Front point
-                    (handle_end_x - 20, self.rect.centery + head_height - 5), # Bottom front sharp
-                    (handle_end_x - 2, self.rect.centery + head_height), # Bottom back
-                    (handle_end_x + 5, self.rect.centery + 2),          # Handle joint bottom
+                    (handle_end_x + 5, rect.centery - 2),           # Handle joint top
+                    (handle_end_x - 2, rect.centery - head_height), # Top back
+                    (handle_end_x - 20, rect.centery - head_height + 5), # Top front sharp
+                    (handle_end_x - 25, rect.centery),             # Front point
+                    (handle_end_x - 20, rect.centery + head_height - 5), # Bottom front sharp
+                    (handle_end_x - 2, rect.centery + head_height), # Bottom back
+                    (handle_end_x + 5, rect.centery + 2),          # Handle joint bottom
                 ]
             
             # Draw the axe head with outline
             pygame.draw.polygon(window, steel_color, head_points)
             pygame.draw.polygon(window, steel_dark, head_points, 2)
         
-        # Draw label below button
-        button_font = pygame.font.Font(None, 24)
-        label = f"{self.weapon_type.title()}"
-        text = button_font.render(label, True, (0, 0, 0))
-        text_rect = text.get_rect(center=(self.rect.centerx, self.rect.centery + 40))
-        window.blit(text, text_rect)
+    def bounds(self):
+        # Weapon art and label reach outside the button itself
+        return pygame.Rect(self.rect.centerx - 45, self.rect.centery - 35, 155, 85)
         
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
@@ -1856,20 +2280,24 @@ class Button:
         self.color = (100, 100, 100)  # Default gray
         self.hover_color = (150, 150, 150)  # Lighter gray for hover
         self.text_color = (0, 0, 0)
-        self.font = pygame.font.Font(None, 32)
+        self.font = get_font(32)
         self.is_hovered = False
 
     def draw(self, window):
         # Draw button background
         color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(window, color, self.rect)
-        pygame.draw.rect(window, (0, 0, 0), self.rect, 2)  # Black border
+        rect = canvas_rect(self.rect)
+        pygame.draw.rect(window, color, rect)
+        pygame.draw.rect(window, (0, 0, 0), rect, canvas_length(2))  # Black border
         
         # Draw text
-        text_surface = self.font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
+        text_surface = render_text(self.font, self.text, self.text_color)
+        text_rect = text_surface.get_rect(center=rect.center)
         window.blit(text_surface, text_rect)
 
+    def bounds(self):
+        return self.rect.inflate(4, 4)
+
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
             self.is_hovered = self.rect.collidepoint(event.pos)
@@ -1889,103 +2317,265 @@ mountains = [
     Mountain(500, 180),
     Mountain(700, 220)
 ]
-benches = [
-    Bench(200, 450, 200, 15),   # Middle high bench
-    Bench(500, 500, 200, 15),   # Right ground bench
-    Bench(100, 500, 200, 15),   # Left ground bench
-    Bench(50, 350, 150, 15),    # Left high bench
-    Bench(600, 350, 150, 15),   # Right high bench
-    Bench(350, 250, 150, 15),   # Top middle bench
-    Bench(350, 500, 100, 15),   # Small middle ground bench
-    Bench(350, 150, 100, 15),   # Very top bench
-]
+benches = []  # Benches and platforms come from the simulation's arena layout
+platforms = []
 
-# Create platforms (benches)
-platforms = [
-    pygame.Rect(200, 450, 200, 20),   # Middle high bench
-    pygame.Rect(500, 500, 200, 20),   # Right ground bench
-    pygame.Rect(100, 500, 200, 20),   # Left ground bench
-    pygame.Rect(50, 350, 150, 20),    # Left high bench
-    pygame.Rect(600, 350, 150, 20),   # Right high bench
-    pygame.Rect(350, 250, 150, 20),   # Top middle bench
-    pygame.Rect(350, 500, 100, 20),   # Small middle ground bench
-    pygame.Rect(350, 150, 100, 20),   # Very top bench
-]
+# Arena layout: the simulation's benches and platforms, and the mountains above repeated across wider arenas
+class ArenaLayout:
+    def __init__(self):
+        self.width = None
+        self.screen_mountains = list(mountains)
+
+    def fit(self, game_map):
+        # The lists are updated in place, everything keeps using the same ones
+        if game_map.arena_width == self.width:
+            return
+        self.width = game_map.arena_width
+        benches[:], platforms[:] = simulation.arena_layout(self.width, Bench)
+        offsets = range(simulation.SCREEN_WIDTH, self.width, simulation.SCREEN_WIDTH)
+        mountains[:] = self.screen_mountains + [Mountain(mountain.x + dx, mountain.height)
+                                                for dx in offsets for mountain in self.screen_mountains]
+
+arena_layout = ArenaLayout()
+arena_layout.fit(game_options.current_map)
+
+# Camera over the arena, it scrolls sideways to follow both fighters
+class Camera:
+    def __init__(self, view_width, view_height):
+        self.x = 0  # Left edge of the view in arena coordinates
+        self.view_width = view_width
+        self.view_height = view_height
+
+    def view(self):
+        return pygame.Rect(self.x, 0, self.view_width, self.view_height)
+
+    def follow(self, arena_width, *players):
+        # Center on the fighters, the simulation already keeps them within one view of each other
+        players = [player for player in players if player]
+        if not players:
+            return
+        middle = (min(player.x for player in players) + max(player.x for player in players)) / 2
+        self.x = int(max(0, min(arena_width - self.view_width, middle - self.view_width / 2)))
+
+    def sees(self, rect):
+        return self.view().colliderect(rect)
+
+    def to_screen(self, rect):
+        return pygame.Rect(rect).move(-self.x, 0)
+
+camera = Camera(WINDOW_WIDTH, WINDOW_HEIGHT)
 
 # Colors for benches
 bench_color = (139, 69, 19)  # Dark wood color
 bench_border = (90, 50, 10)  # Darker wood for border
 
-def draw_window(window, player1, player2, mountains, benches, options):
-    # Draw background based on current map
-    if options.current_map == NIGHT_MAP:
-        # Draw stars
-        for _ in range(50):
-            x = random.randint(0, WINDOW_WIDTH)
-            y = random.randint(0, WINDOW_HEIGHT // 2)
-            pygame.draw.circle(window, (255, 255, 255), (x, y), 1)
+# Static arena art, rebuilt only when the map, bench colors or render scale change
+class ArenaLayer:
+    def __init__(self):
+        self.key = None
+        self.background = None  # Sky and mountains
+        self.platform_art = None  # Benches and platforms, colorkeyed so the sky shows through
+        self.builds = 0
+
+    def get(self, game_map, mountains, benches, width, height):
+        key = (game_map.name, width, height, tuple(bench.color for bench in benches))
+        if key != self.key:
+            self.build(game_map, mountains, benches, width, height)
+            self.key = key
+            self.builds += 1
+        return self.background, self.platform_art
+
+    def build(self, game_map, mountains, benches, width, height):
+        # Sizes are logical, the art is drawn at the canvas resolution
+        size = canvas_pos((width, height))
+        self.background = sky_gradient_cache.get(game_map, *size).copy()
+        for mountain in mountains:
+            mountain.draw(self.background)
+        
+        transparent = (255, 0, 255)
+        self.platform_art = pygame.Surface(size).convert(screen)
+        self.platform_art.fill(transparent)
+        self.platform_art.set_colorkey(transparent, pygame.RLEACCEL)
+        for bench in benches:
+            bench.draw(self.platform_art)
         
-        # Draw moon
-        pygame.draw.circle(window, (200, 200, 200), (100, 100), 30)
-        pygame.draw.circle(window, (20, 24, 82), (85, 85), 30)  # Dark overlay for crescent effect
-        
-        # Add slight dark overlay
-        dark_overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        dark_overlay.fill((20, 24, 82))
-        dark_overlay.set_alpha(50)  # Reduced opacity to keep some color visible
-        window.blit(dark_overlay, (0, 0))
-    
-    elif options.current_map == VOLCANO_MAP:
-        # Add smoke particles at volcano positions
-        if random.random() < 0.1:  # 10% chance each frame
-            for mountain in mountains:
-                smoke_particles.append(SmokeParticle(mountain.points[1][0], mountain.points[1][1]))
+        # Draw platforms (benches)
+        for platform in platforms:
+            pygame.draw.rect(self.platform_art, bench_color, canvas_rect(platform))
+            pygame.draw.rect(self.platform_art, bench_border, canvas_rect(platform), canvas_length(2))  # Add border
+            
+            # Draw bench legs
+            leg_width = 10
+            pygame.draw.rect(self.platform_art, bench_color, canvas_rect((platform.left + 20, platform.bottom, leg_width, 30)))
+            pygame.draw.rect(self.platform_art, bench_color, canvas_rect((platform.right - 30, platform.bottom, leg_width, 30)))
+
+    def clear(self):
+        self.key = None
+        self.background = None
+        self.platform_art = None
+
+arena_layer = ArenaLayer()
+
+# Stars, moon and color tint for the maps that have them
+STAR_COUNT = 50
+STAR_TWINKLE = True  # Cycle through a few pre-baked star frames
+STAR_FRAMES = 4
+STAR_FRAME_TIME = 150  # Milliseconds each star frame is shown
+
+MAP_TINTS = {
+    "Volcano": ((255, 50, 0), 20),  # Very subtle red glow
+}
+
+class AtmosphereLayers:
+    def __init__(self):
+        self.layers = {}  # (map name, width, height) -> (star frames, tint overlay)
+
+    def get(self, game_map, width, height):
+        key = (game_map.name, width, height)
+        layers = self.layers.get(key)
+        if layers is None:
+            layers = (self.build_stars(game_map, width, height), self.build_tint(game_map, width, height))
+            self.layers[key] = layers
+        return layers
+
+    def build_stars(self, game_map, width, height):
+        if game_map != NIGHT_MAP:
+            return []
+        rng = random.Random(game_map.name)  # Same sky every time
+        stars = [(rng.randint(0, width), rng.randint(0, height // 2)) for _ in range(STAR_COUNT)]
+        frames = []
+        for frame in range(STAR_FRAMES if STAR_TWINKLE else 1):
+            key = ("stars", game_map.name, width, height, RENDER_SCALE, STAR_COUNT, STAR_TWINKLE, frame)
+            frames.append(disk_cache.get(key, lambda: self.build_star_frame(stars, frame, width, height)))
+        return frames
+
+    def build_star_frame(self, stars, frame, width, height):
+        transparent = (255, 0, 255)
+        layer = pygame.Surface(canvas_pos((width, height))).convert(screen)
+        layer.fill(transparent)
+        layer.set_colorkey(transparent, pygame.RLEACCEL)
+        
+        # Draw stars, each one dims now and then
+        for i, (x, y) in enumerate(stars):
+            brightness = 255 if not STAR_TWINKLE or (i + frame) % 3 else 150
+            pygame.draw.circle(layer, (brightness, brightness, brightness), canvas_pos((x, y)), canvas_length(1))
         
-        # Add reddish glow effect
-        glow_overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        glow_overlay.fill((255, 50, 0))
-        glow_overlay.set_alpha(20)  # Very subtle red glow
-        window.blit(glow_overlay, (0, 0))
-    
-    elif options.current_map == DESERT_MAP:
-        # Only update birds and airplanes in desert
-        clouds.clear()  # Remove clouds in desert
-        
-        # Make sand particles more visible
-        for particle in sand_particles:
-            particle.alpha = min(255, particle.alpha + 2)
-    
-    # Draw sky elements based on current map
-    if options.current_map != DESERT_MAP:  # No clouds in desert
-        for cloud in clouds:
-            cloud.move()
-            cloud.draw(window)
-    
-    for bird in birds:
-        bird.move()
-        bird.draw(window)
-    
-    for airplane in airplanes:
-        if airplane.x > WINDOW_WIDTH + 200:
-            airplane.x = -200
-            airplane.y = random.randint(30, 170)
-            airplane.size = random.uniform(2.0, 2.5)
-        if airplane.x > -200:  # Only draw and move if airplane is active
-            airplane.draw(window)
-            airplane.move()
-    
-    # Draw mountains and benches
-    for mountain in mountains:
-        mountain.draw(window)
-    
-    for bench in benches:
-        bench.draw(window)
-    
-    # Draw players
-    if player1:
-        player1.draw(window)
-    if player2:
-        player2.draw(window)
+        # Draw moon
+        pygame.draw.circle(layer, (200, 200, 200), canvas_pos((100, 100)), canvas_length(30))
+        pygame.draw.circle(layer, (20, 24, 82), canvas_pos((85, 85)), canvas_length(30))  # Dark overlay for crescent effect
+        return layer
+
+    def build_tint(self, game_map, width, height):
+        if game_map.name not in MAP_TINTS:
+            return None
+        color, alpha = MAP_TINTS[game_map.name]
+        tint = pygame.Surface(canvas_pos((width, height))).convert(screen)
+        tint.fill(color)
+        tint.set_alpha(alpha)
+        return tint
+
+    def star_frame(self):
+        if not STAR_TWINKLE:
+            return 0
+        return pygame.time.get_ticks() // STAR_FRAME_TIME % STAR_FRAMES
+
+    def draw(self, window, game_map):
+        star_frames, tint = self.get(game_map, WINDOW_WIDTH, WINDOW_HEIGHT)
+        if star_frames:
+            display.copy(window, star_frames[self.star_frame()], (0, 0))
+        if tint is not None:
+            display.copy(window, tint, (0, 0))
+
+    def clear(self):
+        self.layers.clear()
+
+atmosphere = AtmosphereLayers()
+
+# Night lighting: baked radial lights are added into a light buffer that is multiplied onto the frame
+NIGHT_AMBIENT = (110, 120, 180)  # Light away from any torch, a bluish moonlight
+LIGHT_RADIUS_STEP = 4  # Light radii are rounded to this step so lights share sprites
+TORCH_RADIUS = 90
+TORCH_FLICKER = 8  # How far the torch light radius wanders
+TORCH_COLOR = (255, 170, 90)
+ARROW_LIGHT_RADIUS = 36
+ARROW_LIGHT_COLOR = (255, 210, 140)
+HALO_RADIUS = 70
+
+class LightMap:
+    def __init__(self, ambient=NIGHT_AMBIENT):
+        self.ambient = ambient
+        self.sprites = {}  # (radius, color) -> light sprite
+        self.buffer = None  # Light buffer, reused every frame
+        self.torch = None  # Torch art, bottom center on the bench
+        self.lights = []  # (x, y, radius, color) on screen this frame
+        self.lights_time = None
+
+    def get(self, radius, color):
+        key = (radius, color)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            # Brightness falls off towards the edge, worked out for the whole sprite at once with NumPy
+            radius = canvas_length(radius)
+            offsets = np.arange(radius * 2 + 1) - radius
+            distance = np.hypot(offsets[:, None], offsets[None, :]) / radius
+            falloff = np.clip(1 - distance, 0, 1) ** 2
+            pixels = (falloff[:, :, None] * np.array(color, np.float32)).astype(np.uint8)
+            sprite = pygame.surfarray.make_surface(pixels).convert(screen)
+            self.sprites[key] = sprite
+        return sprite
+
+    def torch_spots(self, benches, camera_x=0):
+        # A torch stands on both ends of every bench
+        for bench in benches:
+            for x in (bench.x + 8, bench.x + bench.width - 8):
+                yield x - camera_x, bench.y
+
+    def draw_torches(self, window, benches, camera_x=0):
+        if self.torch is None:
+            self.torch = pygame.Surface(canvas_pos((10, 26)))
+            self.torch.fill((255, 0, 255))
+            pygame.draw.rect(self.torch, (90, 50, 20), canvas_rect((4, 10, 3, 16)))  # Handle
+            pygame.draw.ellipse(self.torch, (255, 140, 0), canvas_rect((1, 0, 9, 12)))  # Flame
+            pygame.draw.ellipse(self.torch, (255, 230, 120), canvas_rect((3, 4, 5, 7)))
+            self.torch.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+        for x, y in self.torch_spots(benches, camera_x):
+            if -10 < x < WINDOW_WIDTH + 10:
+                display.copy(window, self.torch, canvas_pos((x - 5, y - 26)))
+
+    def gather(self, time, benches, arrows, players, camera_x=0):
+        # Lights on screen at the given time, worked out once per frame
+        if time == self.lights_time:
+            return self.lights
+        lights = []
+        for i, (x, y) in enumerate(self.torch_spots(benches, camera_x)):
+            flicker = math.sin(time * 0.012 + i * 1.7) * TORCH_FLICKER
+            radius = round((TORCH_RADIUS + flicker) / LIGHT_RADIUS_STEP) * LIGHT_RADIUS_STEP
+            lights.append((x, y - 20, radius, TORCH_COLOR))
+        for arrow in arrows:
+            lights.append((int(arrow.x - camera_x), int(arrow.y), ARROW_LIGHT_RADIUS, ARROW_LIGHT_COLOR))
+        for player in players:
+            if player:
+                halo = tuple(min(255, c // 2 + 110) for c in player.color)
+                lights.append((int(player.x - camera_x), int(player.y) + 10, HALO_RADIUS, halo))
+        self.lights = [light for light in lights if -light[2] < light[0] < WINDOW_WIDTH + light[2]]
+        self.lights_time = time
+        return self.lights
+
+    def bounds(self, light):
+        x, y, radius, color = light
+        return pygame.Rect(x - radius, y - radius, radius * 2 + 1, radius * 2 + 1)
+
+    def draw(self, window, lights):
+        # Ambient light plus every light, then one multiply over the frame
+        size = window.get_size()
+        if self.buffer is None or self.buffer.get_size() != size:
+            self.buffer = pygame.Surface(size).convert(screen)
+        self.buffer.fill(self.ambient)
+        self.buffer.blits([(self.get(radius, color), canvas_pos((x - radius, y - radius)), None, pygame.BLEND_ADD)
+                           for x, y, radius, color in lights], False)
+        display.copy(window, self.buffer, (0, 0), special_flags=pygame.BLEND_MULT, changed=True)
+
+night_lights = LightMap()
 
 def check_winner():
     if player1.health <= 0:
@@ -2004,25 +2594,25 @@ def draw_game_over(window, font, player1, player2):
     else:
         winner = player1.name
     
-    title_font = pygame.font.Font(None, 48)  # Smaller font size
-    title_text = title_font.render(f"{winner} Wins!", True, (0, 0, 0))
-    window.blit(title_text, (WINDOW_WIDTH//2 - title_text.get_width()//2, 50))
+    title_font = get_font(48)  # Smaller font size
+    title_text = render_text(title_font, f"{winner} Wins!", (0, 0, 0))
+    window.blit(title_text, title_text.get_rect(centerx=to_canvas(WINDOW_WIDTH//2), top=to_canvas(50)))
     
     # Draw player labels (exactly like home screen)
-    player_font = pygame.font.Font(None, 36)
-    p1_text = player_font.render("Player 1", True, (0, 0, 0))
-    p2_text = player_font.render("Player 2", True, (0, 0, 0))
-    window.blit(p1_text, (WINDOW_WIDTH//4 - 30, 100))  
-    window.blit(p2_text, (2*WINDOW_WIDTH//3 - 30, 100))
+    player_font = get_font(36)
+    p1_text = render_text(player_font, "Player 1", (0, 0, 0))
+    p2_text = render_text(player_font, "Player 2", (0, 0, 0))
+    window.blit(p1_text, canvas_pos((WINDOW_WIDTH//4 - 30, 100)))  
+    window.blit(p2_text, canvas_pos((2*WINDOW_WIDTH//3 - 30, 100)))
     
     # Draw name input boxes
     draw_name_inputs(window, player_font)  # Use player_font size
     
     # Draw weapon selection text
-    p1_text = player_font.render("P1 Weapon", True, (0, 0, 0))
-    p2_text = player_font.render("P2 Weapon", True, (0, 0, 0))
-    window.blit(p1_text, (WINDOW_WIDTH//4 - p1_text.get_width()//2, 200))
-    window.blit(p2_text, (3*WINDOW_WIDTH//4 - p2_text.get_width()//2, 200))
+    p1_text = render_text(player_font, "P1 Weapon", (0, 0, 0))
+    p2_text = render_text(player_font, "P2 Weapon", (0, 0, 0))
+    window.blit(p1_text, p1_text.get_rect(centerx=to_canvas(WINDOW_WIDTH//4), top=to_canvas(200)))
+    window.blit(p2_text, p2_text.get_rect(centerx=to_canvas(3*WINDOW_WIDTH//4), top=to_canvas(200)))
     
     # Draw weapon buttons
     for button in game_over_weapon_buttons:
@@ -2031,8 +2621,8 @@ def draw_game_over(window, font, player1, player2):
         button.draw(window, player_font, is_selected)
     
     # Draw map selection text and buttons
-    map_text = player_font.render("Select Map", True, (0, 0, 0))
-    window.blit(map_text, (WINDOW_WIDTH//2 - map_text.get_width()//2, WINDOW_HEIGHT - 250))
+    map_text = render_text(player_font, "Select Map", (0, 0, 0))
+    window.blit(map_text, map_text.get_rect(centerx=to_canvas(WINDOW_WIDTH//2), top=to_canvas(WINDOW_HEIGHT - 250)))
     
     # Draw map buttons in a row
     map_spacing = 120  # Space between map buttons
@@ -2044,7 +2634,7 @@ def draw_game_over(window, font, player1, player2):
         button.rect.y = WINDOW_HEIGHT - 200
         is_selected = button.map == game_options.current_map
         # Update hover state based on mouse position
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         button.is_hovered = button.rect.collidepoint(mouse_pos)
         button.draw(window, player_font, is_selected)
     
@@ -2058,7 +2648,7 @@ def draw_game_over(window, font, player1, player2):
         bench.draw(window)
     
     # Draw buttons at the bottom with hover state
-    mouse_pos = pygame.mouse.get_pos()
+    mouse_pos = display.mouse_pos()
     start_button.is_hovered = start_button.rect.collidepoint(mouse_pos)
     quit_button.is_hovered = quit_button.rect.collidepoint(mouse_pos)
     start_button.draw(window)
@@ -2079,7 +2669,7 @@ def handle_game_over_events(event):
                 game_options.p2_weapon = button.weapon_type
     
     if event.type == pygame.MOUSEBUTTONDOWN:
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         
         # Handle start button click
         if start_button.rect.collidepoint(mouse_pos):
@@ -2096,7 +2686,7 @@ def handle_menu_events(event):
     handle_name_input(event)
     
     if event.type == pygame.MOUSEBUTTONDOWN:
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         
         # Handle weapon selection
         for button in menu_weapon_buttons:
@@ -2121,42 +2711,22 @@ def handle_menu_events(event):
             running = False
 
 def handle_playing_events(event):
-    global game_state
-    
     if event.type == pygame.MOUSEBUTTONDOWN:
         # Handle map selection during gameplay
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         for button in map_buttons:
-            if button.rect.collidepoint(mouse_pos):
+            if button.rect.collidepoint(mouse_pos) and not session:  # Both peers would have to agree
                 game_options.current_map = button.map
+                game.select_map(MAPS.index(button.map))
                 return
     
     if event.type == pygame.KEYDOWN:
-        # Player 1 jump with SPACE
-        if event.key == pygame.K_SPACE:
-            player1.dy = player1.jump_power
-            player1.is_jumping = True
-            player1.on_platform = False
-            player1.current_platform = None
-            jump_sound.play()  # Play jump sound
-        # Player 2 jump with UP
-        if event.key == pygame.K_UP:
-            player2.dy = player2.jump_power
-            player2.is_jumping = True
-            player2.on_platform = False
-            player2.current_platform = None
-            jump_sound.play()  # Play jump sound
-
-    # Get current keyboard state for attacks
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_q]:
-        player1.attack(player2)
-    elif keys[pygame.K_SLASH]:
-        player2.attack(player1)
-    
-    # Check for game over
-    if player1.health <= 0 or player2.health <= 0:
-        game_state = GAME_OVER
+        # Jumps (SPACE and UP) and attacks (Q and /) go into the next tick's input
+        for i, player in enumerate((player1, player2)):
+            if event.key == player.controls["jump"]:
+                pressed_buttons[i] |= simulation.JUMP
+            if event.key == player.controls["attack"]:
+                pressed_buttons[i] |= simulation.ATTACK
 
 def handle_game_over_events(event):
     global game_state, running
@@ -2173,7 +2743,7 @@ def handle_game_over_events(event):
                 game_options.p2_weapon = button.weapon_type
     
     if event.type == pygame.MOUSEBUTTONDOWN:
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         
         # Handle start button click
         if start_button.rect.collidepoint(mouse_pos):
@@ -2189,7 +2759,7 @@ class MapButton:
         self.rect = pygame.Rect(x, y, width, height)
         self.map = map_data
         self.is_hovered = False
-        self.font = pygame.font.Font(None, 24)  # Smaller font size
+        self.font = get_font(24)  # Smaller font size
     
     def draw(self, window, font, is_selected):
         # Draw button background with map color
@@ -2198,17 +2768,21 @@ class MapButton:
             # Make color lighter when hovered
             color = tuple(min(c + 30, 255) for c in color)
         
-        pygame.draw.rect(window, color, self.rect)
-        pygame.draw.rect(window, (0, 0, 0), self.rect, 2)  # Black border
+        rect = canvas_rect(self.rect)
+        pygame.draw.rect(window, color, rect)
+        pygame.draw.rect(window, (0, 0, 0), rect, canvas_length(2))  # Black border
         
         if is_selected:
-            pygame.draw.rect(window, (255, 215, 0), self.rect, 4)  # Gold border for selected
+            pygame.draw.rect(window, (255, 215, 0), rect, canvas_length(4))  # Gold border for selected
         
         # Draw map name with smaller font
-        text = self.font.render(self.map.name, True, (0, 0, 0))
-        text_rect = text.get_rect(center=self.rect.center)
+        text = render_text(self.font, self.map.name, (0, 0, 0))
+        text_rect = text.get_rect(center=rect.center)
         window.blit(text, text_rect)
     
+    def bounds(self):
+        return self.rect.inflate(4, 4)
+    
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
             self.is_hovered = self.rect.collidepoint(event.pos)
@@ -2234,12 +2808,6 @@ game_options.current_map = MAPS[0]
 
 # Update draw functions to show map buttons
 def draw_menu(window):
-    # Draw background with current map color
-    window.fill(game_options.current_map.color)
-    
-    # Draw sky elements
-    draw_sky(window)
-    
     # Draw name input boxes
     draw_name_inputs(window, font)
     
@@ -2281,7 +2849,7 @@ def handle_menu_events(event):
                 return
         
         # Handle start and quit buttons
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         if start_button.rect.collidepoint(mouse_pos):
             if p1_name_input.strip() and p2_name_input.strip():
                 start_new_game()
@@ -2341,14 +2909,34 @@ game_over_weapon_buttons = create_weapon_buttons(WINDOW_HEIGHT//2 - 50)
 # Initialize clock at the start
 clock = pygame.time.Clock()
 
+def wait_for_peer():
+    # Keep the window responsive while the other player connects; closing it or Escape gives up
+    global running
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+            return False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            return False
+    return True
+
+def end_network_match(reason):
+    # The other player is gone: report the session and go back to the menu
+    global game_state, session
+    print(f"Netplay: {reason}")
+    print(session.report())
+    session = None
+    if game_state == PLAYING:
+        game_state = MENU
+
 def start_new_game():
-    global game_state, player1, player2, game
+    global game_state, player1, player2, game, session, net_round
     
     # Create players with their selected weapons
     player1 = Player(100, WINDOW_HEIGHT - 100, (255, 0, 0), True, 
-                    {"left": pygame.K_a, "right": pygame.K_d, "up": pygame.K_w, "attack": pygame.K_SPACE, "defend": pygame.K_e}, 1)
+                    {"left": pygame.K_a, "right": pygame.K_d, "up": pygame.K_w, "jump": pygame.K_SPACE, "attack": pygame.K_q, "defend": pygame.K_e}, 1)
     player2 = Player(WINDOW_WIDTH - 100, WINDOW_HEIGHT - 100, (0, 0, 255), False,
-                    {"left": pygame.K_LEFT, "right": pygame.K_RIGHT, "up": pygame.K_UP, "attack": pygame.K_RETURN, "defend": pygame.K_RSHIFT}, 2)
+                    {"left": pygame.K_LEFT, "right": pygame.K_RIGHT, "up": pygame.K_UP, "jump": pygame.K_UP, "attack": pygame.K_SLASH, "defend": pygame.K_RSHIFT}, 2)
     
     # Set names from current input (or default if empty)
     player1.name = p1_name_input if p1_name_input else "P1"
@@ -2362,76 +2950,795 @@ def start_new_game():
     player1.weapon = game_options.p1_weapon
     player2.weapon = game_options.p2_weapon
     
-    # Reset game object
-    game = Game()
+    # New match on the selected map
+    arena_widths = [game_map.arena_width for game_map in MAPS]
+    if net_link:
+        # Each side brings its own weapon, player 1 picks the map
+        print("Waiting for the other player... (Escape gives up)")
+        local_player = (player1, player2)[NET_PLAYER - 1]
+        seed = SEED if SEED is not None else int.from_bytes(os.urandom(4), "little")
+        try:
+            session = netplay.start_match(net_link, net_round % 256, NET_PLAYER, local_player.weapon,
+                                          MAPS.index(game_options.current_map), TICK_RATE, seed, arena_widths,
+                                          (player1, player2), wait_for_peer)
+        except (OSError, struct.error) as error:
+            print(f"Netplay: {error}")
+            return
+        net_round += 1
+        game = session.match
+        game_options.current_map = MAPS[game.map_index]
+    else:
+        game = simulation.Match(player1, player2, arena_widths, MAPS.index(game_options.current_map), TICK_RATE, SEED)
+    pressed_buttons[:] = [0, 0]
+    camera.follow(game_options.current_map.arena_width, player1, player2)
+    
+    # Render the weapon sprites before the first frame needs them
+    warm_weapon_sprites([player1.weapon, player2.weapon])
     
     # Change state to playing
     game_state = PLAYING
 
-# Particle systems for different effects
-class SandParticle:
-    def __init__(self):
-        self.x = random.randint(0, WINDOW_WIDTH)
-        self.y = random.randint(0, WINDOW_HEIGHT)
-        self.speed_x = random.uniform(4, 8)
-        self.speed_y = random.uniform(-1, 1)
-        self.size = random.randint(1, 3)
-        self.color = (255, 218, 170)  # Sandy color
-        self.alpha = random.randint(100, 200)
-
-    def move(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        if self.x > WINDOW_WIDTH:
-            self.x = 0
-            self.y = random.randint(0, WINDOW_HEIGHT)
-        self.alpha = max(0, self.alpha - 1)
+# Particle effects, kept in NumPy arrays and updated all at once
+PARTICLE_SQUARE = 0
+PARTICLE_CIRCLE = 1
 
-    def draw(self, window):
-        s = pygame.Surface((self.size, self.size))
-        s.set_alpha(self.alpha)
-        s.fill(self.color)
-        window.blit(s, (int(self.x), int(self.y)))
+# Particle groups
+SAND = 0
 
-class SmokeParticle:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.speed_x = random.uniform(-0.5, 0.5)
-        self.speed_y = random.uniform(-2, -1)
-        self.size = random.randint(3, 6)
-        self.color = (100, 100, 100)  # Gray smoke
-        self.alpha = random.randint(150, 255)
-
-    def move(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        self.alpha = max(0, self.alpha - 2)
-        self.size += 0.1
+SAND_COLOR = (255, 218, 170)  # Sandy color
+SMOKE_COLOR = (100, 100, 100)  # Gray smoke
 
-    def draw(self, window):
-        if self.alpha > 0:
-            s = pygame.Surface((int(self.size), int(self.size)))
-            s.set_alpha(self.alpha)
-            s.fill(self.color)
-            window.blit(s, (int(self.x), int(self.y)))
+PARTICLE_MAX_SIZE = 63
+PARTICLE_ALPHA_LEVELS = 16  # Sprites are baked for this many alpha steps
+
+class ParticleEngine:
+    FIELDS = {
+        "x": np.float32, "y": np.float32,
+        "vx": np.float32, "vy": np.float32,
+        "size": np.float32, "grow": np.float32,  # Size change per frame
+        "alpha": np.float32, "fade": np.float32,  # Alpha change per frame
+        "life": np.float32,  # Frames left to live
+        "style": np.int32,  # Index into self.styles
+        "group": np.int8,
+        "wrap": np.bool_,  # Wrap back to the left edge instead of leaving the screen
+    }
+
+    def __init__(self, width, height, capacity=1024):
+        self.width = width
+        self.height = height
+        self.count = 0
+        self.sand_count = 0  # Grains wanted while sand is blowing
+        self.updates = 0  # Updates run so far, particles may have moved when this changes
+        self.rng = np.random.default_rng(simulation.stream_seed(SEED, "particles"))
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype))
+        self.styles = []  # (shape, color)
+        self.style_ids = {}
+        self.style_shapes = np.zeros(0, np.int32)
+        self.sprites = np.empty(0, dtype=object)  # Baked sprites indexed by sprite key
+
+    def get_style(self, shape, color):
+        key = (shape, tuple(color))
+        style = self.style_ids.get(key)
+        if style is None:
+            style = len(self.styles)
+            self.styles.append(key)
+            self.style_ids[key] = style
+            self.style_shapes = np.append(self.style_shapes, shape)
+        return style
+
+    def reserve(self, extra):
+        needed = self.count + extra
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def emit(self, count, group, style, x, y, vx=0, vy=0, size=1, alpha=255,
+             grow=0, fade=0, life=np.inf, wrap=False):
+        # Every value can be a scalar or an array with one entry per particle
+        if count <= 0:
+            return
+        self.reserve(count)
+        new = slice(self.count, self.count + count)
+        values = {"x": x, "y": y, "vx": vx, "vy": vy, "size": size, "grow": grow,
+                  "alpha": alpha, "fade": fade, "life": life, "style": style,
+                  "group": group, "wrap": wrap}
+        for name, value in values.items():
+            getattr(self, name)[new] = value
+        self.count += count
+
+    def emit_sand(self, count, alpha=None):
+        rng = self.rng
+        if alpha is None:
+            alpha = rng.integers(100, 201, count)
+        self.emit(count, SAND, self.get_style(PARTICLE_SQUARE, SAND_COLOR),
+                  x=rng.integers(0, self.width + 1, count), y=rng.integers(0, self.height + 1, count),
+                  vx=rng.uniform(4, 8, count), vy=rng.uniform(-1, 1, count),
+                  size=rng.integers(1, 4, count), alpha=alpha,
+                  fade=-1, wrap=True)
+
+    def set_sand(self, count):
+        # Retire sand grains past count, top_up_sand blows in the missing ones
+        self.sand_count = count
+        sand = np.flatnonzero(self.group[:self.count] == SAND)
+        if len(sand) > count:
+            self.alpha[sand[count:]] = 0  # Hidden now, dropped on the next update
+            self.life[sand[count:]] = 0
+
+    def top_up_sand(self):
+        # Blow in grains that faded out, invisible at first so brighten fades them in
+        missing = self.sand_count - np.count_nonzero(self.group[:self.count] == SAND)
+        self.emit_sand(missing, alpha=0)
+
+    def brighten(self, group, amount):
+        n = self.count
+        members = self.group[:n] == group
+        self.alpha[:n][members] = np.minimum(255, self.alpha[:n][members] + amount)
+
+    def update(self):
+        self.updates += 1
+        n = self.count
+        if n == 0:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.size[:n] += self.grow[:n]
+        np.clip(self.alpha[:n] + self.fade[:n], 0, 255, out=self.alpha[:n])
+        self.life[:n] -= 1
+        
+        # Sand blows back in from the left edge
+        wrapped = np.flatnonzero(self.wrap[:n] & (self.x[:n] > self.width))
+        if len(wrapped):
+            self.x[wrapped] = 0
+            self.y[wrapped] = self.rng.integers(0, self.height + 1, len(wrapped))
+        
+        # Drop particles whose time is up or that faded out for good
+        alive = np.flatnonzero((self.life[:n] > 0) & ((self.alpha[:n] > 0) | (self.fade[:n] >= 0)))
+        if len(alive) < n:
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[:len(alive)] = array[alive]
+            self.count = len(alive)
+
+    def sprite_keys(self, size, alpha, style):
+        size = np.clip(size.astype(np.int32), 1, PARTICLE_MAX_SIZE)
+        level = np.minimum(alpha.astype(np.int32) * PARTICLE_ALPHA_LEVELS // 256,
+                           PARTICLE_ALPHA_LEVELS - 1)
+        keys = (style * (PARTICLE_MAX_SIZE + 1) + size) * PARTICLE_ALPHA_LEVELS + level
+        return keys, size
+
+    def bake(self, keys):
+        needed = (len(self.styles) + 1) * (PARTICLE_MAX_SIZE + 1) * PARTICLE_ALPHA_LEVELS
+        if len(self.sprites) < needed:
+            sprites = np.empty(needed, dtype=object)
+            sprites[:len(self.sprites)] = self.sprites
+            self.sprites = sprites
+        for key in keys.tolist():
+            if self.sprites[key] is not None:
+                continue
+            style, rest = divmod(key, (PARTICLE_MAX_SIZE + 1) * PARTICLE_ALPHA_LEVELS)
+            size, level = divmod(rest, PARTICLE_ALPHA_LEVELS)
+            shape, color = self.styles[style]
+            if shape == PARTICLE_CIRCLE:
+                sprite = pygame.Surface((size * 2 + 1, size * 2 + 1))
+                sprite.fill((255, 0, 255))
+                sprite.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+                pygame.draw.circle(sprite, color, (size, size), size)
+            else:
+                sprite = pygame.Surface((size, size))
+                sprite.fill(color)
+            alpha = level * 256 // PARTICLE_ALPHA_LEVELS + 256 // PARTICLE_ALPHA_LEVELS // 2
+            if display.transparent:
+                # Surface alpha would darken the color on a transparent canvas, per pixel alpha keeps it
+                pixels = pygame.Surface(sprite.get_size(), pygame.SRCALPHA)
+                pixels.blit(sprite, (0, 0))
+                pixels.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+                sprite = pixels
+            else:
+                sprite.set_alpha(alpha)
+            self.sprites[key] = sprite
+
+    def screen_x(self, camera_x):
+        # Blowing sand is weather and stays on screen, everything else scrolls with the arena
+        n = self.count
+        return self.x[:n] - np.where(self.wrap[:n], 0, camera_x).astype(np.float32)
+
+    def draw(self, window, camera_x=0):
+        n = self.count
+        x = self.screen_x(camera_x)
+        visible = np.flatnonzero(self.alpha[:n] >= 1)
+        self.draw_sprites(window, x[visible], self.y[visible], self.size[visible],
+                          self.alpha[visible], self.style[visible])
+
+    def draw_sprites(self, window, x, y, size, alpha, style):
+        # Blit one baked sprite per particle, given arrays of particle values in logical screen space
+        x, y, size = to_canvas(x), to_canvas(y), to_canvas(size)
+        width, height = window.get_size()
+        seen = np.flatnonzero((x + size >= 0) & (x - size < width) & (y + size >= 0) & (y - size < height))
+        if len(seen) == 0:
+            return
+        x, y, size, alpha, style = x[seen], y[seen], size[seen], alpha[seen], style[seen]
+        keys, size = self.sprite_keys(size, alpha, style)
+        self.bake(np.unique(keys))
+        
+        # Circles are positioned by their center, squares by their corner
+        centered = self.style_shapes[style] == PARTICLE_CIRCLE
+        xs = x.astype(np.int32) - np.where(centered, size, 0)
+        ys = y.astype(np.int32) - np.where(centered, size, 0)
+        window.blits(zip(self.sprites[keys].tolist(), zip(xs.tolist(), ys.tolist())), False)
+
+    def bounds(self, camera_x=0):
+        # Screen area covered by the particles draw() puts on screen
+        n = self.count
+        x = self.screen_x(camera_x)
+        y, size = self.y[:n], self.size[:n]
+        seen = np.flatnonzero((self.alpha[:n] >= 1) & (x + size >= 0) & (x - size < self.width) &
+                              (y + size >= 0) & (y - size < self.height))
+        if len(seen) == 0:
+            return pygame.Rect(0, 0, 0, 0)
+        x, y = x[seen], y[seen]
+        reach = int(size[seen].max()) + 1
+        left = int(x.min()) - reach
+        top = int(y.min()) - reach
+        return pygame.Rect(left, top, int(x.max()) + reach - left, int(y.max()) + reach - top)
+
+# Volcano smoke, kept in a fixed number of slots that are reused once a puff is gone
+SMOKE_CAPACITY = 512
+
+class SmokeEmitter:
+    def __init__(self, engine, capacity=SMOKE_CAPACITY):
+        self.engine = engine
+        self.capacity = capacity
+        self.style = engine.get_style(PARTICLE_SQUARE, SMOKE_COLOR)
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.size = np.zeros(capacity, np.float32)
+        self.alpha = np.zeros(capacity, np.float32)
+        self.alive = np.zeros(capacity, np.bool_)
+        # Free slots, used as a stack; the first free_count entries are free
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self.free_count = capacity
+        self.recycled = 0  # Puffs whose slot went back to the free list
+        self.dropped = 0  # Puffs not emitted because every slot was in use
+
+    @property
+    def live(self):
+        return self.capacity - self.free_count
+
+    def emit(self, x, y, count=1):
+        emitted = min(count, self.free_count)
+        self.dropped += count - emitted
+        if emitted == 0:
+            return
+        count = emitted
+        slots = self.free[self.free_count - count:self.free_count]
+        self.free_count -= count
+        rng = self.engine.rng
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = rng.uniform(-0.5, 0.5, count)
+        self.vy[slots] = rng.uniform(-2, -1, count)
+        self.size[slots] = rng.integers(3, 7, count)
+        self.alpha[slots] = rng.integers(150, 256, count)
+        self.alive[slots] = True
+
+    def update(self):
+        if self.live == 0:
+            return
+        alive = self.alive
+        self.x[alive] += self.vx[alive]
+        self.y[alive] += self.vy[alive]
+        self.alpha[alive] -= 2
+        self.size[alive] += 0.1
+        
+        # Recycle puffs that faded out or drifted off the screen
+        gone = alive & ((self.alpha <= 0) | (self.y + self.size < 0) |
+                        (self.x + self.size < 0) | (self.x > self.engine.width))
+        slots = np.flatnonzero(gone)
+        if len(slots):
+            self.alive[slots] = False
+            self.free[self.free_count:self.free_count + len(slots)] = slots
+            self.free_count += len(slots)
+            self.recycled += len(slots)
+
+    def draw(self, window, camera_x=0):
+        slots = np.flatnonzero(self.alive)
+        self.engine.draw_sprites(window, self.x[slots] - camera_x, self.y[slots], self.size[slots],
+                                 self.alpha[slots], np.full(len(slots), self.style, np.int32))
+
+    def bounds(self, camera_x=0):
+        # Screen area covered by the live puffs
+        slots = np.flatnonzero(self.alive)
+        if len(slots) == 0:
+            return pygame.Rect(0, 0, 0, 0)
+        reach = int(self.size[slots].max()) + 1
+        left = int(self.x[slots].min() - camera_x)
+        top = int(self.y[slots].min())
+        return pygame.Rect(left, top, int(self.x[slots].max() - camera_x) + reach - left, int(self.y[slots].max()) + reach - top)
+
+    def report(self):
+        # Dropped puffs mean the slots ran out, SMOKE_CAPACITY is too small for the smoke being made
+        return (f"Smoke: {self.live} of {self.capacity} slots live, {self.recycled} puffs recycled, "
+                f"{self.dropped} dropped")
 
 # Initialize particles
-sand_particles = [SandParticle() for _ in range(100)]
-smoke_particles = []
-current_map_index = 0
-map_change_timer = 0
+particle_engine = ParticleEngine(WINDOW_WIDTH, WINDOW_HEIGHT)
+particle_engine.emit_sand(100)
+smoke = SmokeEmitter(particle_engine)
+
+# Dirty rectangle rendering (opt-in with --dirty-rects)
+NAME_INPUT_AREA = pygame.Rect(WINDOW_WIDTH//4 - 100, 125, 2*WINDOW_WIDTH//3 - WINDOW_WIDTH//4 + 200, 60)
+MAX_DIRTY_RECTS = 100  # Past this many separate rects one full update is cheaper
+
+class DirtyRectRenderer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.previous = {}  # drawable -> (rect in canvas pixels, state) from the last frame
+        self.current = {}
+        self.extra = []  # Areas that change every frame without a drawable to track
+        self.scene_key = None
+        self.full_redraw = True
+        self.rects = []
+        self.pixels_pushed = 0  # Pixels sent to the display in the last frame
+        self.total_pixels = 0
+        self.frames = 0
+
+    def begin_frame(self, window, scene_key):
+        self.current = {}
+        self.extra = []
+        if scene_key != self.scene_key:
+            self.scene_key = scene_key
+            self.full_redraw = True
+
+    def track(self, drawable, rect, state=None):
+        # Register where a drawable is drawn this frame and what it looks like
+        self.current[drawable] = (pygame.Rect(rect), state)
+
+    def invalidate(self, rect):
+        self.extra.append(pygame.Rect(rect))
+
+    def damaged_rects(self, window):
+        damage = list(self.extra)
+        for drawable, entry in self.current.items():
+            previous = self.previous.get(drawable)
+            if previous != entry:
+                damage.append(entry[0])
+                if previous is not None:
+                    damage.append(previous[0])
+        for drawable, entry in self.previous.items():
+            if drawable not in self.current:
+                damage.append(entry[0])
+        
+        # Merge overlapping rects so no pixel is pushed twice
+        screen_rect = window.get_rect()
+        merged = []
+        for rect in damage:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def clip(self, window):
+        # Restrict drawing to the damaged area, the background gets restored only there
+        if not self.enabled:
+            return
+        self.rects = [] if self.full_redraw else self.damaged_rects(window)
+        if len(self.rects) > MAX_DIRTY_RECTS:
+            self.full_redraw = True
+        if self.full_redraw:
+            window.set_clip(None)
+        elif self.rects:
+            window.set_clip(self.rects[0].unionall(self.rects[1:]))
+        else:
+            window.set_clip(pygame.Rect(0, 0, 0, 0))
+
+    def reset(self):
+        # Forget what is on screen, the next frame is drawn in full
+        self.previous = {}
+        self.full_redraw = True
+
+    def present(self, window):
+        if self.enabled and not self.full_redraw:
+            display.present(self.rects)
+            self.pixels_pushed = sum(rect.width * rect.height for rect in self.rects)
+        else:
+            display.present()
+            self.pixels_pushed = window.get_width() * window.get_height()
+        if self.enabled:
+            window.set_clip(None)
+            self.previous = self.current
+            self.full_redraw = False
+        self.total_pixels += self.pixels_pushed
+        self.frames += 1
+
+    def report(self):
+        full_frame = display.canvas_size[0] * display.canvas_size[1]
+        average = self.total_pixels // max(1, self.frames)
+        return f"Dirty rects: {average} pixels pushed per frame ({100 * average // full_frame}% of a full frame)"
+
+def track_dirty_rects(renderer):
+    # Register every drawable that can change between frames, logical bounds go through canvas_rect
+    for button in (start_button, quit_button):
+        renderer.track(button, canvas_rect(button.bounds()), button.is_hovered)
+    for button in map_buttons:
+        renderer.track(button, canvas_rect(button.bounds()), (button.is_hovered, button.map == game_options.current_map))
+    if game_state == PLAYING:
+        label, position = quality.label()
+        renderer.track(quality, pygame.Rect(position, label.get_size()), quality.level)
+    
+    if game_state in (MENU, PLAYING):
+        sky_life.track(renderer, compositor.due("sky_life", effect_frames))
+    
+    if game_state == PLAYING:
+        for player in (player1, player2):
+            if player:
+                renderer.track(player, canvas_rect(camera.to_screen(player.bounds())), player.draw_state())
+        for arrow in game.arrows:
+            renderer.track(arrow, canvas_rect(camera.to_screen(arrow_bounds(arrow))))
+        # Particles move on every effect frame, the area they left is damaged too
+        renderer.track(particle_engine, canvas_rect(particle_engine.bounds(camera.x)), particle_engine.updates)
+        renderer.track(smoke, canvas_rect(smoke.bounds(camera.x)), particle_engine.updates)
+        if game_options.current_map == NIGHT_MAP:
+            # Stars twinkle by switching frames
+            renderer.track("stars", canvas_rect((0, 0, WINDOW_WIDTH, WINDOW_HEIGHT // 2 + 2)), atmosphere.star_frame())
+            # Lights move and flicker, everything under them is lit again
+            lights = night_lights.gather(current_time, benches, game.arrows, (player1, player2), camera.x)
+            for i, light in enumerate(lights):
+                renderer.track(("light", i), canvas_rect(night_lights.bounds(light)), light)
+    else:
+        weapon_buttons = menu_weapon_buttons if game_state == MENU else game_over_weapon_buttons
+        for button in weapon_buttons:
+            is_selected = (button.player_num == 1 and button.weapon_type == game_options.p1_weapon) or \
+                         (button.player_num == 2 and button.weapon_type == game_options.p2_weapon)
+            renderer.track(button, canvas_rect(button.bounds()), (button.hover, is_selected))
+        renderer.track("name_inputs", canvas_rect(NAME_INPUT_AREA), (p1_name_input, p2_name_input, active_input))
+
+# Frame compositor: each screen is a stack of named layers drawn back to front
+class Layer:
+    def __init__(self, name, draw, opaque=False, rate=None, plane=0):
+        self.name = name
+        # draw(window, frames) advances the layer by that many 60 Hz frames and draws it.
+        # With frames=0 it must repeat its last drawing, which rate limited layers do between updates.
+        self.draw = draw
+        self.opaque = opaque  # Covers the whole canvas, so the layers below are skipped
+        self.rate = rate  # Updates per second, None to update every frame
+        self.plane = plane  # Display plane it draws on, see TextureDisplay
+        self.frames = 0  # Frames since the layer last updated
+        self.fresh = True  # Update on the next frame no matter the rate
+
+    def due(self, fps, frames=1):
+        # Whether rendering after that many 60 Hz frames updates the layer instead of repeating it
+        return self.fresh or (frames > 0 and (self.rate is None or self.frames + frames >= fps / self.rate))
+
+    def render(self, window, fps, frames=1):
+        if not self.due(fps, frames):
+            self.frames += frames
+            self.draw(window, 0)
+            return
+        frames = 1 if self.fresh else self.frames + frames
+        self.frames = 0
+        self.fresh = False
+        self.draw(window, frames)
+
+class Compositor:
+    def __init__(self, fps=60):
+        self.fps = fps
+        self.layers = {}
+        self.scene = None
+
+    def add(self, layer):
+        self.layers[layer.name] = layer
+        return layer
+
+    def set_scene(self, scene):
+        # Layers start over when the screen changes
+        if scene != self.scene:
+            self.scene = scene
+            for layer in self.layers.values():
+                layer.fresh = True
+
+    def due(self, name, frames=1):
+        return self.layers[name].due(self.fps, frames)
+
+    def draw(self, window, frames=1):
+        # frames: 60 Hz frames since the last draw, 0 when drawing faster than that
+        # Draw the scene's layers back to front, starting at the top opaque one
+        layers = [self.layers[name] for name in self.scene]
+        first = 0
+        for i, layer in enumerate(layers):
+            if layer.opaque:
+                first = i
+        for layer in layers[:first]:
+            layer.fresh = True  # Hidden this frame, so it starts over once it shows again
+        for layer in layers[first:]:
+            layer.render(display.target(window, layer.plane), self.fps, frames)
+
+# Layers used by the compositor
+def draw_arena_layer(window, frames):
+    # Sky and mountains from the cached arena layer, only the part the camera sees
+    game_map = game_options.current_map
+    background, platform_art = arena_layer.get(game_map, mountains, benches, game_map.arena_width, WINDOW_HEIGHT)
+    display.copy(window, background, (0, 0), canvas_rect(camera.view()))
+
+def draw_atmosphere_layer(window, frames):
+    if game_options.current_map == NIGHT_MAP:
+        # Draw stars, moon and the dark overlay from the cached atmosphere
+        atmosphere.draw(window, game_options.current_map)
+    
+    elif game_options.current_map == VOLCANO_MAP:
+        # Add smoke particles at volcano positions, 10% chance each frame at full quality
+        if frames and random.random() < 1 - (1 - quality.tier["smoke_chance"]) ** frames:
+            for mountain in mountains:
+                smoke.emit(mountain.points[1][0], mountain.points[1][1])
+        
+        # Add reddish glow effect
+        atmosphere.draw(window, game_options.current_map)
+
+def draw_sky_life_layer(window, frames):
+    # On the menu parked airplanes come back often, in game the game loop sends them in
+    sky_life.draw(window, 0.15 if game_state == MENU else 0, frames)
+
+def draw_platform_layer(window, frames):
+    # Benches and platforms from the cached arena layer, only the part the camera sees
+    game_map = game_options.current_map
+    background, platform_art = arena_layer.get(game_map, mountains, benches, game_map.arena_width, WINDOW_HEIGHT)
+    display.copy(window, platform_art, (0, 0), canvas_rect(camera.view()))
+    if game_map == NIGHT_MAP:
+        night_lights.draw_torches(window, benches, camera.x)
+
+def draw_fighter_layer(window, frames):
+    for player in (player1, player2):
+        if player and camera.sees(player.bounds()):
+            player.draw(window, camera.x)
+
+def draw_effect_layer(window, frames):
+    # Arrows, then sand and smoke particles (each skips what is off screen)
+    draw_arrows(window, camera)
+    particle_engine.draw(window, camera.x)
+    smoke.draw(window, camera.x)
+
+def draw_lighting_layer(window, frames):
+    # Torches, glowing arrows and fighter halos on the Night map
+    if game_options.current_map == NIGHT_MAP:
+        night_lights.draw(window, night_lights.gather(current_time, benches, game.arrows, (player1, player2), camera.x))
+
+def draw_hud_layer(window, frames):
+    # Map buttons along the top of the screen
+    map_spacing = 120  # Space between map buttons
+    total_width = len(MAPS) * map_spacing
+    start_x = (WINDOW_WIDTH - total_width) // 2
+    
+    for i, button in enumerate(map_buttons):
+        button.rect.x = start_x + i * map_spacing
+        button.rect.y = 10  # Position at top of screen
+        is_selected = button.map == game_options.current_map
+        # Update hover state
+        mouse_pos = display.mouse_pos()
+        button.is_hovered = button.rect.collidepoint(mouse_pos)
+        button.draw(window, get_font(24), is_selected)
+    
+    # Current effect quality tier
+    label, position = quality.label()
+    window.blit(label, position)
+
+def draw_menu_sky_layer(window, frames):
+    draw_sky(window)
+
+def draw_menu_layer(window, frames):
+    draw_menu(window)
+
+def draw_game_over_layer(window, frames):
+    draw_game_over(window, font, player1, player2)
+
+compositor = Compositor(60)
+compositor.add(Layer("menu_sky", draw_menu_sky_layer, opaque=True))
+compositor.add(Layer("arena", draw_arena_layer, opaque=True))
+compositor.add(Layer("atmosphere", draw_atmosphere_layer))
+compositor.add(Layer("sky_life", draw_sky_life_layer, rate=30))
+compositor.add(Layer("platforms", draw_platform_layer, plane=1))
+compositor.add(Layer("fighters", draw_fighter_layer, plane=1))
+compositor.add(Layer("effects", draw_effect_layer, plane=1))
+compositor.add(Layer("lighting", draw_lighting_layer, plane=2))
+compositor.add(Layer("hud", draw_hud_layer, plane=2))
+compositor.add(Layer("menu", draw_menu_layer, plane=2))
+compositor.add(Layer("game_over", draw_game_over_layer, opaque=True, plane=2))  # Paints its own background
+
+# Layers of each screen, back to front
+SCENE_LAYERS = {
+    MENU: ("menu_sky", "sky_life", "menu"),
+    PLAYING: ("arena", "atmosphere", "sky_life", "platforms", "fighters", "effects", "lighting", "hud"),
+    GAME_OVER: ("arena", "atmosphere", "sky_life", "platforms", "fighters", "lighting", "game_over"),
+}
+
+renderer = DirtyRectRenderer(enabled="--dirty-rects" in sys.argv)
+
+# --benchmark N: start a match right away and time N frames without the frame limit
+BENCHMARK_FRAMES = int(get_option("--benchmark", 0))
+benchmark_frames = 0
+if BENCHMARK_FRAMES:
+    start_new_game()
+
+# Effect quality tiers, best first; the governor steps down one tier at a time when frames run long
+QUALITY_TIERS = [
+    {"name": "high", "sand": 100, "smoke_chance": 0.1, "birds": BIRD_COUNT, "airplanes": AIRPLANE_COUNT,
+     "sword_trail": True, "shield_gradient": True, "antialias": True},
+    {"name": "medium", "sand": 60, "smoke_chance": 0.06, "birds": BIRD_COUNT, "airplanes": 4,
+     "sword_trail": True, "shield_gradient": True, "antialias": True},
+    {"name": "low", "sand": 30, "smoke_chance": 0.03, "birds": 3, "airplanes": 2,
+     "sword_trail": False, "shield_gradient": False, "antialias": True},
+    {"name": "minimal", "sand": 10, "smoke_chance": 0.01, "birds": 1, "airplanes": 1,
+     "sword_trail": False, "shield_gradient": False, "antialias": False},
+]
+QUALITY_WINDOW = 120  # Frame times kept for the percentiles (2 seconds at 60 FPS)
+QUALITY_PERCENTILE = 95  # Judge by the slow frames, not the average ones
+QUALITY_HEADROOM = 0.5  # Step back up once slow frames take less than this share of the budget
+
+class QualityGovernor:
+    def __init__(self, fps=60, tier=None):
+        self.budget_ms = 1000 / fps
+        self.samples = deque(maxlen=QUALITY_WINDOW)  # Milliseconds of work per frame
+        self.pinned = tier is not None  # --quality turns the governor off
+        names = [t["name"] for t in QUALITY_TIERS]
+        self.level = names.index(tier) if tier in names else 0
+        self.tier = QUALITY_TIERS[self.level]
+        self.changes = 0
+        self.apply()
+
+    def record(self, frame_ms):
+        if self.pinned:
+            return
+        self.samples.append(frame_ms)
+        if len(self.samples) < QUALITY_WINDOW:
+            return  # Wait for a full window after every change
+        slow = float(np.percentile(self.samples, QUALITY_PERCENTILE))
+        if slow > self.budget_ms and self.level < len(QUALITY_TIERS) - 1:
+            self.set_level(self.level + 1, slow)
+        elif slow < self.budget_ms * QUALITY_HEADROOM and self.level > 0:
+            self.set_level(self.level - 1, slow)
+
+    def set_level(self, level, slow):
+        self.level = level
+        self.tier = QUALITY_TIERS[level]
+        self.samples.clear()
+        self.changes += 1
+        self.apply()
+        renderer.reset()  # Text, shields and weapons may look different now
+        print(f"Quality: {self.tier['name']} (p{QUALITY_PERCENTILE} frame time {slow:.1f} ms, "
+              f"budget {self.budget_ms:.1f} ms)")
+
+    def apply(self):
+        tier = self.tier
+        particle_engine.set_sand(tier["sand"])
+        sky_life.bird_limit = tier["birds"]
+        sky_life.plane_limit = tier["airplanes"]
+        weapon_sprites.trail = tier["sword_trail"]
+        fighter_poses.shield_gradient = tier["shield_gradient"]
+        text_cache.antialias = tier["antialias"]
+
+    def label(self):
+        # HUD text and where it goes, bottom right above the ground
+        text = render_text(get_font(20), f"Quality: {self.tier['name']}", (255, 255, 255))
+        right, top = canvas_pos((WINDOW_WIDTH - 8, WINDOW_HEIGHT - 40))
+        return text, (right - text.get_width(), top)  # In canvas pixels, like the text
+
+# --quality TIER pins a tier; by default the governor picks one from the measured frame times
+# Benchmarks always run at one tier so their numbers can be compared
+quality = QualityGovernor(RENDER_FPS or 60, get_option("--quality", "high" if BENCHMARK_FRAMES else None))
+
+# Body positions before the last tick, drawing happens between the last two ticks
+class TickInterpolator:
+    def __init__(self):
+        self.previous = {}  # body -> (x, y) before the last tick
+        self.saved = []  # (body, x, y) while interpolated positions are drawn
+
+    def remember(self, bodies):
+        self.previous = {body: (body.x, body.y) for body in bodies}
+
+    def begin(self, bodies, alpha):
+        # Move the bodies alpha of the way from their previous to their current position
+        for body in bodies:
+            x, y = self.previous.get(body, (body.x, body.y))  # New arrows have no previous position
+            self.saved.append((body, body.x, body.y))
+            body.x = x + (body.x - x) * alpha
+            body.y = y + (body.y - y) * alpha
+
+    def end(self):
+        for body, x, y in self.saved:
+            body.x = x
+            body.y = y
+        self.saved.clear()
+
+interpolator = TickInterpolator()
+
+def moving_bodies():
+    return [player for player in (player1, player2) if player] + game.arrows
+
+def read_inputs():
+    # One input frame per player for the next tick, with the keys pressed since the last tick
+    keys = pygame.key.get_pressed()
+    inputs = tuple(player.buttons(keys) | pressed for player, pressed in zip((player1, player2), pressed_buttons))
+    pressed_buttons[:] = [0, 0]
+    return inputs
+
+def simulate_tick():
+    # Advance the match by one fixed tick
+    global game_state
+    if session and session.lost():
+        end_network_match("the other player stopped answering, back to the menu")
+        return
+    if session and not session.ready():
+        return  # Waiting for the other player's inputs, keys pressed meanwhile count for the next tick
+    interpolator.remember(moving_bodies())
+    if session:
+        session.advance(read_inputs()[session.local])  # Replays earlier ticks first if a guess was wrong
+    else:
+        game.step(read_inputs())
+    for event in game.events:
+        GAME_SOUNDS[event].play()
+    game_options.current_map = MAPS[game.map_index]  # The map changes every few seconds
+    
+    # Check for game over, over the network only once the other player's inputs can't change it
+    if session.winner() if session else game.winner():
+        game_state = GAME_OVER
+
+def update_effects():
+    # Cosmetic effects still step once per 60 Hz frame
+    # Add new airplanes periodically
+    if random.random() < 0.05:
+        sky_life.add_airplane()
+    
+    if game_options.current_map == DESERT_MAP:
+        # Only update birds and airplanes in desert
+        sky_life.clear_clouds()  # Remove clouds in desert
+        
+        # Make sand particles more visible, blowing in new grains for the ones that faded elsewhere
+        particle_engine.top_up_sand()
+        particle_engine.brighten(SAND, 2)
+    
+    # Update sand and smoke particles
+    particle_engine.update()
+    smoke.update()
 
 # Game loop
 running = True
 start_time = pygame.time.get_ticks()
+last_time = time.perf_counter()
+tick_time_left = 0  # Time not yet simulated
+effect_time_left = 0  # 60 Hz effect frames not yet run, as a fraction
+effect_frames = 0  # Effect frames run since the last drawn frame
+ticks = 0
+skipped_frames = 0
+skipped_in_a_row = 0
 while running:
     current_time = pygame.time.get_ticks()
+    now = time.perf_counter()
+    elapsed = min(now - last_time, MAX_FRAME_TIME)
+    last_time = now
+    if BENCHMARK_FRAMES:
+        elapsed = 1 / 60  # The same game time every frame, however fast it runs
     
     # Event handling
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.VIDEORESIZE:
+            display.resize()
+            renderer.reset()
+        display.map_event(event)
         
         if game_state == MENU:
             handle_menu_events(event)
@@ -2441,9 +3748,10 @@ while running:
             handle_game_over_events(event)
         
     # Update game state
+    arena_layout.fit(game_options.current_map)
     if game_state == MENU:
         # Update button hover states
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         start_button.is_hovered = start_button.rect.collidepoint(mouse_pos)
         quit_button.is_hovered = quit_button.rect.collidepoint(mouse_pos)
         
@@ -2455,120 +3763,74 @@ while running:
         for button in menu_weapon_buttons:
             button.hover = button.rect.collidepoint(mouse_pos)
     
-    if game_state == PLAYING:
-        # Reset platform status at start of frame
-        if player1:
-            player1.on_platform = False
-        if player2:
-            player2.on_platform = False
-        
-        # Move players
-        if player1:
-            player1.move()
-            player1.update()
-        if player2:
-            player2.move()
-            player2.update()
-        
-        # Check bench collisions for both players
-        for bench in benches:
-            if player1:
-                bench.check_collision(player1)
-            if player2:
-                bench.check_collision(player2)
-        
-        # Update attacks
-        if player1 and player2:
-            player1.update_attack(player2)
-            player2.update_attack(player1)
-        
-        # Update game particles and check arrow collisions
-        game.update()
-        for arrow in game.arrows:
-            if player1 and arrow.shooter != player1:
-                arrow.check_collision(player1)
-            if player2 and arrow.shooter != player2:
-                arrow.check_collision(player2)
-        
-        # Check for game over
-        if player1.health <= 0 or player2.health <= 0:
-            game_state = GAME_OVER
-        
-        # Add new airplanes periodically
-        if random.random() < 0.05:
-            add_new_airplane()
-        
-        # Update sand particles
-        for particle in sand_particles:
-            particle.move()
-        
-        # Update smoke particles
-        for particle in smoke_particles:
-            particle.move()
-        
-        # Change map periodically
-        map_change_timer += 1
-        if map_change_timer >= 300:  # 5 seconds
-            current_map_index = (current_map_index + 1) % len(MAPS)
-            game_options.current_map = MAPS[current_map_index]
-            map_change_timer = 0
-    
-    # Draw everything
-    screen.fill((135, 206, 235))  # Sky blue background
-    
-    if game_state == MENU:
-        draw_menu(screen)
-    elif game_state == PLAYING:
-        draw_window(screen, player1, player2, mountains, benches, game_options)
-        if player1:
-            player1.draw(screen)
-        if player2:
-            player2.draw(screen)
-        
-        # Draw platforms (benches)
-        for platform in platforms:
-            pygame.draw.rect(screen, bench_color, platform)
-            pygame.draw.rect(screen, bench_border, platform, 2)  # Add border
-            
-            # Draw bench legs
-            leg_width = 10
-            pygame.draw.rect(screen, bench_color, (platform.left + 20, platform.bottom, leg_width, 30))
-            pygame.draw.rect(screen, bench_color, (platform.right - 30, platform.bottom, leg_width, 30))
-        
-        # Draw map buttons
-        map_spacing = 120  # Space between map buttons
-        total_width = len(MAPS) * map_spacing
-        start_x = (WINDOW_WIDTH - total_width) // 2
-        
-        for i, button in enumerate(map_buttons):
-            button.rect.x = start_x + i * map_spacing
-            button.rect.y = 10  # Position at top of screen
-            is_selected = button.map == game_options.current_map
-            # Update hover state
-            mouse_pos = pygame.mouse.get_pos()
-            button.is_hovered = button.rect.collidepoint(mouse_pos)
-            button.draw(screen, pygame.font.Font(None, 24), is_selected)
-        
-        # Draw game particles
-        game.draw(screen)
-        
-        # Draw sand particles
-        for particle in sand_particles:
-            particle.draw(screen)
-        
-        # Draw smoke particles
-        for particle in smoke_particles:
-            particle.draw(screen)
-    elif game_state == GAME_OVER:
-        draw_window(screen, player1, player2, mountains, benches, game_options)
-        if player1:
-            player1.draw(screen)
-        if player2:
-            player2.draw(screen)
-        draw_game_over(screen, font, player1, player2)
-    
-    pygame.display.flip()
-    clock.tick(60)  # Limit to 60 FPS
-
+    # Run the ticks that are due, at most MAX_SUBSTEPS of them per drawn frame
+    tick_time_left += elapsed
+    steps = 0
+    while tick_time_left >= TICK_TIME and steps < MAX_SUBSTEPS:
+        if game_state == PLAYING:
+            simulate_tick()
+            ticks += 1
+        elif session:
+            session.idle()  # The other peer may still need our last inputs to see the end
+            if session.lost():
+                end_network_match("the other player left")
+        tick_time_left -= TICK_TIME
+        steps += 1
+    
+    effect_time_left += elapsed * 60
+    while effect_time_left >= 1:
+        if game_state == PLAYING:
+            update_effects()
+        effect_time_left -= 1
+        effect_frames += 1
+    
+    if tick_time_left >= TICK_TIME:
+        if skipped_in_a_row < MAX_SKIPPED_FRAMES:
+            # Drawing can't keep up, skip this frame so the match doesn't slow down
+            skipped_frames += 1
+            skipped_in_a_row += 1
+            continue
+        # Even the ticks alone can't keep up, let the match slow down rather than stop drawing
+        tick_time_left %= TICK_TIME
+    skipped_in_a_row = 0
+    
+    # Draw everything between the last two ticks (layers hidden under an opaque layer are skipped)
+    compositor.set_scene(SCENE_LAYERS[game_state])
+    interpolator.begin(moving_bodies() if player1 else [], min(1, tick_time_left / TICK_TIME))
+    camera.follow(game_options.current_map.arena_width, player1, player2)
+    if renderer.enabled:
+        renderer.begin_frame(screen, (game_state, game_options.current_map.name, screen.get_size(), camera.x))
+        track_dirty_rects(renderer)
+        renderer.clip(screen)
+    
+    compositor.draw(screen, effect_frames)
+    text_cache.end_frame()
+    interpolator.end()
+    effect_frames = 0
+    
+    renderer.present(screen)
+    if BENCHMARK_FRAMES:
+        benchmark_frames += 1
+        running = running and benchmark_frames < BENCHMARK_FRAMES
+        clock.tick()
+    else:
+        clock.tick(RENDER_FPS)  # Limit the frame rate (60 FPS by default)
+    quality.record(clock.get_rawtime())  # Time spent on the frame, not waiting for the next one
+
+if renderer.enabled:
+    print(renderer.report())
+if skipped_frames:
+    print(f"Skipped {skipped_frames} frames to keep the {TICK_RATE} Hz simulation on time ({ticks} ticks)")
+print(f"Quality: {quality.tier['name']} at exit, {quality.changes} tier changes")
+print(weapon_sprites.report())
+print(text_cache.report())
+print(smoke.report())
+print(disk_cache.report())
+if session:
+    print(session.report())
+if BENCHMARK_FRAMES:
+    seconds = (pygame.time.get_ticks() - start_time) / 1000
+    print(f"Benchmark ({display.name} backend): {benchmark_frames} frames in {seconds:.2f} s, "
+          f"{1000 * seconds / max(1, benchmark_frames):.2f} ms per frame")
 pygame.quit()
 sys.exit()
\ No newline at end of file
@@ -0,0 +1,347 @@
+import heapq
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import simulation
+from simulation import get_option
+
+# Rollback netplay for two peers over UDP.
+# Each peer runs the whole match itself. It sends its own input frames to the other peer and guesses the
+# other player's input until it arrives. When a guess turns out wrong, the match goes back to the snapshot
+# before that tick and plays the ticks since then again with the real input, all before the next frame is drawn.
+#
+# Two headless peers on this machine, with a bad network:
+#   python netplay.py --latency 80 --jitter 30 --loss 0.1
+# One peer of a windowed game (start the other one with --net-player 2):
+#   python main.py --net-player 1 [--net-port 7001] [--net-peer 127.0.0.1:7002]
+
+MAGIC = b"TPFN"
+HELLO = 1
+INPUTS = 2
+HELLO_PACKET = struct.Struct("<4sBBBBBHQ")  # magic, kind, round, player, weapon, map, tick rate, seed
+INPUT_HEADER = struct.Struct("<4sBBIIB")  # magic, kind, round, first frame, frames wanted from the peer, count
+MAX_INPUTS_PER_PACKET = 64  # One byte per input frame follows the header
+HELD_BUTTONS = simulation.LEFT | simulation.RIGHT | simulation.UP | simulation.DEFEND  # Presses are never guessed
+
+SEED_MASK = (1 << 64) - 1  # The seed travels in a 64-bit field
+DEFAULT_PORT = 7000  # Player N listens on DEFAULT_PORT + N
+CONNECT_TIMEOUT = 10
+FINISH_TIMEOUT = 5
+PEER_TIMEOUT = 5  # Seconds without a packet before the other peer counts as gone
+INPUT_DELAY = int(get_option("--input-delay", 2))  # Ticks before a local input counts, fewer guesses go wrong
+MAX_ROLLBACK = int(get_option("--max-rollback", 8))  # Most ticks guessed ahead before waiting for the peer
+
+class LossyLink:
+    # UDP socket to the other peer, with artificial latency, jitter and packet loss on the way out
+    def __init__(self, port, peer, latency=0, jitter=0, loss=0, seed=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("", port))
+        self.socket.setblocking(False)
+        self.peer = peer
+        self.latency = latency / 1000  # Milliseconds
+        self.jitter = jitter / 1000
+        self.loss = loss  # Fraction of packets dropped
+        self.rng = random.Random(seed)
+        self.queue = []  # (send time, order, packet), jitter can reorder packets like a real network
+        self.order = 0
+        self.sent = 0
+        self.dropped = 0
+        self.received = 0
+
+    def send(self, packet):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = max(0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.order, packet))
+        self.order += 1
+        self.flush()
+
+    def flush(self):
+        # Put the packets whose delay is over on the wire
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            packet = heapq.heappop(self.queue)[2]
+            try:
+                self.socket.sendto(packet, self.peer)
+            except OSError:
+                pass  # Nobody listening yet, the inputs are sent again with the next packet
+
+    def receive(self):
+        self.flush()
+        packets = []
+        while True:
+            try:
+                packet, address = self.socket.recvfrom(2048)
+            except OSError:
+                break
+            packets.append(packet)
+        self.received += len(packets)
+        return packets
+
+    def close(self):
+        self.socket.close()
+
+def open_link(player):
+    # Link for one peer from the command line: --net-port, --net-peer, --latency, --jitter and --loss
+    port = int(get_option("--net-port", DEFAULT_PORT + player))
+    host, peer_port = get_option("--net-peer", f"127.0.0.1:{DEFAULT_PORT + 3 - player}").rsplit(":", 1)
+    return LossyLink(port, (host, int(peer_port)), float(get_option("--latency", 0)),
+                     float(get_option("--jitter", 0)), float(get_option("--loss", 0)))
+
+def connect(link, hello, timeout=CONNECT_TIMEOUT, waiting=None):
+    # Send our hello until the other peer's hello of the same round arrives, and return that one.
+    # waiting() is called while nothing has arrived, e.g. to keep a window responsive; False gives up.
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if waiting and not waiting():
+            raise ConnectionError("gave up waiting for the other peer")
+        link.send(hello)
+        for packet in link.receive():
+            if len(packet) == HELLO_PACKET.size and packet[:6] == hello[:6]:
+                link.send(hello)  # In case ours got lost, the peer's session answers the rest
+                return packet
+        time.sleep(0.02)
+    raise TimeoutError(f"no answer from {link.peer[0]}:{link.peer[1]}")
+
+def start_match(link, round_number, player, weapon, map_index, tick_rate, seed,
+                arena_widths=simulation.HEADLESS_ARENAS, players=(None, None), waiting=None):
+    # Agree on a match with the other peer and start a rollback session for it.
+    # Each peer brings its own weapon, player 1 picks the map and the seed.
+    seed &= SEED_MASK
+    hello = HELLO_PACKET.pack(MAGIC, HELLO, round_number, player, simulation.WEAPONS.index(weapon), map_index,
+                              tick_rate, seed)
+    magic, kind, round_number, peer_player, peer_weapon, peer_map, peer_tick_rate, peer_seed = \
+        HELLO_PACKET.unpack(connect(link, hello, waiting=waiting))
+    if peer_player == player:
+        raise ConnectionError(f"the other peer is player {player} too")
+    if peer_tick_rate != tick_rate:
+        raise ConnectionError(f"the other peer runs at {peer_tick_rate} Hz, not {tick_rate} Hz")
+    if player == 2:
+        map_index, seed = peer_map, peer_seed
+
+    match = simulation.Match(players[0], players[1], arena_widths, map_index, tick_rate, seed)
+    local = player - 1
+    match.players[local].weapon = weapon
+    match.players[1 - local].weapon = simulation.WEAPONS[peer_weapon]
+    return RollbackSession(match, local, link, round_number, INPUT_DELAY, MAX_ROLLBACK, hello)
+
+class RollbackSession:
+    def __init__(self, match, local, link, round_number=0, input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK,
+                 hello=b""):
+        self.match = match
+        self.local = local  # Index of this peer's player in match.players
+        self.link = link
+        self.round = round_number  # Packets of earlier matches are ignored
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.hello = hello  # Answer to hellos the peer sends until it has seen ours
+        self.frame = 0  # Next tick to simulate
+        self.local_inputs = [0] * input_delay  # Input frame of the local player for every tick
+        self.remote_inputs = []  # Input frames received from the peer, every tick up to the first one missing
+        self.guesses = {}  # tick -> remote input frame the simulation guessed for it
+        self.snapshots = {}  # tick -> match snapshot from before the tick
+        self.peer_needs = 0  # First local input frame the peer hasn't confirmed
+        self.peer_started = False  # Set by the first input packet, the peer needs no more hellos after it
+        self.rollback_to = None  # Earliest tick that was simulated with a wrong guess
+        self.last_heard = time.perf_counter()  # When the last packet of the peer arrived
+
+        self.rollbacks = 0
+        self.rollback_depths = []
+        self.resim_ticks = 0
+        self.resim_time = 0
+        self.max_resim_time = 0
+        self.stalls = 0
+
+    def guess(self):
+        # The peer keeps holding what it held last
+        return self.remote_inputs[-1] & HELD_BUTTONS if self.remote_inputs else 0
+
+    def simulate(self, frame):
+        if frame < len(self.remote_inputs):
+            remote = self.remote_inputs[frame]
+        else:
+            remote = self.guesses[frame] = self.guess()
+        local = self.local_inputs[frame]
+        self.snapshots[frame] = self.match.snapshot()
+        self.snapshots.pop(frame - self.max_rollback - 1, None)
+        self.match.step((local, remote) if self.local == 0 else (remote, local))
+
+    def poll(self):
+        # Take in the peer's input frames and note the earliest wrong guess
+        for packet in self.link.receive():
+            if packet[:4] != MAGIC or len(packet) < 6 or packet[5] != self.round:
+                continue
+            if packet[4] == HELLO:
+                if len(packet) == HELLO_PACKET.size and not self.peer_started:
+                    self.link.send(self.hello)
+                continue
+            if packet[4] != INPUTS or len(packet) < INPUT_HEADER.size:
+                continue
+            magic, kind, round_number, first, needs, count = INPUT_HEADER.unpack_from(packet)
+            if len(packet) < INPUT_HEADER.size + count:
+                continue  # Cut short on the way, or not from the peer
+            self.last_heard = time.perf_counter()
+            self.peer_started = True
+            self.peer_needs = max(self.peer_needs, needs)
+            if first > len(self.remote_inputs):
+                continue  # An earlier packet went missing, the peer sends these again from where we are
+            inputs = packet[INPUT_HEADER.size:INPUT_HEADER.size + count]
+            for frame in range(len(self.remote_inputs), first + count):
+                buttons = inputs[frame - first]
+                self.remote_inputs.append(buttons)
+                guess = self.guesses.pop(frame, None)
+                if guess is not None and guess != buttons and self.rollback_to is None:
+                    self.rollback_to = frame
+
+    def rollback(self):
+        # Go back to the first wrong guess and play the ticks since then again
+        if self.rollback_to is None:
+            return
+        start = time.perf_counter()
+        first = self.rollback_to
+        self.rollback_to = None
+        self.match.restore(self.snapshots[first])
+        for frame in range(first, self.frame):
+            self.simulate(frame)
+        seconds = time.perf_counter() - start
+        self.rollbacks += 1
+        self.rollback_depths.append(self.frame - first)
+        self.resim_ticks += self.frame - first
+        self.resim_time += seconds
+        self.max_resim_time = max(self.max_resim_time, seconds)
+
+    def send(self):
+        # Every local input frame the peer hasn't confirmed, so a lost packet costs nothing but a little latency
+        first = self.peer_needs
+        inputs = bytes(self.local_inputs[first:first + MAX_INPUTS_PER_PACKET])
+        self.link.send(INPUT_HEADER.pack(MAGIC, INPUTS, self.round, first, len(self.remote_inputs), len(inputs))
+                       + inputs)
+
+    def ready(self):
+        # Catch up with the peer's inputs. False when the peer is too far behind to guess any further,
+        # then the next tick has to wait.
+        self.poll()
+        self.rollback()
+        if self.frame - len(self.remote_inputs) >= self.max_rollback:
+            self.stalls += 1
+            self.send()
+            return False
+        return True
+
+    def advance(self, buttons):
+        # Run the next tick with the local player's input frame, False when it has to wait (see ready)
+        if not self.ready():
+            return False
+        self.local_inputs.append(buttons)
+        self.simulate(self.frame)
+        self.frame += 1
+        self.send()
+        return True
+
+    def idle(self):
+        # Keep answering the peer while no ticks run, e.g. on the game over screen
+        self.poll()
+        self.rollback()
+        self.send()
+
+    def lost(self):
+        # True when the peer has been silent too long, it quit or the network is gone
+        return time.perf_counter() - self.last_heard > PEER_TIMEOUT
+
+    def confirmed(self):
+        # True when every tick so far ran with the peer's real input
+        return len(self.remote_inputs) >= self.frame and self.rollback_to is None
+
+    def winner(self):
+        # Winner of the match, only once no late input can take the win back
+        return self.match.winner() if self.confirmed() else 0
+
+    def finish(self, timeout=FINISH_TIMEOUT):
+        # Wait until both peers have every input of the ticks played so far
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline and not (self.confirmed() and self.peer_needs >= self.frame):
+            self.idle()
+            time.sleep(0.005)
+        linger = time.perf_counter() + 0.25  # Our last acknowledgements may get lost too
+        while time.perf_counter() < linger:
+            self.idle()
+            time.sleep(0.01)
+        return self.confirmed()
+
+    def report(self):
+        depths = self.rollback_depths or [0]
+        resim_ms = self.resim_time * 1000 / max(self.rollbacks, 1)
+        return (f"Netplay: {self.frame} ticks, {self.rollbacks} rollbacks (depth avg "
+                f"{sum(depths) / len(depths):.1f}, max {max(depths)} ticks), {self.resim_ticks} ticks re-simulated, "
+                f"re-sim {resim_ms:.3f} ms avg / {self.max_resim_time * 1000:.3f} ms max per rollback, "
+                f"{self.stalls} stalls; packets sent {self.link.sent} (dropped {self.link.dropped}), "
+                f"received {self.link.received}")
+
+def run_peer(player, ticks, tick_rate, seed):
+    # One headless peer: a scripted fighter for the local player, paced in real time like the game
+    link = open_link(player)
+    try:
+        session = start_match(link, 0, player, get_option("--weapon", ("sword", "bow")[player - 1]), 0, tick_rate,
+                              seed)
+    except (OSError, struct.error) as error:
+        print(f"Peer {player}: {error}")
+        sys.exit(1)
+    match = session.match
+    local = session.local
+    seed = match.seed
+    bots = random.Random(simulation.stream_seed(seed, f"bot {player}"))
+
+    next_tick = time.perf_counter()
+    while session.frame < ticks:
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_tick += 1 / tick_rate
+        if session.lost():
+            break
+        own, other = match.players[local], match.players[1 - local]
+        session.advance(simulation.bot_input(bots, own, other, match))
+    complete = session.finish()
+
+    print(session.report())
+    if complete:
+        print(f"Peer {player}: state hash {match.state_hash():08x} at tick {match.tick}")
+    else:
+        print(f"Peer {player}: the other peer's inputs stopped at tick {len(session.remote_inputs)}")
+    link.close()
+
+def run_loopback():
+    # Both peers as separate processes on this machine, then compare where their matches ended up
+    peers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--net-player", str(player)] + sys.argv[1:],
+                              stdout=subprocess.PIPE, text=True) for player in (1, 2)]
+    outputs = [peer.communicate()[0] for peer in peers]
+    hashes = []
+    for player, output in zip((1, 2), outputs):
+        print(f"Peer {player}:")
+        print("  " + output.strip().replace("\n", "\n  "))
+        hashes += [line.split("state hash ")[1] for line in output.splitlines() if "state hash " in line]
+    if len(hashes) == 2 and hashes[0] == hashes[1]:
+        print("Both peers ended in the same state")
+    else:
+        print("The peers ended in different states")
+        sys.exit(1)
+
+def main():
+    player = int(get_option("--net-player", 0))
+    if not player:
+        run_loopback()
+        return
+    seed = get_option("--seed")
+    run_peer(player, int(get_option("--ticks", 600)), int(get_option("--tick-rate", 60)),
+             int(seed) if seed is not None else random.getrandbits(32))
+
+if __name__ == "__main__":
+    main()
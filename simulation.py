@@ -0,0 +1,641 @@
+import math
+import random
+import struct
+import sys
+import time
+import zlib
+from operator import attrgetter
+
+import pygame  # Only pygame.Rect is used, no window, sound or keyboard
+
+# Game rules without a window: fighters, arrows, benches, health and the winner.
+# A match advances one fixed tick at a time, driven by one input frame per player.
+
+SCREEN_WIDTH = 800  # Wider arenas repeat the one screen layout below
+ARENA_HEIGHT = 600
+GROUND_HEIGHT = 20
+
+# Input frame bits
+LEFT = 1
+RIGHT = 2
+UP = 4  # Held: jump when standing on the ground
+JUMP = 8  # Pressed this tick: jump right away, even in the air
+ATTACK = 16
+DEFEND = 32
+
+# Benches and platforms of one screen, as (x, y, width, height)
+BENCH_LAYOUT = [
+    (200, 450, 200, 15),   # Middle high bench
+    (500, 500, 200, 15),   # Right ground bench
+    (100, 500, 200, 15),   # Left ground bench
+    (50, 350, 150, 15),    # Left high bench
+    (600, 350, 150, 15),   # Right high bench
+    (350, 250, 150, 15),   # Top middle bench
+    (350, 500, 100, 15),   # Small middle ground bench
+    (350, 150, 100, 15),   # Very top bench
+]
+PLATFORM_LAYOUT = [(x, y, width, 20) for x, y, width, height in BENCH_LAYOUT]
+
+MAP_CHANGE_FRAMES = 300  # The map changes every 5 seconds
+
+WEAPONS = ("sword", "bow", "spear", "axe")
+ATTACK_DURATIONS = {"sword": 20, "bow": 30, "spear": 25, "axe": 20}  # Frames, also used to pre-render the swings
+
+# Headless runs take turns between three one-screen arenas and one that scrolls
+HEADLESS_ARENAS = (SCREEN_WIDTH, SCREEN_WIDTH, SCREEN_WIDTH, 3 * SCREEN_WIDTH)
+
+def stream_seed(seed, name):
+    # Seed of one named random stream, so bots and cosmetics never share draws.
+    # Without a seed every stream starts from fresh entropy.
+    if seed is None:
+        return None
+    return zlib.crc32(f"{seed}/{name}".encode())
+
+class Bench:
+    __slots__ = ("x", "y", "width", "height", "rect", "index")
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rect = pygame.Rect(x, y, width, height)
+        self.index = -1  # Position among all benches of the match, set by Match.select_map
+
+    def check_collision(self, player):
+        # Check if player's feet are near the platform
+        player_feet = player.y + player.height
+        player_center = player.x
+
+        # Check if player is within horizontal bounds of bench
+        if self.x <= player_center <= self.x + self.width:
+            # Check if player is at the right height to land
+            if self.y - 5 <= player_feet <= self.y + 5:
+                if player.dy >= 0:  # Only if falling or standing
+                    player.y = self.y - player.height
+                    player.dy = 0
+                    player.is_jumping = False
+                    player.on_platform = True
+                    player.current_platform = self
+                    return True
+            # Check if player hits bottom of platform when jumping
+            elif player.dy < 0 and player_feet < self.y + self.height:
+                if abs(player_feet - (self.y + self.height)) < 10:
+                    player.dy = 0
+
+        # If player walks off platform
+        if player.current_platform == self:
+            if not (self.x <= player_center <= self.x + self.width):
+                player.on_platform = False
+                player.current_platform = None
+
+        return False
+
+def arena_layout(arena_width, bench_type=Bench):
+    # Benches and platforms for an arena, the screen layout repeated across its width
+    offsets = range(0, arena_width, SCREEN_WIDTH)
+    benches = [bench_type(x + dx, y, width, height) for dx in offsets for x, y, width, height in BENCH_LAYOUT]
+    platforms = [pygame.Rect(x + dx, y, width, height) for dx in offsets for x, y, width, height in PLATFORM_LAYOUT]
+    return benches, platforms
+
+# Player attributes the rules change while a match runs, in snapshot order.
+# The rest (size, speed, jump power, player number and the unused combo/charge fields) never change after __init__.
+PLAYER_FLOATS = ("x", "y", "dx", "dy", "knockback_dx", "knockback_dy", "attack_frame", "attack_cooldown", "hurt_flash")
+PLAYER_INTS = ("health", "attack_duration", "damage", "attack_range", "last_hit_time")
+PLAYER_FLAGS = ("facing_right", "is_jumping", "attacking", "on_platform", "on_ground", "defending")
+
+class Player:
+    __slots__ = ("x", "y", "width", "height", "facing_right", "dx", "dy", "is_jumping", "health", "attacking",
+                 "attack_frame", "attack_duration", "attack_cooldown", "weapon", "arrow", "speed", "jump_power",
+                 "on_platform", "current_platform", "last_hit_time", "player_num", "rect", "on_ground", "can_jump",
+                 "jump_cooldown", "max_jump_height", "knockback_dx", "knockback_dy", "hurt_flash", "combo_count",
+                 "crit_chance", "charge_time", "max_charge", "spear_momentum", "max_momentum",
+                 "consecutive_spear_hits", "defending", "defense_cooldown", "damage", "attack_range")
+
+    def __init__(self, x, y, facing_right, player_num):
+        self.x = x
+        self.y = y
+        self.width = 30
+        self.height = 60
+        self.facing_right = facing_right
+        self.dx = 0  # Horizontal velocity
+        self.dy = 0  # Vertical velocity
+        self.is_jumping = False
+        self.health = 100
+        self.attacking = False
+        self.attack_frame = 0  # Add this for attack animation
+        self.attack_duration = 15  # Total frames for attack animation
+        self.attack_cooldown = 0  # Add cooldown counter
+        self.weapon = "sword"  # Default weapon
+        self.damage = 0  # Set by attack for the weapon
+        self.attack_range = 0
+        self.arrow = None  # For bow attacks
+        self.speed = 5  # Movement speed
+        self.jump_power = -12  # Reduced jump power
+        self.on_platform = False  # Track if player is on a platform
+        self.current_platform = None  # Track which platform player is on
+        self.last_hit_time = 0  # Add this for hit sound cooldown
+        self.player_num = player_num  # Add this back
+        self.rect = pygame.Rect(x, y, self.width, self.height)  # Add rect for collision detection
+        self.on_ground = False
+        self.can_jump = True  # New variable to control jumping
+        self.jump_cooldown = 0  # New variable for jump cooldown
+        self.max_jump_height = -12  # Maximum upward velocity
+        self.knockback_dx = 0  # Knockback horizontal speed
+        self.knockback_dy = 0  # Knockback vertical speed
+        self.hurt_flash = 0  # Flash white when hurt
+        self.combo_count = 0
+        self.crit_chance = 0.2  # 20% base crit chance
+        self.charge_time = 0
+        self.max_charge = 60  # 1 second max charge
+        self.spear_momentum = 0
+        self.max_momentum = 5
+        self.consecutive_spear_hits = 0
+        self.defending = False  # New defense state
+        self.defense_cooldown = 0  # Cooldown for defense
+
+    def jump(self, match):
+        self.dy = self.jump_power
+        self.is_jumping = True
+        self.on_platform = False
+        self.current_platform = None
+        match.events.append("jump")
+
+    def move(self, buttons, match):
+        # Handle defense
+        if buttons & DEFEND:
+            self.defending = True
+            self.dx = 0  # Can't move while defending
+        else:
+            self.defending = False
+
+        if not self.defending:  # Only allow movement if not defending
+            # Reset horizontal velocity
+            self.dx = 0
+
+            if buttons & LEFT:
+                self.dx = -self.speed
+                self.facing_right = False
+            if buttons & RIGHT:
+                self.dx = self.speed
+                self.facing_right = True
+            if buttons & UP and self.on_ground:
+                self.dy = -15  # Jump power
+                self.on_ground = False
+
+        # Apply gravity
+        tick_frames = match.tick_frames
+        if not self.on_ground:
+            self.dy += 0.8 * tick_frames  # Gravity
+
+        # Apply movement
+        self.x += (self.dx + self.knockback_dx) * tick_frames
+        self.y += (self.dy + self.knockback_dy) * tick_frames
+
+        # Reduce knockback
+        self.knockback_dx *= match.knockback_decay
+        self.knockback_dy *= match.knockback_decay
+
+        # Keep in bounds
+        if self.x < 0:
+            self.x = 0
+        elif self.x > match.arena_width - self.width:
+            self.x = match.arena_width - self.width
+
+        # Ground collision
+        if self.y > ARENA_HEIGHT - GROUND_HEIGHT - self.height:  # Ground is 20 pixels high
+            self.y = ARENA_HEIGHT - GROUND_HEIGHT - self.height
+            self.dy = 0
+            self.on_ground = True
+
+    def update(self, match):
+        # Apply stronger gravity
+        tick_frames = match.tick_frames
+        if not self.on_ground:
+            self.dy += 0.8 * tick_frames  # Increased gravity
+        self.y += self.dy * tick_frames
+
+        # Update rect position
+        self.rect.x = self.x
+        self.rect.y = self.y
+
+        # Keep player in bounds
+        if self.y > ARENA_HEIGHT - GROUND_HEIGHT - self.height:
+            self.y = ARENA_HEIGHT - GROUND_HEIGHT - self.height
+            self.dy = 0
+            self.on_ground = True
+
+        # Check platform collisions
+        self.on_ground = False
+        for platform in match.platforms:
+            if self.rect.colliderect(platform):
+                if self.dy > 0:  # Falling
+                    self.rect.bottom = platform.top
+                    self.y = self.rect.y
+                    self.dy = 0
+                    self.on_ground = True
+                    break
+
+        # Update attack cooldown
+        if self.attack_cooldown > 0:
+            self.attack_cooldown -= tick_frames
+
+        # Update hurt flash
+        if self.hurt_flash > 0:
+            self.hurt_flash -= tick_frames
+
+    def attack(self, other_player, match):
+        if not self.attacking and self.attack_cooldown <= 0:
+            self.attacking = True
+            self.attack_frame = 0
+            self.attack_duration = ATTACK_DURATIONS.get(self.weapon, self.attack_duration)
+
+            # Set attack properties based on weapon
+            if self.weapon == "sword":
+                self.damage = 15
+                self.attack_range = 60
+                self.attack_cooldown = 30
+                match.events.append("sword_swing")
+            elif self.weapon == "bow":
+                self.damage = 12
+                self.attack_range = 300
+                self.attack_cooldown = 45
+                # Create arrow
+                arrow_x = self.x + (30 if self.facing_right else -30)
+                arrow_y = self.y + 20
+                target_x = arrow_x + (300 if self.facing_right else -300)
+                target_y = other_player.y + 30
+                new_arrow = Arrow(arrow_x, arrow_y, target_x, target_y)
+                new_arrow.shooter = self  # Track who shot the arrow
+                match.arrows.append(new_arrow)
+                match.events.append("bow_hit")
+            elif self.weapon == "spear":
+                self.damage = 8
+                self.attack_range = 100
+                self.attack_cooldown = 40
+                match.events.append("spear_hit")
+            elif self.weapon == "axe":
+                self.damage = 20
+                self.attack_range = 50
+                self.attack_cooldown = 30
+                match.events.append("sword_swing")
+
+    def update_attack(self, other_player, match):
+        # Update cooldown
+        tick_frames = match.tick_frames
+        if self.attack_cooldown > 0:
+            self.attack_cooldown -= tick_frames
+
+        if self.attacking:
+            self.attack_frame += tick_frames
+            # Weapons land their hit on the tick that passes the middle of the attack
+            hit_frame = self.attack_frame - tick_frames < self.attack_duration // 2 <= self.attack_frame
+
+            # Get direction to other player
+            dx = other_player.x - self.x
+            dy = other_player.y - self.y
+            distance = math.sqrt(dx * dx + dy * dy)
+
+            # Check if target is in front of the attacker
+            is_target_in_front = (dx > 0 and self.facing_right) or (dx < 0 and not self.facing_right)
+
+            # Handle different weapon attacks
+            if self.weapon == "sword":
+                if hit_frame:
+                    if is_target_in_front and distance < self.attack_range:
+                        if abs(dy) < 40:  # Height check for sword
+                            self.hit_player(other_player, match)
+
+                if self.attack_frame >= self.attack_duration:
+                    self.attacking = False
+                    self.attack_frame = 0
+            elif self.weapon == "bow":
+                # Bow attack is handled through arrows
+                if self.attack_frame >= self.attack_duration:
+                    self.attacking = False
+                    self.attack_frame = 0
+            elif self.weapon == "spear":
+                if hit_frame:
+                    if is_target_in_front and distance < self.attack_range:
+                        if abs(dy) < 40:
+                            self.hit_player(other_player, match)
+
+                if self.attack_frame >= self.attack_duration:
+                    self.attacking = False
+                    self.attack_frame = 0
+            elif self.weapon == "axe":
+                if hit_frame:
+                    if is_target_in_front and distance < self.attack_range:
+                        if abs(dy) < 40:
+                            self.hit_player(other_player, match)
+
+                if self.attack_frame >= self.attack_duration:
+                    self.attacking = False
+                    self.attack_frame = 0
+
+    def hit_player(self, other_player, match):
+        if not other_player.defending:  # Only deal damage if the other player is not defending
+            # Calculate damage based on weapon
+            if self.weapon == "sword":
+                damage = 15
+            elif self.weapon == "bow":
+                damage = 12
+            elif self.weapon == "spear":
+                damage = 8
+            elif self.weapon == "axe":
+                damage = 20
+            # Apply damage
+            other_player.health -= damage
+            other_player.hurt_flash = 10  # Flash white when hit
+
+            # Play hurt sound with cooldown
+            current_time = match.time_ms()
+            if current_time - other_player.last_hit_time > 500:  # 500ms cooldown
+                match.events.append("hurt")
+                other_player.last_hit_time = current_time
+        else:
+            # If player is defending, they take reduced damage
+            if self.weapon == "sword":
+                damage = 3
+            elif self.weapon == "bow":
+                damage = 5
+            elif self.weapon == "spear":
+                damage = 4
+            elif self.weapon == "axe":
+                damage = 5
+            other_player.health -= damage
+            other_player.hurt_flash = 5  # Shorter flash when blocked
+
+class Arrow:
+    __slots__ = ("x", "y", "dx", "dy", "lifetime", "length", "angle", "shooter", "has_hit")
+
+    def __init__(self, x, y, target_x, target_y, speed=15):
+        self.x = x
+        self.y = y
+        # Calculate direction to target
+        dx = target_x - x
+        dy = target_y - y
+        distance = math.sqrt(dx * dx + dy * dy)
+        # Normalize direction
+        self.dx = (dx / distance) * speed if distance > 0 else 0
+        self.dy = (dy / distance) * speed if distance > 0 else 0
+        self.lifetime = 30  # Arrow exists for 30 frames
+        self.length = 20  # Arrow length in pixels
+        self.angle = math.atan2(dy, dx)  # Store angle for drawing
+        self.shooter = None  # Reference to the player who shot the arrow
+        self.has_hit = False  # Track if arrow has hit something
+
+    def update(self, match):
+        self.x += self.dx * match.tick_frames
+        self.y += self.dy * match.tick_frames
+        self.lifetime -= match.tick_frames
+        return self.lifetime > 0
+
+    def check_collision(self, player, match):
+        if self.has_hit or self.shooter == player:  # Don't hit the shooter or if already hit
+            return False
+
+        # Simple rectangle collision
+        arrow_rect = pygame.Rect(self.x - 5, self.y - 5, 10, 10)
+
+        if arrow_rect.colliderect(player.rect):
+            self.has_hit = True
+            if not player.defending:
+                player.health -= 12  # Arrow damage
+                player.hurt_flash = 10
+                match.events.append("bow_hit")
+            else:
+                player.health -= 4  # Reduced damage when blocked
+                player.hurt_flash = 5
+            return True
+        return False
+
+# Snapshot record: match header, then both players, then one record per arrow in flight
+# Player: the float and int fields above, rect position, weapon, flag bits and bench index (-1 for none)
+PLAYER_RECORD = f"{len(PLAYER_FLOATS)}d{len(PLAYER_INTS)}i2iBBh"
+MATCH_RECORD = struct.Struct("<IHdH" + PLAYER_RECORD * 2)  # tick, map, map timer, arrow count
+ARROW_RECORD = struct.Struct("<6d2B")  # position, velocity, lifetime, angle, hit, shooter
+PLAYER_FIELDS = PLAYER_FLOATS + PLAYER_INTS
+get_player_fields = attrgetter(*PLAYER_FIELDS)
+get_player_flags = attrgetter(*PLAYER_FLAGS)
+
+class Match:
+    __slots__ = ("players", "arrows", "arena_widths", "tick_rate", "tick_frames", "knockback_decay", "seed",
+                 "tick", "map_timer", "events", "layouts", "all_benches", "map_index", "arena_width", "benches",
+                 "platforms")
+
+    def __init__(self, player1=None, player2=None, arena_widths=(SCREEN_WIDTH,), map_index=0, tick_rate=60, seed=None):
+        self.players = [player1 or Player(100, ARENA_HEIGHT - 100, True, 1),
+                        player2 or Player(SCREEN_WIDTH - 100, ARENA_HEIGHT - 100, False, 2)]
+        self.arrows = []
+        self.arena_widths = list(arena_widths)  # Arena width of every map, the maps take turns
+        self.tick_rate = tick_rate
+        self.tick_frames = 60 / tick_rate  # Rules are written in 60 Hz frames, one tick is this many of them
+        # Worked out once, so a tick only adds and multiplies floats, which give the same bits everywhere
+        self.knockback_decay = 0.8 ** self.tick_frames
+        self.seed = seed  # The rules draw no random numbers; scripts seed their bots from this (see netplay.py)
+        self.tick = 0
+        self.map_timer = 0
+        self.events = []  # Sounds to play for the last tick
+
+        # Every arena is built up front, so benches are numbered the same in every match with these maps
+        self.layouts = {}  # arena width -> (benches, platforms)
+        self.all_benches = []
+        for arena_width in self.arena_widths:
+            if arena_width not in self.layouts:
+                self.layouts[arena_width] = arena_layout(arena_width)
+                for bench in self.layouts[arena_width][0]:
+                    bench.index = len(self.all_benches)
+                    self.all_benches.append(bench)
+        self.select_map(map_index)
+
+    def select_map(self, map_index):
+        self.map_index = map_index
+        self.arena_width = self.arena_widths[map_index]
+        self.benches, self.platforms = self.layouts[self.arena_width]
+
+    def time_ms(self):
+        # Match time, used instead of the wall clock
+        return self.tick * 1000 // self.tick_rate
+
+    def keep_together(self):
+        # The fighters stay within one screen of each other, the view can't show more
+        player1, player2 = self.players
+        middle = (min(player1.x, player2.x) + max(player1.x, player2.x)) / 2
+        left = int(max(0, min(self.arena_width - SCREEN_WIDTH, middle - SCREEN_WIDTH / 2)))
+        for player in self.players:
+            player.x = max(left, min(left + SCREEN_WIDTH - player.width, player.x))
+
+    def snapshot(self):
+        # The whole match state as one compact record, restore() brings it back
+        values = [self.tick, self.map_index, self.map_timer, len(self.arrows)]
+        for player in self.players:
+            values += get_player_fields(player)
+            facing_right, is_jumping, attacking, on_platform, on_ground, defending = get_player_flags(player)
+            platform = player.current_platform
+            values += (player.rect.x, player.rect.y, WEAPONS.index(player.weapon),
+                       facing_right | is_jumping << 1 | attacking << 2 | on_platform << 3 | on_ground << 4
+                       | defending << 5, platform.index if platform else -1)
+        player2 = self.players[1]
+        return MATCH_RECORD.pack(*values) + b"".join([
+            ARROW_RECORD.pack(arrow.x, arrow.y, arrow.dx, arrow.dy, arrow.lifetime, arrow.angle, arrow.has_hit,
+                              arrow.shooter is player2) for arrow in self.arrows])
+
+    def restore(self, record):
+        # Go back to the state saved by snapshot(), in this match or another one with the same maps
+        values = MATCH_RECORD.unpack_from(record)
+        self.tick, map_index, self.map_timer, arrow_count = values[:4]
+        if map_index != self.map_index:
+            self.select_map(map_index)
+        start = 4
+        for player in self.players:
+            for name, value in zip(PLAYER_FIELDS, values[start:start + len(PLAYER_FIELDS)]):
+                setattr(player, name, value)
+            rect_x, rect_y, weapon, flags, platform = values[start + len(PLAYER_FIELDS):start + len(PLAYER_FIELDS) + 5]
+            player.rect.x = rect_x
+            player.rect.y = rect_y
+            player.weapon = WEAPONS[weapon]
+            for bit, name in enumerate(PLAYER_FLAGS):
+                setattr(player, name, bool(flags >> bit & 1))
+            player.current_platform = self.all_benches[platform] if platform >= 0 else None
+            start += len(PLAYER_FIELDS) + 5
+
+        self.arrows = []
+        arrows = memoryview(record)[MATCH_RECORD.size:MATCH_RECORD.size + arrow_count * ARROW_RECORD.size]
+        for x, y, dx, dy, lifetime, angle, has_hit, shooter in ARROW_RECORD.iter_unpack(arrows):
+            arrow = Arrow.__new__(Arrow)
+            arrow.x, arrow.y, arrow.dx, arrow.dy, arrow.lifetime, arrow.angle = x, y, dx, dy, lifetime, angle
+            arrow.length = 20
+            arrow.has_hit = bool(has_hit)
+            arrow.shooter = self.players[shooter]
+            self.arrows.append(arrow)
+
+    def state_hash(self):
+        # CRC of the snapshot, cheap enough to take every tick.
+        # Floats go in with all their bits, so the smallest difference between two runs shows.
+        return zlib.crc32(self.snapshot())
+
+    def winner(self):
+        # Number of the player who won, 0 while both still stand
+        player1, player2 = self.players
+        if player1.health <= 0:
+            return 2
+        if player2.health <= 0:
+            return 1
+        return 0
+
+    def step(self, inputs):
+        # Advance one tick, inputs holds the input frame of each player
+        self.events = []
+        player1, player2 = self.players
+
+        # Jumps and attacks pressed this tick
+        for player, other, buttons in ((player1, player2, inputs[0]), (player2, player1, inputs[1])):
+            if buttons & JUMP:
+                player.jump(self)
+            if buttons & ATTACK:
+                player.attack(other, self)
+
+        # Move players
+        for player, buttons in zip(self.players, inputs):
+            player.on_platform = False
+            player.move(buttons, self)
+            player.update(self)
+        self.keep_together()
+
+        # Check bench collisions for both players
+        for bench in self.benches:
+            bench.check_collision(player1)
+            bench.check_collision(player2)
+
+        # Update attacks
+        player1.update_attack(player2, self)
+        player2.update_attack(player1, self)
+
+        # Update arrows and check arrow collisions
+        self.arrows = [arrow for arrow in self.arrows if arrow.update(self)]
+        for arrow in self.arrows:
+            for player in self.players:
+                if arrow.shooter != player:
+                    arrow.check_collision(player, self)
+
+        # Change map periodically
+        self.map_timer += self.tick_frames
+        if self.map_timer >= MAP_CHANGE_FRAMES:
+            self.select_map((self.map_index + 1) % len(self.arena_widths))
+            self.map_timer = 0
+        self.tick += 1
+
+# Scripted fighters for headless runs
+def bot_input(rng, player, other, match):
+    # Walk up to the other fighter and face them, then swing now and then
+    buttons = 0
+    toward = RIGHT if other.x > player.x else LEFT
+    distance = abs(other.x - player.x)
+    if abs(other.y - player.y) >= 40:
+        buttons |= LEFT if match.time_ms() // 1000 % 2 else RIGHT  # Stroll off the bench to get level
+    elif distance > 40 and rng.random() < 0.8:
+        buttons |= toward
+    elif distance < 20:
+        buttons |= LEFT + RIGHT - toward  # Back off a little
+    elif player.facing_right != (toward == RIGHT):
+        buttons |= toward
+    if rng.random() < 0.05:
+        buttons |= UP
+    if rng.random() < 0.1:
+        buttons |= ATTACK
+    if rng.random() < 0.05:
+        buttons |= DEFEND
+    return buttons
+
+def play(ticks, tick_rate=60, weapons=None, arena_widths=HEADLESS_ARENAS, seed=None, on_tick=None):
+    # Play bot matches back to back for the given number of ticks, calling on_tick(match) after each one.
+    # Without weapons every match draws its own pair. Returns the number of matches and the wins per player.
+    rng = random.Random(stream_seed(seed, "bots"))
+    matches = 0
+    wins = [0, 0, 0]
+    match = None
+    for tick in range(ticks):
+        if match is None or match.winner():
+            if match is not None:
+                wins[match.winner()] += 1
+            matches += 1
+            match = Match(arena_widths=arena_widths, tick_rate=tick_rate, seed=seed)
+            for player, weapon in zip(match.players, weapons or (rng.choice(WEAPONS), rng.choice(WEAPONS))):
+                player.weapon = weapon
+        player1, player2 = match.players
+        match.step((bot_input(rng, player1, player2, match), bot_input(rng, player2, player1, match)))
+        if on_tick:
+            on_tick(match)
+    return matches, wins
+
+def run_headless(ticks, tick_rate=60, weapons=("sword", "bow"), arena_widths=HEADLESS_ARENAS, seed=None):
+    # Play bot matches as fast as possible and report the tick rate.
+    # With a seed the run is deterministic, and the digest of its state hashes is printed to compare runs.
+    digest = [0]
+    def chain_hash(match):
+        digest[0] = zlib.crc32(match.state_hash().to_bytes(4, "little"), digest[0])
+    start = time.perf_counter()
+    matches, wins = play(ticks, tick_rate, weapons, arena_widths, seed, chain_hash if seed is not None else None)
+    seconds = time.perf_counter() - start
+    print(f"Headless: {ticks} ticks in {seconds:.2f} s, {ticks / max(seconds, 1e-9):.0f} ticks per second "
+          f"({matches} matches, wins P1 {wins[1]} / P2 {wins[2]})")
+    if seed is not None:
+        print(f"Seed {seed}: state hash digest {digest[0]:08x}")
+
+def get_option(name, default=None):
+    # Value of a "--name=value" or "--name value" command line option
+    for i, arg in enumerate(sys.argv):
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+        if arg == name and i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
+
+def main():
+    seed = get_option("--seed")
+    run_headless(int(get_option("--ticks", 10000)), int(get_option("--tick-rate", 60)),
+                 seed=int(seed) if seed is not None else None)
+
+if __name__ == "__main__":
+    main()